@@ -0,0 +1,204 @@
+"""
+Offline backfill for the eBanking exporter
+
+Runs the exporter simulation (same targets, profiles and scheduler as
+main.py) on a virtual clock over any time range and writes what a scrape
+every --step seconds would have seen, as timestamped OpenMetrics text:
+
+    python backfill.py --start 2024-01-01T00:00:00 --duration 7d -o ebanking.om
+    promtool tsdb create-blocks-from openmetrics ebanking.om ./data
+
+OpenMetrics wants the points of each series grouped together, so scrapes
+are spooled to one temporary file per series while the simulation runs and
+the files are concatenated at the end. Memory use depends on the number of
+series, not on the length of the range.
+"""
+
+import argparse
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from prometheus_client import REGISTRY
+from prometheus_client.utils import floatToGoString
+
+import main
+from replay import VirtualClock
+
+logger = logging.getLogger('backfill')
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_duration(text: str) -> float:
+    """Parse '3600', '90m', '12h', '7d' or '2w' into seconds"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhdw]?)', text.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid duration: {text!r}")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2) or 's']
+
+
+def parse_time(text: str) -> float:
+    """Parse Unix seconds or an ISO-8601 date/time (UTC unless an offset is given)"""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        moment = datetime.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time: {text!r}") from None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+class SeriesSpool:
+    """Spool scrapes per series group, then write them out grouped
+
+    OpenMetrics requires every point of a series (for histograms: of a label
+    set, all buckets together) to be contiguous, so a scrape cannot be
+    written as-is. Lines are buffered per group and appended to one spool
+    file per group every `flush_every` scrapes; write_to() emits each family
+    header followed by its groups.
+    """
+
+    def __init__(self, directory, flush_every: int = 100):
+        self.directory = directory
+        self.flush_every = flush_every
+        self.families = {}  # family name -> (header, [group keys])
+        self.groups = {}    # group key -> spool file path
+        self.buffers = {}   # group key -> pending lines
+        self.series = {}    # (sample name, labels) -> ('name{labels} ', group key)
+        self.pending = 0
+        self.samples = 0
+
+    def write_scrape(self, registry, timestamp: float):
+        """Buffer every current sample of the registry with the given timestamp"""
+        suffix = f' {timestamp:.3f}\n'
+        series = self.series
+        buffers = self.buffers
+        for metric in registry.collect():
+            if metric.samples and metric.name not in self.families:
+                self._add_family(metric)
+            for s in metric.samples:
+                key = (s.name, tuple(sorted(s.labels.items())))
+                entry = series.get(key)
+                if entry is None:
+                    entry = series[key] = self._add_series(metric, s, key[1])
+                prefix, group = entry
+                buffers[group].append(prefix + floatToGoString(s.value) + suffix)
+            self.samples += len(metric.samples)
+        self.pending += 1
+        if self.pending >= self.flush_every:
+            self.flush()
+
+    def _add_family(self, metric):
+        header = f'# HELP {metric.name} {_escape(metric.documentation)}\n# TYPE {metric.name} {metric.type}\n'
+        if metric.unit:
+            header += f'# UNIT {metric.name} {metric.unit}\n'
+        self.families[metric.name] = (header, [])
+
+    def _add_series(self, metric, sample, labels):
+        group_labels = labels
+        if sample.name == metric.name + '_bucket':
+            group_labels = tuple(item for item in labels if item[0] != 'le')
+        group = (metric.name, group_labels)
+        if group not in self.groups:
+            self.groups[group] = os.path.join(self.directory, f'{len(self.groups):06d}.om')
+            self.buffers[group] = []
+            self.families[metric.name][1].append(group)
+        text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+        prefix = f'{sample.name}{{{text}}} ' if text else f'{sample.name} '
+        return prefix, group
+
+    def flush(self):
+        """Append buffered lines to the per-group spool files"""
+        for group, lines in self.buffers.items():
+            if lines:
+                with open(self.groups[group], 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+                lines.clear()
+        self.pending = 0
+
+    def write_to(self, out):
+        """Write every family header and its groups, then the EOF marker"""
+        self.flush()
+        for header, groups in self.families.values():
+            out.write(header)
+            for group in groups:
+                with open(self.groups[group], encoding='utf-8') as f:
+                    shutil.copyfileobj(f, out)
+        out.write('# EOF\n')
+
+
+def backfill(start: float, end: float, step: float, out, seed=main.SIMULATION_SEED,
+             environments=main.ENVIRONMENTS, tmp_dir=None):
+    """Simulate [start, end) and write one timestamped scrape per step to `out`"""
+    main.prepare_offline_registry()
+    clock = VirtualClock(start)
+    targets = main.build_targets(clock, seed=seed, environments=environments)
+    scheduler = main.TickScheduler(targets, clock)
+    logger.info(f"Backfilling {len(targets)} environment(s) from "
+                f"{datetime.fromtimestamp(start, timezone.utc).isoformat()} to "
+                f"{datetime.fromtimestamp(end, timezone.utc).isoformat()} every {step:g}s")
+
+    started = time.monotonic()
+    next_report = start + 86400
+    with tempfile.TemporaryDirectory(prefix='ebanking-backfill-', dir=tmp_dir) as directory:
+        spool = SeriesSpool(directory)
+        scrape = start + step
+        while scrape <= end:
+            scheduler.run_until(scrape)
+            spool.write_scrape(REGISTRY, scrape)
+            if scrape >= next_report:
+                logger.info(f"  {(scrape - start) / 86400:.1f} simulated day(s), {spool.samples} samples")
+                next_report += 86400
+            scrape += step
+        spool.write_to(out)
+
+    logger.info(f"✓ Wrote {spool.samples} samples in {time.monotonic() - started:.1f}s")
+    return spool.samples
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Generate timestamped OpenMetrics history for promtool backfilling")
+    parser.add_argument('--start', type=parse_time, help="Start of the range (Unix time or ISO-8601, default: end - duration)")
+    parser.add_argument('--end', type=parse_time, help="End of the range (Unix time or ISO-8601, default: start + duration, or now)")
+    parser.add_argument('--duration', type=parse_duration, default=86400.0, help="Length of the range unless both ends are given (e.g. 12h, 7d; default: 1d)")
+    parser.add_argument('--step', type=parse_duration, default=10.0, help="Scrape interval (default: 10s, as in prometheus.yml)")
+    parser.add_argument('--seed', default=main.SIMULATION_SEED, help="Simulation seed (default: SIMULATION_SEED)")
+    parser.add_argument('--environments', default=main.ENVIRONMENTS, help="Environments to simulate (default: ENVIRONMENTS)")
+    parser.add_argument('-o', '--output', default='-', help="Output file ('-' for stdout)")
+    parser.add_argument('--tmp-dir', help="Directory for the per-family spool files")
+    args = parser.parse_args(argv)
+
+    start, end = args.start, args.end
+    if end is None:
+        end = start + args.duration if start is not None else time.time()
+    if start is None:
+        start = end - args.duration
+    if args.step <= 0 or end - start < args.step:
+        parser.error("the range must cover at least one --step")
+
+    # Per-iteration progress of the simulation is noise here; backfill reports per simulated day
+    logging.getLogger('main').setLevel(logging.WARNING)
+
+    if args.output == '-':
+        backfill(start, end, args.step, sys.stdout, args.seed, args.environments, args.tmp_dir)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            backfill(start, end, args.step, out, args.seed, args.environments, args.tmp_dir)
+
+
+if __name__ == '__main__':
+    main_cli()
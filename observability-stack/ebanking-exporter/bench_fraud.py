@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-tick cost of the fraud rules at high volume
+
+Runs the same seeded ticks (virtual clock, no sleeping) at TARGET_TPS
+transactions per second with the fraud rules off, and then with each
+FRAUD_MAX_PER_TICK sample size. Each run uses fresh targets, so every
+configuration starts with empty client state. The first --warmup ticks are
+not timed, because that is when most client baselines are first filled.
+
+Usage:
+  python bench_fraud.py
+  python bench_fraud.py --tps 20000 --limits 0 200 1000 20000 --environments production,staging
+"""
+
+import argparse
+import logging
+import time
+
+import main
+from replay import VirtualClock
+
+
+def run(num_ticks: int, warmup: int, environments: str, seed: str, limit: int):
+    """(seconds per tick, alerts, checked transactions), ticking the environments in turn"""
+    main.FRAUD_MAX_PER_TICK = limit
+    clock = VirtualClock(1_700_000_000)
+    targets = main.build_targets(clock, seed=seed, environments=environments)
+    before = (_total(main.fraud_alerts), _total(main.fraud_checked_transactions))
+    start = None
+    for i in range(warmup + num_ticks):
+        if i == warmup:
+            start = time.perf_counter()
+        target = targets[i % len(targets)]
+        clock.sleep(1.0 / len(targets))
+        target.tick()
+    elapsed = (time.perf_counter() - start) / num_ticks
+    return (elapsed, _total(main.fraud_alerts) - before[0],
+            _total(main.fraud_checked_transactions) - before[1])
+
+
+def _total(counter) -> float:
+    return sum(s.value for m in counter.collect() for s in m.samples if s.name.endswith('_total'))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Fraud rules per-tick cost benchmark")
+    parser.add_argument("-n", "--num-ticks", type=int, default=50,
+                        help="Timed ticks per run (default: 50)")
+    parser.add_argument("--warmup", type=int, default=10,
+                        help="Untimed ticks before each run (default: 10)")
+    parser.add_argument("--tps", type=float, default=20000,
+                        help="TARGET_TPS to emulate (default: 20000)")
+    parser.add_argument("-l", "--limits", type=int, nargs="+", default=[0, 200, 1000, 20000],
+                        help="FRAUD_MAX_PER_TICK values to test, 0 = rules off (default: 0 200 1000 20000)")
+    parser.add_argument("--environments", default="production",
+                        help="ENVIRONMENTS spec to tick (default: production)")
+    parser.add_argument("--seed", default="42")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('main').setLevel(logging.WARNING)
+    main.TARGET_TPS = args.tps
+
+    print(f"Ticks per run: {args.num_ticks} (+{args.warmup} warm-up), TARGET_TPS: {args.tps:g}, "
+          f"environments: {args.environments}")
+    baseline = None
+    print(f"{'limit':>7} {'ms/tick':>9} {'fraud ms':>9} {'checked/tick':>13} {'alerts':>7}")
+    for limit in args.limits:
+        per_tick, alerts, checked = run(args.num_ticks, args.warmup, args.environments, args.seed, limit)
+        if baseline is None and limit == 0:
+            baseline = per_tick
+        fraud = f"{(per_tick - baseline) * 1e3:>9.1f}" if baseline is not None else f"{'-':>9}"
+        ticks = args.num_ticks + args.warmup
+        print(f"{limit:>7} {per_tick * 1e3:>9.1f} {fraud} {checked / ticks:>13.0f} {alerts:>7.0f}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-tick tracing overhead of the simulation
+
+Runs the same seeded ticks (virtual clock, no sleeping) without tracing and
+then with the tracing of main.py at several head ratios. Kept traces are
+exported over OTLP/gRPC to an in-process stand-in collector that counts
+the spans it receives, so batching and export costs are part of the
+measurement. Needs requirements-tracing.txt.
+
+Usage:
+  python bench_tracing.py
+  python bench_tracing.py -n 5000 --ratios 0 0.1 1 --environments production,staging
+"""
+
+import argparse
+import logging
+import time
+from concurrent import futures
+
+import grpc
+from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+from opentelemetry.proto.collector.trace.v1 import trace_service_pb2, trace_service_pb2_grpc
+
+import main
+import tracing
+from replay import VirtualClock
+
+
+class StandInCollector(trace_service_pb2_grpc.TraceServiceServicer):
+    """OTLP/gRPC trace receiver counting spans, on localhost and a free port"""
+
+    def __init__(self):
+        self.spans = 0
+        self.requests = 0
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        trace_service_pb2_grpc.add_TraceServiceServicer_to_server(self, self.server)
+        self.port = self.server.add_insecure_port("127.0.0.1:0")
+        self.server.start()
+
+    def Export(self, request, context):
+        self.spans += sum(len(scope.spans) for resource in request.resource_spans
+                          for scope in resource.scope_spans)
+        self.requests += 1
+        return trace_service_pb2.ExportTraceServiceResponse()
+
+    def reset(self):
+        self.spans = self.requests = 0
+
+    def close(self):
+        self.server.stop(None)
+
+
+def run(num_ticks: int, environments: str, seed: str) -> float:
+    """Seconds per tick, ticking the environments in turn"""
+    clock = VirtualClock(0)
+    targets = main.build_targets(clock, seed=seed, environments=environments)
+    start = time.perf_counter()
+    for i in range(num_ticks):
+        target = targets[i % len(targets)]
+        clock.sleep(1.0 / len(targets))
+        with tracing.start_span('simulation.tick', environment=target.environment,
+                                iteration=target.iteration + 1):
+            target.tick()
+    return (time.perf_counter() - start) / num_ticks
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Simulation tracing overhead benchmark")
+    parser.add_argument("-n", "--num-ticks", type=int, default=2000,
+                        help="Ticks per run (default: 2000)")
+    parser.add_argument("-r", "--ratios", type=float, nargs="+", default=[0.0, 0.1, 1.0],
+                        help="Head sampling ratios to test (default: 0 0.1 1)")
+    parser.add_argument("--slow-threshold", type=float, default=tracing.TRACE_SLOW_THRESHOLD,
+                        help=f"Root duration always kept, in seconds (default: {tracing.TRACE_SLOW_THRESHOLD:g})")
+    parser.add_argument("--environments", default=main.ENVIRONMENTS,
+                        help=f"ENVIRONMENTS spec to tick (default: {main.ENVIRONMENTS})")
+    parser.add_argument("--seed", default="42")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    collector = StandInCollector()
+    tracing.use_provider(None)
+    baseline = run(args.num_ticks, args.environments, args.seed)
+
+    print(f"Ticks per run: {args.num_ticks}, environments: {args.environments}")
+    print(f"Baseline (no tracing): {baseline * 1e6:.1f} us/tick")
+    print(f"{'ratio':>7} {'us/tick':>9} {'overhead':>10} {'spans recv':>11} {'exports':>8}")
+    for ratio in args.ratios:
+        collector.reset()
+        exporter = OTLPSpanExporter(endpoint=f"localhost:{collector.port}", insecure=True)
+        provider = tracing.build_provider("ebanking-exporter-bench", "bench", exporter,
+                                          ratio=ratio, slow_threshold=args.slow_threshold)
+        tracing.use_provider(provider)
+        per_tick = run(args.num_ticks, args.environments, args.seed)
+        provider.shutdown()  # flushes the batch processor
+        print(f"{ratio:>7g} {per_tick * 1e6:>9.1f} {(per_tick - baseline) * 1e6:>8.1f}us "
+              f"{collector.spans:>11} {collector.requests:>8}")
+    tracing.use_provider(None)
+    collector.close()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,225 @@
+"""
+Streaming fraud detection for eBanking transactions
+
+Applies the rules of the MSSQL fraud procedures (mssql/init/02-create-stored-procedures.sql)
+to a stream of transactions, keeping per-client state instead of rescanning
+the Transactions table for every call:
+
+- velocity (sp_DetectVelocityFraud): a sliding window of the client's recent
+  transactions with a running amount total; 5 or more in 5 minutes -> High, 75
+- location (sp_DetectLocationFraud): the client's last known position;
+  more than 500 km from it within 60 minutes -> Critical, 95
+- amount (sp_DetectAmountFraud): count, sum and sum of squares of the
+  client's completed amounts in day buckets over 30 days; above
+  mean + 3 stddev and above 1000 -> High, 80 (optionally one baseline per
+  category, e.g. transaction type). A `baseline_history` callable can
+  supply the amounts a client completed before the stream started, so the
+  rule does not have to wait for a history to build up.
+
+Each transaction costs O(1) amortized: it enters and leaves the velocity
+window once, and the amount statistics are running totals from which a
+whole day bucket is subtracted when it expires. State is kept for the
+`max_clients` most recently active clients.
+"""
+
+import math
+from collections import OrderedDict, deque, namedtuple
+from datetime import datetime
+
+EARTH_RADIUS_KM = 6371.0
+
+# Cities of the seed data (mssql/init/03-seed-data.sql) and their coordinates
+CITIES = {
+    "Tunis": (36.8065, 10.1815),
+    "Sfax": (34.7406, 10.7603),
+    "Sousse": (35.8256, 10.6369),
+    "Bizerte": (37.2744, 9.8739),
+    "Gabes": (33.8815, 10.0982),
+}
+# Far enough from every seeded city to fail the 500 km / 60 min travel check
+FOREIGN_LOCATIONS = {
+    "Paris, France": (48.8566, 2.3522),
+    "Dubai, UAE": (25.2048, 55.2708),
+    "Istanbul, Turkey": (41.0082, 28.9784),
+}
+
+FraudAlert = namedtuple("FraudAlert", "transaction_id client_id alert_type severity message risk_score detected_at")
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance, as computed by sp_DetectLocationFraud"""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) ** 2
+         + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2)
+    return EARTH_RADIUS_KM * 2 * math.asin(math.sqrt(a))
+
+
+class AmountBaseline:
+    """Count, sum and sum of squares of completed amounts, per day, over a sliding number of days"""
+
+    __slots__ = ("days", "count", "total", "squares")
+
+    def __init__(self):
+        self.days = deque()       # [day, count, sum, sum of squares]
+        self.count = 0            # running totals over `days`
+        self.total = 0.0
+        self.squares = 0.0
+
+    def expire(self, oldest_day: int):
+        days = self.days
+        while days and days[0][0] < oldest_day:
+            _, n, total, squares = days.popleft()
+            self.count -= n
+            self.total -= total
+            self.squares -= squares
+
+    def add(self, day: int, amount: float):
+        square = amount * amount
+        days = self.days
+        if days and days[-1][0] == day:
+            bucket = days[-1]
+            bucket[1] += 1
+            bucket[2] += amount
+            bucket[3] += square
+        else:
+            days.append([day, 1, amount, square])
+        self.count += 1
+        self.total += amount
+        self.squares += square
+
+    def seed(self, day: int, amounts):
+        """Add earlier completed amounts as one bucket of `day`"""
+        for amount in amounts:
+            self.add(day, amount)
+
+    def mean_stddev(self):
+        """Mean and sample standard deviation (0 for a single amount, like STDEV() through ISNULL)"""
+        count = self.count
+        mean = self.total / count
+        variance = (self.squares - self.total * mean) / (count - 1) if count > 1 else 0.0
+        return mean, math.sqrt(max(variance, 0.0))
+
+
+class ClientState:
+    """Everything the rules remember about one client"""
+
+    __slots__ = ("recent", "recent_amount", "position", "baselines")
+
+    def __init__(self):
+        self.recent = deque()     # (timestamp, amount) of counted transactions in the velocity window
+        self.recent_amount = 0.0
+        self.position = None      # (timestamp, latitude, longitude) of the last located transaction
+        self.baselines = {}       # amount category -> AmountBaseline
+
+
+class FraudEngine:
+    """Velocity, location and amount rules over per-client incremental state
+
+    Not thread-safe: feed it from one thread (or behind a lock).
+    """
+
+    def __init__(self, velocity_window: float = 300, velocity_max: int = 5,
+                 travel_km: float = 500, travel_window: float = 3600,
+                 amount_sigmas: float = 3, amount_floor: float = 1000,
+                 amount_days: int = 30, amount_min_history: int = 1, max_clients: int = 100000,
+                 baseline_history=None):
+        self.velocity_window = velocity_window
+        self.velocity_max = velocity_max
+        self.travel_km = travel_km
+        self.travel_window = travel_window
+        self.amount_sigmas = amount_sigmas
+        self.amount_floor = amount_floor
+        self.amount_days = amount_days
+        # The procedure needs one completed transaction (a single one has a zero stddev)
+        self.amount_min_history = max(1, amount_min_history)
+        self.max_clients = max_clients
+        # (client_id, category) -> amounts completed before the stream, or None
+        self.baseline_history = baseline_history
+        self.clients = OrderedDict()
+
+    def _state(self, client_id) -> ClientState:
+        clients = self.clients
+        state = clients.get(client_id)
+        if state is None:
+            state = clients[client_id] = ClientState()
+            if len(clients) > self.max_clients:
+                clients.popitem(last=False)
+        else:
+            clients.move_to_end(client_id)
+        return state
+
+    def process(self, transaction_id, client_id, amount: float, timestamp: float,
+                latitude: float = None, longitude: float = None, declined: bool = False,
+                category=None) -> list:
+        """Check one transaction and update the client's state; returns its FraudAlerts
+
+        `declined` transactions (failed, cancelled) still move the client's
+        position but, like in the procedures, neither count towards velocity
+        nor enter the amount baseline. With a `category` (e.g. the
+        transaction type), amounts are compared with the client's baseline
+        for that category instead of all their transactions.
+        """
+        state = self._state(client_id)
+        alerts = []
+        detected_at = None
+
+        # Velocity: counted transactions of the last velocity_window seconds, this one included
+        recent = state.recent
+        horizon = timestamp - self.velocity_window
+        while recent and recent[0][0] < horizon:
+            state.recent_amount -= recent.popleft()[1]
+        if not declined:
+            recent.append((timestamp, amount))
+            state.recent_amount += amount
+            if len(recent) >= self.velocity_max:
+                detected_at = datetime.fromtimestamp(timestamp)
+                minutes = self.velocity_window / 60
+                alerts.append(FraudAlert(
+                    transaction_id, client_id, "Velocity", "High",
+                    f"Client performed {len(recent)} transactions ({state.recent_amount:,.2f} TND) "
+                    f"in {minutes:g} minutes",
+                    75.0, detected_at))
+
+        # Location: distance from the previous located transaction
+        flagged = False
+        if latitude is not None and longitude is not None:
+            previous = state.position
+            # Most transactions come from where the client already was: no distance to compute
+            if previous is not None and (previous[1] != latitude or previous[2] != longitude):
+                elapsed = timestamp - previous[0]
+                if elapsed < self.travel_window:
+                    distance = haversine_km(previous[1], previous[2], latitude, longitude)
+                    if distance > self.travel_km:
+                        flagged = True
+                        detected_at = detected_at or datetime.fromtimestamp(timestamp)
+                        alerts.append(FraudAlert(
+                            transaction_id, client_id, "Location", "Critical",
+                            f"Impossible travel detected: {distance:,.2f} km in {int(elapsed // 60)} minutes",
+                            95.0, detected_at))
+            state.position = (timestamp, latitude, longitude)
+
+        # Amount: mean + amount_sigmas * sample stddev of the completed amounts of the last amount_days
+        day = int(timestamp // 86400)
+        baseline = state.baselines.get(category)
+        if baseline is None:
+            baseline = state.baselines[category] = AmountBaseline()
+            if self.baseline_history is not None:
+                # Dated the day before, so it expires with the rest of the window
+                baseline.seed(day - 1, self.baseline_history(client_id, category))
+        baseline.expire(day - self.amount_days + 1)
+        if baseline.count >= self.amount_min_history and amount > self.amount_floor:
+            mean, stddev = baseline.mean_stddev()
+            if amount > mean + self.amount_sigmas * stddev:
+                flagged = True
+                detected_at = detected_at or datetime.fromtimestamp(timestamp)
+                alerts.append(FraudAlert(
+                    transaction_id, client_id, "Amount", "High",
+                    f"Unusual amount: {amount:,.2f} TND (avg: {mean:,.2f} TND)",
+                    80.0, detected_at))
+
+        # Flagged (location) and held (amount) transactions never become Completed
+        if not declined and not flagged:
+            baseline.add(day, amount)
+        return alerts
+
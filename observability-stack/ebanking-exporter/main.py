@@ -10,10 +10,18 @@ Best Practices:
 - Supports production, staging, development, and training environments
 """
 
-import time
 import random
 import os
-from prometheus_client import start_http_server, Counter, Gauge, Histogram, Info
+import heapq
+import sys
+from collections import Counter as Tally
+from fraud_engine import CITIES, FOREIGN_LOCATIONS, FraudEngine
+from prometheus_client import start_http_server, generate_latest, disable_created_metrics, Counter, Gauge, Histogram, Info
+from prometheus_client import REGISTRY, GC_COLLECTOR, PLATFORM_COLLECTOR, PROCESS_COLLECTOR
+from sampling import observe_many
+from profiles import load_profiles
+from replay import stream_rng, RealClock, VirtualClock
+import tracing
 import logging
 
 # Configure logging
@@ -31,18 +39,36 @@ SERVICE_NAME = os.getenv('SERVICE_NAME', 'ebanking-api')
 REGION = os.getenv('REGION', 'eu-west-1')
 CLUSTER = os.getenv('CLUSTER', 'training-cluster')
 
-logger.info(f"Starting eBanking Exporter - Environment: {ENVIRONMENT}, Service: {SERVICE_NAME}")
+# Simulated environments in this process, comma-separated "environment[:region[:cluster[:profile]]]"
+# (default: the single ENVIRONMENT/REGION/CLUSTER above)
+ENVIRONMENTS = os.getenv('ENVIRONMENTS', f'{ENVIRONMENT}:{REGION}:{CLUSTER}')
 
-# Application info
-app_info = Info('ebanking_app', 'eBanking Application Information')
-app_info.info({
-    'version': '1.0.0',
-    'environment': ENVIRONMENT,
-    'service': SERVICE_NAME,
-    'region': REGION,
-    'cluster': CLUSTER,
-    'organization': 'Data2AI Academy'
-})
+# Transactions per second to emulate per environment (0 = historical 2-5 x multiplier per tick)
+TARGET_TPS = float(os.getenv('TARGET_TPS', '0'))
+
+# Transactions of a tick run through the fraud rules at most (a uniform sample beyond; 0 = rules off)
+FRAUD_MAX_PER_TICK = int(os.getenv('FRAUD_MAX_PER_TICK', '200'))
+
+# Simulation profiles (rates, weights, distributions, bucket layouts)
+PROFILE_FILE = os.getenv('PROFILE_FILE')  # default: profiles.json next to this file
+
+# Deterministic replay: per-stream seeded RNGs, optionally in virtual time (no sleeping)
+SIMULATION_SEED = os.getenv('SIMULATION_SEED')  # unset = unseeded global random
+VIRTUAL_TIME = os.getenv('VIRTUAL_TIME', 'false').lower() == 'true'
+SIMULATION_START = float(os.getenv('SIMULATION_START', '0'))  # virtual clock start (Unix time)
+SIMULATION_DURATION = float(os.getenv('SIMULATION_DURATION', '86400'))  # virtual seconds to simulate
+SIMULATION_OUTPUT = os.getenv('SIMULATION_OUTPUT', '-')  # final exposition of a virtual run ('-' = stdout)
+
+# Also export the MSSQL database metrics (mssql_exporter.py, needs pyodbc) on the same port
+MSSQL_METRICS = os.getenv('MSSQL_METRICS', 'false').lower() == 'true'
+
+logger.info(f"Starting eBanking Exporter - Environments: {ENVIRONMENTS}, Service: {SERVICE_NAME}")
+
+# Compiled once at startup: the simulation loop only draws from prepared samplers
+PROFILES = load_profiles(PROFILE_FILE)
+
+# Application info (one series per simulated environment)
+app_info = Info('ebanking_app', 'eBanking Application Information', ['environment', 'region', 'cluster'])
 
 # ============================================
 # Transaction Metrics (with environment label)
@@ -57,7 +83,7 @@ transaction_amount = Histogram(
     'ebanking_transaction_amount_eur',
     'Transaction amounts in EUR',
     ['transaction_type', 'environment'],
-    buckets=[10, 50, 100, 500, 1000, 5000, 10000, 50000]
+    buckets=PROFILES.buckets.get('ebanking_transaction_amount_eur', [10, 50, 100, 500, 1000, 5000, 10000, 50000])
 )
 
 # ============================================
@@ -73,7 +99,7 @@ session_duration = Histogram(
     'ebanking_session_duration_seconds',
     'User session duration in seconds',
     ['environment'],
-    buckets=[60, 300, 600, 1800, 3600, 7200]
+    buckets=PROFILES.buckets.get('ebanking_session_duration_seconds', [60, 300, 600, 1800, 3600, 7200])
 )
 
 # ============================================
@@ -98,7 +124,7 @@ request_duration = Histogram(
     'ebanking_request_duration_seconds',
     'Time taken to process API requests',
     ['endpoint', 'method', 'environment'],
-    buckets=[0.01, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0]
+    buckets=PROFILES.buckets.get('ebanking_request_duration_seconds', [0.01, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0])
 )
 
 api_requests = Counter(
@@ -137,6 +163,12 @@ fraud_alerts = Counter(
     ['alert_type', 'severity', 'environment']
 )
 
+fraud_checked_transactions = Counter(
+    'ebanking_fraud_checked_transactions_total',
+    'Transactions run through the fraud rules (all of them, or a sample of the busiest ticks)',
+    ['environment']
+)
+
 # ============================================
 # Database Metrics (with environment label)
 # ============================================
@@ -150,7 +182,7 @@ database_query_duration = Histogram(
     'ebanking_database_query_duration_seconds',
     'Database query execution time',
     ['query_type', 'environment'],
-    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0]
+    buckets=PROFILES.buckets.get('ebanking_database_query_duration_seconds', [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0])
 )
   
 # ============================================
@@ -169,223 +201,383 @@ customer_satisfaction = Gauge(
 )
 
 
-def simulate_realistic_metrics():
-    """Simulate realistic eBanking metrics for training purposes with environment-specific behavior"""
-    logger.info(f"Starting eBanking metrics simulation for {ENVIRONMENT} environment...")
-    
-    # Configuration
-    transaction_types = ['transfer', 'payment', 'withdrawal', 'deposit', 'bill_payment']
-    statuses = ['success', 'failed', 'pending', 'cancelled']
-    channels = ['web', 'mobile', 'atm', 'branch']
-    currencies = ['EUR', 'USD', 'GBP', 'CHF']
-    account_types = ['checking', 'savings', 'business', 'investment']
-    endpoints = [
-        '/api/v1/transfer',
-        '/api/v1/balance',
-        '/api/v1/transactions',
-        '/api/v1/login',
-        '/api/v1/accounts',
-        '/api/v1/cards',
-        '/api/v1/statements'
-    ]
-    methods = ['GET', 'POST', 'PUT', 'DELETE']
-    error_types = ['timeout', 'validation', 'authentication', 'network', 'database']
-    fraud_types = ['suspicious_amount', 'unusual_location', 'velocity', 'pattern_anomaly']
-    
-    # ============================================
-    # Environment-Specific Configuration
-    # ============================================
-    if ENVIRONMENT == 'production':
-        # Production: High volume, low errors, strict SLAs
-        transaction_multiplier = 5.0
-        error_rate = 0.01  # 1% error rate
-        fraud_rate = 0.005  # 0.5% fraud rate
-        base_revenue = 250000
-        base_sessions = 500
-        success_rate_weights = [97, 2, 0.5, 0.5]  # 97% success
-        logger.info("🏭 PRODUCTION mode: High volume, low errors, strict SLAs")
-        
-    elif ENVIRONMENT == 'staging':
-        # Staging: Medium volume, slightly higher errors, pre-production testing
-        transaction_multiplier = 3.0
-        error_rate = 0.03  # 3% error rate
-        fraud_rate = 0.01  # 1% fraud rate
-        base_revenue = 150000
-        base_sessions = 300
-        success_rate_weights = [94, 4, 1, 1]  # 94% success
-        logger.info("🧪 STAGING mode: Medium volume, testing scenarios")
-        
-    elif ENVIRONMENT == 'development':
-        # Development: Low volume, higher errors, active development
-        transaction_multiplier = 1.5
-        error_rate = 0.08  # 8% error rate
-        fraud_rate = 0.02  # 2% fraud rate
-        base_revenue = 75000
-        base_sessions = 150
-        success_rate_weights = [88, 7, 3, 2]  # 88% success
-        logger.info("💻 DEVELOPMENT mode: Low volume, higher error rates for testing")
-        
-    else:  # training
-        # Training: Consistent volume, balanced for learning
-        transaction_multiplier = 2.0
-        error_rate = 0.05  # 5% error rate
-        fraud_rate = 0.015  # 1.5% fraud rate
-        base_revenue = 100000
-        base_sessions = 200
-        success_rate_weights = [90, 7, 2, 1]  # 90% success
-        logger.info("🎓 TRAINING mode: Balanced metrics for learning")
-    
-    # Simulation state
-    iteration = 0
-    
-    while True:
-        try:
-            iteration += 1
-            
-            # Simulate transaction processing (environment-specific volume)
-            num_transactions = int(random.randint(2, 5) * transaction_multiplier)
-            for _ in range(num_transactions):
-                trans_type = random.choice(transaction_types)
-                # Use environment-specific success rates
-                status = random.choices(statuses, weights=success_rate_weights)[0]
-                channel = random.choice(channels)
-                
-                transactions_processed.labels(
-                    transaction_type=trans_type,
-                    status=status,
-                    channel=channel,
-                    environment=ENVIRONMENT
-                ).inc()
-                
-                # Transaction amount (realistic distribution)
-                if trans_type == 'withdrawal':
-                    amount = random.choice([20, 50, 100, 200, 500])
-                elif trans_type == 'transfer':
-                    amount = random.uniform(10, 10000)
-                elif trans_type == 'bill_payment':
-                    amount = random.uniform(20, 500)
-                else:
-                    amount = random.uniform(10, 5000)
-                
-                transaction_amount.labels(transaction_type=trans_type, environment=ENVIRONMENT).observe(amount)
-            
-            # Simulate active sessions (varies by time of day simulation, environment-specific)
-            hour_factor = (iteration % 24) / 24.0
-            sessions = base_sessions + int(base_sessions * abs(0.5 - hour_factor) * 2)  # Peak at noon
-            active_sessions.labels(environment=ENVIRONMENT).set(sessions + random.randint(-20, 20))
-            
-            # Simulate session durations
-            session_duration.labels(environment=ENVIRONMENT).observe(random.uniform(60, 3600))
-            
-            # Simulate account balances
-            for currency in currencies:
-                for acc_type in account_types:
-                    balance = random.uniform(1000, 500000)
-                    account_balance.labels(
-                        currency=currency,
-                        account_type=acc_type,
-                        environment=ENVIRONMENT
-                    ).set(balance)
-            
-            # Simulate active accounts
-            for acc_type in account_types:
-                count = random.randint(100, 1000)
-                active_accounts.labels(account_type=acc_type, environment=ENVIRONMENT).set(count)
-            
-            # Simulate API requests (3-8 requests per iteration)
-            num_requests = random.randint(3, 8)
-            for _ in range(num_requests):
-                endpoint = random.choice(endpoints)
-                method = random.choice(methods)
-                # 95% success (200), 3% client error (400), 2% server error (500)
-                status_code = random.choices(['200', '400', '404', '500'], weights=[95, 2, 1, 2])[0]
-                
-                # Request duration (faster for GET, slower for POST)
-                if method == 'GET':
-                    duration = random.uniform(0.01, 0.5)
-                else:
-                    duration = random.uniform(0.1, 2.0)
-                
-                request_duration.labels(endpoint=endpoint, method=method, environment=ENVIRONMENT).observe(duration)
-                api_requests.labels(
-                    endpoint=endpoint,
-                    method=method,
-                    status_code=status_code,
-                    environment=ENVIRONMENT
-                ).inc()
-            
-            # Simulate login attempts
-            login_status = random.choices(['success', 'failed'], weights=[97, 3])[0]
-            login_method = random.choice(['password', 'biometric', 'otp', 'sso'])
-            login_attempts.labels(status=login_status, method=login_method, environment=ENVIRONMENT).inc()
-            
-            if login_status == 'failed':
-                reason = random.choice(['invalid_credentials', 'account_locked', 'expired_session'])
-                failed_login_attempts.labels(reason=reason, environment=ENVIRONMENT).inc()
-            
-            # Simulate occasional errors (environment-specific rate)
-            if random.random() < error_rate:
-                error_type = random.choice(error_types)
-                # Production has fewer critical errors
-                if ENVIRONMENT == 'production':
-                    severity = random.choices(['low', 'medium', 'high', 'critical'], weights=[50, 35, 13, 2])[0]
-                elif ENVIRONMENT == 'staging':
-                    severity = random.choices(['low', 'medium', 'high', 'critical'], weights=[40, 35, 20, 5])[0]
-                else:  # development or training
-                    severity = random.choices(['low', 'medium', 'high', 'critical'], weights=[30, 35, 25, 10])[0]
-                api_errors.labels(error_type=error_type, severity=severity, environment=ENVIRONMENT).inc()
-            
-            # Simulate fraud alerts (environment-specific rate)
-            if random.random() < fraud_rate:
-                alert_type = random.choice(fraud_types)
-                # Production has more critical fraud alerts
-                if ENVIRONMENT == 'production':
-                    severity = random.choices(['low', 'medium', 'high', 'critical'], weights=[20, 30, 35, 15])[0]
-                elif ENVIRONMENT == 'staging':
-                    severity = random.choices(['low', 'medium', 'high', 'critical'], weights=[30, 40, 25, 5])[0]
-                else:  # development or training
-                    severity = random.choices(['low', 'medium', 'high', 'critical'], weights=[40, 35, 20, 5])[0]
-                fraud_alerts.labels(alert_type=alert_type, severity=severity, environment=ENVIRONMENT).inc()
-            
-            # Simulate database connections
-            for pool in ['primary', 'replica', 'analytics']:
-                connections = random.randint(5, 50)
-                database_connections.labels(pool=pool, environment=ENVIRONMENT).set(connections)
-            
-            # Simulate database queries
-            query_types = ['select', 'insert', 'update', 'delete']
-            for query_type in query_types:
-                duration = random.uniform(0.001, 0.5)
-                database_query_duration.labels(query_type=query_type, environment=ENVIRONMENT).observe(duration)
-            
-            # Simulate business metrics (environment-specific)
-            revenue_variation = random.uniform(0.9, 1.1)
-            daily_revenue.labels(environment=ENVIRONMENT).set(base_revenue * revenue_variation)
-            
-            # Customer satisfaction (environment-specific ranges)
-            if ENVIRONMENT == 'production':
-                satisfaction = random.uniform(92, 98)  # Higher satisfaction in production
-            elif ENVIRONMENT == 'staging':
-                satisfaction = random.uniform(88, 96)  # Similar to production
-            elif ENVIRONMENT == 'development':
-                satisfaction = random.uniform(80, 92)  # Lower in development (testing)
-            else:  # training
-                satisfaction = random.uniform(85, 95)  # Balanced for training
-            customer_satisfaction.labels(environment=ENVIRONMENT).set(satisfaction)
-            
-            # Log progress every 100 iterations
-            if iteration % 100 == 0:
-                logger.info(f"Metrics simulation running... (iteration {iteration})")
-            
-            # Wait before next iteration (0.5-2 seconds)
-            time.sleep(random.uniform(0.5, 2.0))
-            
-        except Exception as e:
-            logger.error(f"Error in metrics simulation: {e}")
-            time.sleep(1)
+# ============================================
+# Batch Simulation (one tick of events at a time)
+# ============================================
+def simulate_transactions(num_transactions, profile, environment, rng=random):
+    """Generate a tick of transactions and apply them in aggregated form
+
+    Returns the types, statuses and amounts of the tick's transactions, in
+    order, for the fraud rules.
+    """
+    if num_transactions <= 0:
+        return [], [], []
+    types = profile.transaction_types.draw_many(num_transactions, rng)
+    statuses = profile.transaction_statuses.draw_many(num_transactions, rng)
+    channels = profile.channels.draw_many(num_transactions, rng)
+
+    # One inc(n) per label set
+    for (trans_type, status, channel), count in Tally(zip(types, statuses, channels)).items():
+        transactions_processed.labels(
+            transaction_type=trans_type,
+            status=status,
+            channel=channel,
+            environment=environment
+        ).inc(count)
+
+    # One bulk bucket update per transaction type
+    drawn = {}
+    for trans_type, count in Tally(types).items():
+        values = profile.transaction_amounts[trans_type].draw_many(count, rng)
+        observe_many(transaction_amount.labels(transaction_type=trans_type, environment=environment), values)
+        drawn[trans_type] = iter(values)
+    return types, statuses, [next(drawn[trans_type]) for trans_type in types]
+
+
+def simulate_api_requests(num_requests, profile, environment, rng=random):
+    """Generate a tick of API requests and apply them in aggregated form"""
+    if num_requests <= 0:
+        return
+    endpoints = profile.endpoints.draw_many(num_requests, rng)
+    methods = profile.methods.draw_many(num_requests, rng)
+    status_codes = profile.status_codes.draw_many(num_requests, rng)
+
+    for (endpoint, method, status_code), count in Tally(zip(endpoints, methods, status_codes)).items():
+        api_requests.labels(
+            endpoint=endpoint,
+            method=method,
+            status_code=status_code,
+            environment=environment
+        ).inc(count)
+
+    # Request duration (per-method distribution, faster for GET)
+    for (endpoint, method), count in Tally(zip(endpoints, methods)).items():
+        observe_many(
+            request_duration.labels(endpoint=endpoint, method=method, environment=environment),
+            profile.request_durations[method].draw_many(count, rng)
+        )
+
+
+# ============================================
+# Fraud Detection (streaming rules, see fraud_engine.py)
+# ============================================
+DECLINED_STATUSES = {'failed', 'cancelled'}
+HOME_POSITIONS = list(CITIES.values())
+FOREIGN_POSITIONS = list(FOREIGN_LOCATIONS.values())
+FRAUD_SCENARIOS = ('velocity', 'location', 'amount')
+FRAUD_AMOUNT_MIN_HISTORY = 5
+# Completed transactions per client and type drawn as history before the simulation starts
+FRAUD_BASELINE_HISTORY = 20
+# Rule alert -> (alert_type, severity) labels of ebanking_fraud_alerts_total
+ALERT_LABELS = {
+    'Velocity': ('velocity', 'high'),
+    'Location': ('unusual_location', 'critical'),
+    'Amount': ('suspicious_amount', 'high'),
+}
+
+
+def detect_fraud(engine, types, statuses, amounts, profile, environment, timestamp, rng=random,
+                 limit=FRAUD_MAX_PER_TICK):
+    """Run a tick of transactions through the fraud rules and count the alerts
+
+    Each transaction belongs to one of `profile.clients` clients, located in
+    its home city. A share `profile.fraud_rate` of them starts a fraud
+    scenario: a burst of transactions (velocity), a transaction from abroad
+    (location) or an outsized amount (amount). Alerts come from the rules,
+    not from the scenarios, so ordinary traffic can trip them too.
+
+    Simulated amounts are not client-specific (a client's withdrawals and
+    transfers come from very different distributions), so the amount rule
+    compares each transaction with the client's baseline for its type.
+
+    The rules cost ~10-40 us per transaction (more while client baselines
+    are first filled), so a tick above `limit` transactions (TARGET_TPS)
+    only checks a uniform sample of `limit` of them, in order;
+    ebanking_fraud_checked_transactions_total counts what was checked.
+    """
+    transactions = zip(types, statuses, amounts)
+    if len(types) > limit:
+        picked = sorted(rng.sample(range(len(types)), limit))
+        transactions = ((types[i], statuses[i], amounts[i]) for i in picked)
+    fraud_checked_transactions.labels(environment=environment).inc(min(len(types), limit))
+
+    alerts = Tally()
+    clients = profile.clients
+    fraud_rate = profile.fraud_rate
+    process = engine.process
+    for trans_type, status, amount in transactions:
+        client = rng.randrange(clients)
+        declined = status in DECLINED_STATUSES
+        latitude, longitude = HOME_POSITIONS[client % len(HOME_POSITIONS)]
+        repeat = 1
+        if rng.random() < fraud_rate:
+            scenario = rng.choice(FRAUD_SCENARIOS)
+            if scenario == 'velocity':
+                repeat = engine.velocity_max
+            elif scenario == 'location':
+                # Seen at home, then abroad a moment later
+                for alert in process(None, client, amount, timestamp, latitude, longitude, declined, trans_type):
+                    alerts[alert.alert_type] += 1
+                latitude, longitude = rng.choice(FOREIGN_POSITIONS)
+            else:
+                amount = max(amount * rng.uniform(20, 50), 5000)
+        for _ in range(repeat):
+            for alert in process(None, client, amount, timestamp, latitude, longitude, declined, trans_type):
+                alerts[alert.alert_type] += 1
+
+    for alert_type, count in alerts.items():
+        label, severity = ALERT_LABELS[alert_type]
+        fraud_alerts.labels(alert_type=label, severity=severity, environment=environment).inc(count)
+
+
+# ============================================
+# Simulated Environments
+# ============================================
+CURRENCIES = ['EUR', 'USD', 'GBP', 'CHF']
+ACCOUNT_TYPES = ['checking', 'savings', 'business', 'investment']
+
+
+def parse_environments(spec):
+    """Parse "environment[:region[:cluster[:profile]]]" entries into (environment, region, cluster, profile)"""
+    targets = []
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        parts = entry.split(':')
+        environment = parts[0]
+        region = parts[1] if len(parts) > 1 and parts[1] else REGION
+        cluster = parts[2] if len(parts) > 2 and parts[2] else CLUSTER
+        profile = parts[3] if len(parts) > 3 and parts[3] else environment
+        if any(t[0] == environment for t in targets):
+            raise ValueError(f"Environment '{environment}' is listed twice in ENVIRONMENTS")
+        targets.append((environment, region, cluster, profile))
+    if not targets:
+        raise ValueError("ENVIRONMENTS does not define any environment")
+    return targets
+
+
+class SimulationTarget:
+    """One simulated environment: its own profile and state, sharing the process registry"""
+
+    def __init__(self, environment, region, cluster, profile=None, seed=None, clock=None):
+        self.environment = environment
+        self.region = region
+        self.cluster = cluster
+        profile = profile or environment
+        if profile not in PROFILES.profiles:
+            logger.warning(f"Unknown profile '{profile}' for {environment}, using 'training'")
+        self.profile = PROFILES.get(profile)
+        if self.profile is None:
+            raise ValueError(f"No profile '{profile}' (and no 'training' fallback) in the profile file")
+
+        # One random stream per concern: a seeded run replays identically
+        self.volume_rng = stream_rng(seed, environment, 'volume')
+        self.transaction_rng = stream_rng(seed, environment, 'transactions')
+        self.request_rng = stream_rng(seed, environment, 'requests')
+        self.gauge_rng = stream_rng(seed, environment, 'gauges')
+        self.event_rng = stream_rng(seed, environment, 'events')
+        self.schedule_rng = stream_rng(seed, environment, 'schedule')
+        self.fraud_rng = stream_rng(seed, environment, 'fraud')
+
+        # Per-client fraud rule state, for this environment's client population. Simulated
+        # amounts are spread widely, so the amount rule waits for a few completed transactions;
+        # with thousands of clients few would ever reach them, so each one starts with a history.
+        self.baseline_rng = stream_rng(seed, environment, 'baselines')
+        self.fraud_engine = FraudEngine(amount_min_history=FRAUD_AMOUNT_MIN_HISTORY, max_clients=self.profile.clients,
+                                        baseline_history=self.baseline_history)
+
+        # Simulation state
+        self.clock = clock or RealClock()
+        self.iteration = 0
+        self.last_tick = self.clock.now()
+        self.tps_budget = 0.0
+
+        app_info.labels(environment=environment, region=region, cluster=cluster).info({
+            'version': '1.0.0',
+            'service': SERVICE_NAME,
+            'organization': 'Data2AI Academy'
+        })
+        logger.info(f"[{environment}] {self.profile.banner} (region={region}, cluster={cluster})")
+
+    def baseline_history(self, client, trans_type):
+        """Earlier completed amounts of a client for one transaction type, from the profile"""
+        return self.profile.transaction_amounts[trans_type].draw_many(FRAUD_BASELINE_HISTORY, self.baseline_rng)
+
+    def tick(self):
+        """Simulate one iteration of metrics for this environment"""
+        profile = self.profile
+        environment = self.environment
+        gauge_rng = self.gauge_rng
+        event_rng = self.event_rng
+        self.iteration += 1
+        iteration = self.iteration
+
+        # Simulate transaction processing (environment-specific volume)
+        now = self.clock.now()
+        if TARGET_TPS > 0:
+            # Carry the fractional part so the long-run rate is exact
+            self.tps_budget += TARGET_TPS * (now - self.last_tick)
+            num_transactions = int(self.tps_budget)
+            self.tps_budget -= num_transactions
+        else:
+            num_transactions = int(self.volume_rng.randint(2, 5) * profile.transaction_multiplier)
+        self.last_tick = now
+        with tracing.start_span('simulate_transactions', transactions=num_transactions):
+            types, statuses, amounts = simulate_transactions(num_transactions, profile, environment,
+                                                             self.transaction_rng)
+        with tracing.start_span('detect_fraud', transactions=num_transactions):
+            detect_fraud(self.fraud_engine, types, statuses, amounts, profile, environment,
+                         self.clock.timestamp(), self.fraud_rng, FRAUD_MAX_PER_TICK)
+
+        # Simulate active sessions (varies by time of day simulation, environment-specific)
+        base_sessions = profile.base_sessions
+        hour_factor = (iteration % 24) / 24.0
+        sessions = base_sessions + int(base_sessions * abs(0.5 - hour_factor) * 2)  # Peak at noon
+        active_sessions.labels(environment=environment).set(sessions + gauge_rng.randint(-20, 20))
+
+        # Simulate session durations
+        session_duration.labels(environment=environment).observe(profile.session_durations.draw(gauge_rng))
+
+        # Simulate account balances
+        for currency in CURRENCIES:
+            for acc_type in ACCOUNT_TYPES:
+                balance = gauge_rng.uniform(1000, 500000)
+                account_balance.labels(
+                    currency=currency,
+                    account_type=acc_type,
+                    environment=environment
+                ).set(balance)
+
+        # Simulate active accounts
+        for acc_type in ACCOUNT_TYPES:
+            count = gauge_rng.randint(100, 1000)
+            active_accounts.labels(account_type=acc_type, environment=environment).set(count)
+
+        # Simulate API requests (3-8 requests per iteration by default)
+        num_requests = self.request_rng.randint(*profile.requests_per_tick)
+        with tracing.start_span('simulate_api_requests', requests=num_requests):
+            simulate_api_requests(num_requests, profile, environment, self.request_rng)
+
+        # Simulate login attempts
+        login_status = profile.login_statuses.draw(event_rng)
+        login_method = profile.login_methods.draw(event_rng)
+        login_attempts.labels(status=login_status, method=login_method, environment=environment).inc()
+
+        if login_status == 'failed':
+            reason = profile.login_failure_reasons.draw(event_rng)
+            failed_login_attempts.labels(reason=reason, environment=environment).inc()
+
+        # Simulate occasional errors (environment-specific rate and severity)
+        if event_rng.random() < profile.error_rate:
+            error_type = profile.error_types.draw(event_rng)
+            api_errors.labels(
+                error_type=error_type,
+                severity=profile.error_severities.draw(event_rng),
+                environment=environment
+            ).inc()
+            tracing.set_error(f"Simulated API error: {error_type}")
+
+        # Simulate database connections
+        for pool in ['primary', 'replica', 'analytics']:
+            connections = gauge_rng.randint(5, 50)
+            database_connections.labels(pool=pool, environment=environment).set(connections)
+
+        # Simulate database queries
+        for query_type in ['select', 'insert', 'update', 'delete']:
+            duration = profile.query_durations.draw(gauge_rng)
+            database_query_duration.labels(query_type=query_type, environment=environment).observe(duration)
+
+        # Simulate business metrics (environment-specific)
+        revenue_variation = gauge_rng.uniform(0.9, 1.1)
+        daily_revenue.labels(environment=environment).set(profile.base_revenue * revenue_variation)
+
+        # Customer satisfaction (environment-specific ranges)
+        customer_satisfaction.labels(environment=environment).set(gauge_rng.uniform(*profile.satisfaction_range))
+
+        # Log progress every 100 iterations
+        if iteration % 100 == 0:
+            logger.info(f"[{environment}] Metrics simulation running... (iteration {iteration})")
+
+
+def build_targets(clock=None, seed=SIMULATION_SEED, environments=ENVIRONMENTS):
+    """Create one SimulationTarget per entry of ENVIRONMENTS"""
+    return [SimulationTarget(*spec, seed=seed, clock=clock) for spec in parse_environments(environments)]
+
+
+class TickScheduler:
+    """Earliest-deadline-first scheduler for the ticks of several targets
+
+    Each environment ticks every 0.5-2 seconds. Ticks are scheduled from one
+    heap, so all environments share one thread fairly. Time is read from the
+    clock (wall clock by default).
+    """
+
+    def __init__(self, targets, clock=None):
+        self.clock = clock or RealClock()
+        start = self.clock.now()
+        # (next tick time, tie-breaker, target)
+        self.schedule = [(start, i, target) for i, target in enumerate(targets)]
+        heapq.heapify(self.schedule)
+
+    def run_until(self, until=None):
+        """Run ticks due before `until` (forever if None); the clock ends at `until`"""
+        clock = self.clock
+        schedule = self.schedule
+        while until is None or schedule[0][0] < until:
+            due, i, target = heapq.heappop(schedule)
+            clock.sleep(due - clock.now())
+            try:
+                with tracing.start_span('simulation.tick', environment=target.environment,
+                                        iteration=target.iteration + 1):
+                    target.tick()
+                # Wait before next iteration (0.5-2 seconds)
+                next_due = clock.now() + target.schedule_rng.uniform(0.5, 2.0)
+            except Exception as e:
+                logger.error(f"[{target.environment}] Error in metrics simulation: {e}")
+                next_due = clock.now() + 1
+            heapq.heappush(schedule, (next_due, i, target))
+        clock.sleep(until - clock.now())
+
+
+def simulate_realistic_metrics(targets=None, clock=None, until=None):
+    """Simulate realistic eBanking metrics for every configured environment
+
+    With `until` set the loop returns once the clock reaches it.
+    """
+    if targets is None:
+        targets = build_targets(clock)
+    logger.info(f"Starting eBanking metrics simulation for {len(targets)} environment(s)...")
+    TickScheduler(targets, clock).run_until(until)
+
+
+def prepare_offline_registry():
+    """Drop series that depend on the host rather than the seed (offline runs)"""
+    disable_created_metrics()
+    for collector in (GC_COLLECTOR, PLATFORM_COLLECTOR, PROCESS_COLLECTOR):
+        REGISTRY.unregister(collector)
+
+
+def run_virtual_simulation(duration=SIMULATION_DURATION, start=SIMULATION_START, output=SIMULATION_OUTPUT):
+    """Run `duration` simulated seconds at CPU speed and write the final exposition"""
+    prepare_offline_registry()
+    clock = VirtualClock(start)
+    simulate_realistic_metrics(build_targets(clock), clock, until=start + duration)
+    body = generate_latest()
+    if output == '-':
+        sys.stdout.buffer.write(body)
+    else:
+        with open(output, 'wb') as f:
+            f.write(body)
+        logger.info(f"✓ Wrote final exposition of {duration:.0f} simulated seconds to {output}")
 
 
 if __name__ == '__main__':
+    if VIRTUAL_TIME:
+        logger.info(f"Virtual-time run: {SIMULATION_DURATION:.0f}s simulated, seed={SIMULATION_SEED}")
+        run_virtual_simulation()
+        sys.exit(0)
+
     # Start Prometheus metrics server on port 9200
     port = 9200
     logger.info("=" * 60)
@@ -396,6 +588,10 @@ if __name__ == '__main__':
     
     start_http_server(port)
     logger.info(f"✓ Metrics available at http://0.0.0.0:{port}/metrics")
+    if MSSQL_METRICS:
+        import mssql_exporter
+        mssql_exporter.start_poller(ENVIRONMENT)
+    tracing.setup_tracing(SERVICE_NAME, ENVIRONMENT)
     logger.info("✓ Starting realistic eBanking metrics simulation...")
     logger.info("=" * 60)
     
@@ -0,0 +1,104 @@
+"""
+Shared MSSQL access for the eBanking tools
+
+- MSSQL_CONFIG: connection settings from the environment, matching the
+  `mssql` service in docker-compose.yml
+- ConnectionPool: a fixed set of pyodbc connections handed out to threads,
+  so workers never pay the login handshake per call
+
+pyodbc is optional (requirements-mssql.txt) and needs the Microsoft ODBC
+driver; the simulation exporter does not import this module.
+"""
+
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+try:
+    import pyodbc
+except ImportError:  # optional dependency
+    pyodbc = None
+
+logger = logging.getLogger(__name__)
+
+MSSQL_CONFIG = {
+    "host": os.getenv("MSSQL_HOST", "mssql"),
+    "port": int(os.getenv("MSSQL_PORT", "1433")),
+    "user": os.getenv("MSSQL_USER", "sa"),
+    "password": os.getenv("MSSQL_SA_PASSWORD", "EBanking@Secure123!"),
+    "database": os.getenv("MSSQL_DATABASE", "EBankingDB"),
+    "driver": os.getenv("MSSQL_ODBC_DRIVER", "ODBC Driver 18 for SQL Server"),
+}
+
+
+def connection_string(config: dict = None) -> str:
+    config = config or MSSQL_CONFIG
+    return (f"DRIVER={{{config['driver']}}};SERVER={config['host']},{config['port']};"
+            f"DATABASE={config['database']};UID={config['user']};PWD={config['password']};"
+            "Encrypt=yes;TrustServerCertificate=yes")
+
+
+def connect(config: dict = None, autocommit: bool = True):
+    """Open one connection (raises RuntimeError when pyodbc is not available)"""
+    if pyodbc is None:
+        raise RuntimeError("pyodbc is not available: pip install -r requirements-mssql.txt (needs the ODBC driver)")
+    return pyodbc.connect(connection_string(config), autocommit=autocommit)
+
+
+class ConnectionPool:
+    """Fixed-size, thread-safe pool of pyodbc connections
+
+    Connections are opened lazily up to `size`. A connection whose `with`
+    block raised is closed instead of being returned, and the next borrower
+    opens a fresh one, so a database restart does not poison the pool.
+    """
+
+    def __init__(self, size: int = 8, config: dict = None, autocommit: bool = True):
+        self.size = size
+        self.config = config or MSSQL_CONFIG
+        self.autocommit = autocommit
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._connections = set()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a `with` block"""
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = connect(self.config, self.autocommit)
+                with self._lock:
+                    self._connections.add(conn)
+            try:
+                yield conn
+            except BaseException:
+                # The connection may be mid-statement or broken: do not reuse it
+                self._discard(conn)
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn):
+        with self._lock:
+            self._connections.discard(conn)
+        try:
+            conn.close()
+        except pyodbc.Error:
+            pass
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            try:
+                conn.close()
+            except pyodbc.Error as e:
+                logger.debug(f"Error closing MSSQL connection: {e}")
+        self._idle = queue.LifoQueue()
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Prometheus exporter for the eBanking MSSQL database
+
+Replaces per-panel calls to sp_GetDashboardMetrics and sp_GetTransactionTrends
+with one poller whose results every dashboard viewer shares:
+
+- every MSSQL_POLL_INTERVAL seconds, only the Transactions and FraudAlerts
+  rows above a high-water mark (TransactionID / AlertID) are aggregated, by
+  minute and label set, with a range seek on the primary key
+- the deltas feed counters (ebanking_mssql_*_total) and running per-minute
+  totals over the last MSSQL_WINDOW_MINUTES, from which the window gauges
+  (what sp_GetDashboardMetrics returns) are set without rescanning the table
+- every MSSQL_PROCEDURE_INTERVAL seconds the procedures themselves run, for
+  what cannot be derived from new rows: alerts still open, the riskiest
+  clients and the last complete trend interval
+
+Rows are read once they are MSSQL_POLL_LAG seconds old, so transactions
+still being processed by sp_ProcessTransaction (identity assigned, not yet
+committed) are not skipped by the high-water mark.
+
+    python mssql_exporter.py                 # serve on :9202
+    MSSQL_METRICS=true python main.py        # or inside the simulation exporter, on :9200
+"""
+
+import argparse
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from mssql_common import ConnectionPool, MSSQL_CONFIG, pyodbc
+
+logger = logging.getLogger('mssql_exporter')
+
+ENVIRONMENT = os.getenv('ENVIRONMENT', 'training')
+POLL_INTERVAL = float(os.getenv('MSSQL_POLL_INTERVAL', '15'))
+PROCEDURE_INTERVAL = float(os.getenv('MSSQL_PROCEDURE_INTERVAL', '300'))
+WINDOW_MINUTES = int(os.getenv('MSSQL_WINDOW_MINUTES', '60'))
+POLL_LAG = int(os.getenv('MSSQL_POLL_LAG', '5'))
+TREND_INTERVAL_MINUTES = int(os.getenv('MSSQL_TREND_INTERVAL_MINUTES', '15'))
+
+# DATEDIFF(MINUTE, 0, x) counts minutes from 1900-01-01
+MINUTE_EPOCH = datetime(1900, 1, 1)
+
+# New rows since the high-water mark, up to the newest row at least POLL_LAG seconds old
+TRANSACTIONS_HIGH_WATER = """
+SELECT GETDATE() AS Now, MAX(TransactionID) AS HighWater
+FROM Transactions
+WHERE TransactionID > ? AND TransactionDate < DATEADD(SECOND, -?, GETDATE())
+"""
+
+TRANSACTIONS_DELTA = """
+SELECT DATEDIFF(MINUTE, 0, TransactionDate) AS Minute, Status, Channel, TransactionType,
+       COUNT(*) AS Count, SUM(Amount) AS Amount,
+       SUM(CAST(ProcessingTime AS BIGINT)) AS ProcessingMs, COUNT(ProcessingTime) AS Processed,
+       SUM(FraudScore) AS FraudScore, SUM(CAST(IsFraudulent AS INT)) AS Fraudulent
+FROM Transactions
+WHERE TransactionID > ? AND TransactionID <= ?
+GROUP BY DATEDIFF(MINUTE, 0, TransactionDate), Status, Channel, TransactionType
+"""
+
+ALERTS_HIGH_WATER = """
+SELECT GETDATE() AS Now, MAX(AlertID) AS HighWater
+FROM FraudAlerts
+WHERE AlertID > ? AND DetectedAt < DATEADD(SECOND, -?, GETDATE())
+"""
+
+ALERTS_DELTA = """
+SELECT DATEDIFF(MINUTE, 0, DetectedAt) AS Minute, AlertType, Severity,
+       COUNT(*) AS Count, SUM(RiskScore) AS RiskScore
+FROM FraudAlerts
+WHERE AlertID > ? AND AlertID <= ?
+GROUP BY DATEDIFF(MINUTE, 0, DetectedAt), AlertType, Severity
+"""
+
+# Starting point: the last row before the window, so the first poll fills the window
+INITIAL_HIGH_WATER = {
+    "Transactions": "SELECT ISNULL(MAX(TransactionID), 0) FROM Transactions "
+                    "WHERE TransactionDate < DATEADD(MINUTE, -?, GETDATE())",
+    "FraudAlerts": "SELECT ISNULL(MAX(AlertID), 0) FROM FraudAlerts "
+                   "WHERE DetectedAt < DATEADD(MINUTE, -?, GETDATE())",
+}
+
+# ========================
+# PROMETHEUS METRICS
+# ========================
+
+mssql_transactions = Counter(
+    'ebanking_mssql_transactions_total',
+    'Transactions recorded in the MSSQL database',
+    ['status', 'channel', 'transaction_type', 'environment']
+)
+
+mssql_transaction_amount = Counter(
+    'ebanking_mssql_transaction_amount_tnd_total',
+    'Amount of the transactions recorded in the MSSQL database (TND)',
+    ['status', 'channel', 'transaction_type', 'environment']
+)
+
+mssql_fraudulent_transactions = Counter(
+    'ebanking_mssql_fraudulent_transactions_total',
+    'Transactions marked IsFraudulent in the MSSQL database',
+    ['channel', 'transaction_type', 'environment']
+)
+
+mssql_fraud_alerts = Counter(
+    'ebanking_mssql_fraud_alerts_total',
+    'Rows added to FraudAlerts',
+    ['alert_type', 'severity', 'environment']
+)
+
+window_transactions = Gauge(
+    'ebanking_mssql_window_transactions',
+    'Transactions in the dashboard window, by status',
+    ['status', 'environment']
+)
+
+window_channel_transactions = Gauge(
+    'ebanking_mssql_window_channel_transactions',
+    'Transactions in the dashboard window, by channel',
+    ['channel', 'environment']
+)
+
+window_channel_amount = Gauge(
+    'ebanking_mssql_window_channel_amount_tnd',
+    'Amount of the transactions in the dashboard window, by channel (TND)',
+    ['channel', 'environment']
+)
+
+window_avg_amount = Gauge(
+    'ebanking_mssql_window_avg_amount_tnd',
+    'Average transaction amount in the dashboard window (TND)',
+    ['environment']
+)
+
+window_avg_processing_time = Gauge(
+    'ebanking_mssql_window_avg_processing_time_seconds',
+    'Average ProcessingTime of the transactions in the dashboard window',
+    ['environment']
+)
+
+window_avg_fraud_score = Gauge(
+    'ebanking_mssql_window_avg_fraud_score',
+    'Average FraudScore of the transactions in the dashboard window',
+    ['environment']
+)
+
+window_fraud_alerts = Gauge(
+    'ebanking_mssql_window_fraud_alerts',
+    'Fraud alerts detected in the dashboard window, by severity',
+    ['severity', 'environment']
+)
+
+window_avg_risk_score = Gauge(
+    'ebanking_mssql_window_avg_risk_score',
+    'Average RiskScore of the fraud alerts in the dashboard window',
+    ['environment']
+)
+
+open_fraud_alerts = Gauge(
+    'ebanking_mssql_open_fraud_alerts',
+    'Fraud alerts of the dashboard window still open (sp_GetDashboardMetrics)',
+    ['environment']
+)
+
+risky_client_score = Gauge(
+    'ebanking_mssql_risky_client_score',
+    'RiskScore of the ten riskiest clients (sp_GetDashboardMetrics)',
+    ['client_code', 'environment']
+)
+
+trend_transactions = Gauge(
+    'ebanking_mssql_trend_transactions',
+    'Transactions of the last complete trend interval (sp_GetTransactionTrends)',
+    ['environment']
+)
+
+trend_amount = Gauge(
+    'ebanking_mssql_trend_amount_tnd',
+    'Amount of the last complete trend interval (sp_GetTransactionTrends)',
+    ['environment']
+)
+
+trend_fraudulent = Gauge(
+    'ebanking_mssql_trend_fraudulent_transactions',
+    'Fraudulent transactions of the last complete trend interval (sp_GetTransactionTrends)',
+    ['environment']
+)
+
+high_water_mark = Gauge(
+    'ebanking_mssql_high_water_mark',
+    'Last row ID aggregated by the exporter',
+    ['table', 'environment']
+)
+
+poll_duration = Histogram(
+    'ebanking_mssql_poll_duration_seconds',
+    'Time spent on one exporter query',
+    ['query', 'environment'],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+)
+
+poll_errors = Counter(
+    'ebanking_mssql_poll_errors_total',
+    'Exporter queries that failed',
+    ['query', 'environment']
+)
+
+
+class MinuteWindow:
+    """Running totals per key over the last `minutes` minutes of per-minute buckets
+
+    Values are lists of numbers added element-wise. Adding to a minute adds to
+    the running totals; advance() subtracts the minutes leaving the window, so
+    reading the window never rescans the buckets.
+    """
+
+    def __init__(self, minutes: int, width: int):
+        self.minutes = minutes
+        self.width = width
+        self.buckets = {}                  # minute -> {key: [values]}
+        self.totals = defaultdict(lambda: [0.0] * width)
+        self.current = None                # latest minute seen (database clock)
+
+    def advance(self, minute: int):
+        self.current = minute if self.current is None else max(self.current, minute)
+        oldest = self.current - self.minutes
+        for expired in [m for m in self.buckets if m <= oldest]:
+            for key, values in self.buckets.pop(expired).items():
+                totals = self.totals[key]
+                for i, value in enumerate(values):
+                    totals[i] -= value
+
+    def add(self, minute: int, key, values):
+        """Account for `values` at `minute`; minutes already outside the window are ignored"""
+        if self.current is not None and minute <= self.current - self.minutes:
+            return
+        bucket = self.buckets.setdefault(minute, {})
+        current = bucket.get(key)
+        if current is None:
+            current = bucket[key] = [0.0] * self.width
+        totals = self.totals[key]
+        for i, value in enumerate(values):
+            current[i] += value
+            totals[i] += value
+
+    def sum_by(self, index: int) -> dict:
+        """Totals grouped by one element of the key"""
+        grouped = defaultdict(lambda: [0.0] * self.width)
+        for key, values in self.totals.items():
+            target = grouped[key[index]]
+            for i, value in enumerate(values):
+                target[i] += value
+        return grouped
+
+
+class MSSQLPoller:
+    """Incremental aggregation of Transactions and FraudAlerts, plus scheduled procedure calls"""
+
+    def __init__(self, pool: ConnectionPool, environment: str = ENVIRONMENT,
+                 window_minutes: int = WINDOW_MINUTES, lag: int = POLL_LAG):
+        self.pool = pool
+        self.environment = environment
+        self.window_minutes = window_minutes
+        self.lag = lag
+        self.high_water = {}
+        # (status, channel) -> count, amount, processing ms, processed count, fraud score
+        self.transactions = MinuteWindow(window_minutes, 5)
+        # (severity,) -> count, risk score
+        self.alerts = MinuteWindow(window_minutes, 2)
+        self._risky_clients = set()
+
+    def _timed(self, query: str, cursor, sql: str, *params):
+        started = time.perf_counter()
+        cursor.execute(sql, *params)
+        rows = cursor.fetchall()
+        poll_duration.labels(query=query, environment=self.environment).observe(time.perf_counter() - started)
+        return rows
+
+    def _delta(self, cursor, table: str, high_water_sql: str, delta_sql: str):
+        """Rows of `table` past the high-water mark, and the database's current minute"""
+        if table not in self.high_water:
+            cursor.execute(INITIAL_HIGH_WATER[table], self.window_minutes)
+            self.high_water[table] = cursor.fetchone()[0]
+            logger.info(f"{table}: starting after row {self.high_water[table]} (last {self.window_minutes} minutes)")
+        now, new_high_water = self._timed(f"{table}_high_water", cursor, high_water_sql,
+                                          self.high_water[table], self.lag)[0]
+        now_minute = int((now - MINUTE_EPOCH).total_seconds() // 60)
+        if new_high_water is None:
+            return [], now_minute
+        rows = self._timed(f"{table}_delta", cursor, delta_sql, self.high_water[table], new_high_water)
+        self.high_water[table] = new_high_water
+        high_water_mark.labels(table=table, environment=self.environment).set(new_high_water)
+        return rows, now_minute
+
+    def poll(self):
+        """Aggregate the rows added since the last poll"""
+        environment = self.environment
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            rows, now_minute = self._delta(cursor, "Transactions", TRANSACTIONS_HIGH_WATER, TRANSACTIONS_DELTA)
+            self.transactions.advance(now_minute)
+            for row in rows:
+                # Lower-case label values, like the simulated ebanking_* metrics
+                status, channel, transaction_type = row.Status.lower(), row.Channel.lower(), row.TransactionType.lower()
+                labels = dict(status=status, channel=channel, transaction_type=transaction_type,
+                              environment=environment)
+                mssql_transactions.labels(**labels).inc(row.Count)
+                mssql_transaction_amount.labels(**labels).inc(float(row.Amount or 0))
+                if row.Fraudulent:
+                    mssql_fraudulent_transactions.labels(
+                        channel=channel, transaction_type=transaction_type,
+                        environment=environment).inc(row.Fraudulent)
+                self.transactions.add(row.Minute, (status, channel), (
+                    row.Count, float(row.Amount or 0), float(row.ProcessingMs or 0),
+                    row.Processed, float(row.FraudScore or 0)))
+
+            rows, now_minute = self._delta(cursor, "FraudAlerts", ALERTS_HIGH_WATER, ALERTS_DELTA)
+            self.alerts.advance(now_minute)
+            for row in rows:
+                severity = row.Severity.lower()
+                mssql_fraud_alerts.labels(alert_type=row.AlertType.lower(), severity=severity,
+                                          environment=environment).inc(row.Count)
+                self.alerts.add(row.Minute, (severity,), (row.Count, float(row.RiskScore or 0)))
+            cursor.close()
+        self._publish_window()
+
+    def _publish_window(self):
+        """Set the window gauges (keys that left the window keep their series, at 0)"""
+        environment = self.environment
+
+        by_status = self.transactions.sum_by(0)
+        by_channel = self.transactions.sum_by(1)
+        total = [sum(column) for column in zip(*by_status.values())] or [0.0] * 5
+        count, amount, processing_ms, processed, fraud_score = total
+        for status, values in by_status.items():
+            window_transactions.labels(status=status, environment=environment).set(values[0])
+        for channel, values in by_channel.items():
+            window_channel_transactions.labels(channel=channel, environment=environment).set(values[0])
+            window_channel_amount.labels(channel=channel, environment=environment).set(values[1])
+        window_avg_amount.labels(environment=environment).set(amount / count if count else 0)
+        window_avg_processing_time.labels(environment=environment).set(
+            processing_ms / processed / 1000 if processed else 0)
+        window_avg_fraud_score.labels(environment=environment).set(fraud_score / count if count else 0)
+
+        by_severity = self.alerts.sum_by(0)
+        for severity, values in by_severity.items():
+            window_fraud_alerts.labels(severity=severity, environment=environment).set(values[0])
+        alert_count = sum(values[0] for values in by_severity.values())
+        risk_score = sum(values[1] for values in by_severity.values())
+        window_avg_risk_score.labels(environment=environment).set(risk_score / alert_count if alert_count else 0)
+
+    def refresh_procedures(self):
+        """Run the dashboard procedures for the values new rows cannot provide"""
+        environment = self.environment
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            started = time.perf_counter()
+            cursor.execute("EXEC sp_GetDashboardMetrics @TimeRangeMinutes = ?", self.window_minutes)
+            result_sets = [cursor.fetchall()]
+            while cursor.nextset():
+                result_sets.append(cursor.fetchall())
+            poll_duration.labels(query="sp_GetDashboardMetrics", environment=environment).observe(
+                time.perf_counter() - started)
+            # Result sets: transactions, fraud alerts, channels, risky clients
+            if len(result_sets) >= 2 and result_sets[1]:
+                open_fraud_alerts.labels(environment=environment).set(result_sets[1][0].OpenAlerts or 0)
+            if len(result_sets) >= 4:
+                clients = {row.ClientCode: float(row.RiskScore) for row in result_sets[3]}
+                for client_code in self._risky_clients - set(clients):
+                    risky_client_score.remove(client_code, environment)
+                for client_code, score in clients.items():
+                    risky_client_score.labels(client_code=client_code, environment=environment).set(score)
+                self._risky_clients = set(clients)
+
+            # The last hour of trend slots is cheap; the last complete slot is the one before the current
+            rows = self._timed("sp_GetTransactionTrends", cursor,
+                               "EXEC sp_GetTransactionTrends @TimeRangeHours = 1, @IntervalMinutes = ?",
+                               TREND_INTERVAL_MINUTES)
+            if len(rows) >= 2:
+                last = rows[-2]
+                trend_transactions.labels(environment=environment).set(last.TransactionCount)
+                trend_amount.labels(environment=environment).set(float(last.TotalAmount))
+                trend_fraudulent.labels(environment=environment).set(last.FraudulentCount)
+            cursor.close()
+
+    def run(self, stop: threading.Event, interval: float = POLL_INTERVAL,
+            procedure_interval: float = PROCEDURE_INTERVAL):
+        """Poll until `stop` is set; each step survives database errors"""
+        next_procedures = 0.0
+        while not stop.is_set():
+            started = time.monotonic()
+            self._guarded("poll", self.poll)
+            if started >= next_procedures:
+                self._guarded("procedures", self.refresh_procedures)
+                next_procedures = started + procedure_interval
+            stop.wait(max(0.0, interval - (time.monotonic() - started)))
+
+    def _guarded(self, query: str, step):
+        try:
+            step()
+        except Exception as e:
+            # Database errors, and anything else: the poller thread must keep going
+            poll_errors.labels(query=query, environment=self.environment).inc()
+            logger.warning(f"MSSQL {query} failed: {e}")
+
+
+def start_poller(environment: str = ENVIRONMENT) -> threading.Event:
+    """Start polling on a daemon thread (used by main.py); set the returned event to stop"""
+    stop = threading.Event()
+    if pyodbc is None:
+        logger.error("MSSQL polling disabled: pyodbc is not available "
+                     "(pip install -r requirements-mssql.txt, needs the ODBC driver)")
+        return stop
+    poller = MSSQLPoller(ConnectionPool(size=1), environment)
+    threading.Thread(target=poller.run, args=(stop,), name="mssql-poller", daemon=True).start()
+    logger.info(f"Polling {MSSQL_CONFIG['database']} on {MSSQL_CONFIG['host']} every {POLL_INTERVAL:g}s "
+                f"(procedures every {PROCEDURE_INTERVAL:g}s)")
+    return stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export eBanking MSSQL metrics for Prometheus")
+    parser.add_argument("--port", type=int, default=int(os.getenv('MSSQL_EXPORTER_PORT', '9202')),
+                        help="Metrics port (default: 9202)")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="Seconds between incremental polls")
+    parser.add_argument("--procedure-interval", type=float, default=PROCEDURE_INTERVAL,
+                        help="Seconds between procedure calls")
+    parser.add_argument("--environment", default=ENVIRONMENT, help="Value of the environment label")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if pyodbc is None:
+        raise SystemExit("❌ pyodbc is not available: pip install -r requirements-mssql.txt (needs the ODBC driver)")
+    start_http_server(args.port)
+    logger.info(f"✓ Metrics available at http://0.0.0.0:{args.port}/metrics")
+    poller = MSSQLPoller(ConnectionPool(size=1), args.environment)
+    try:
+        poller.run(threading.Event(), args.interval, args.procedure_interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Transaction workload driver for the eBanking MSSQL database
+
+Generates transactions for the clients, merchants and agents seeded by
+mssql/init and sends them at a target rate:
+
+    python mssql_workload.py --tps 200 --duration 10m                 # sp_ProcessTransaction
+    python mssql_workload.py --mode bulk --tps 5000 --batch-size 1000 # plain inserts
+
+- call mode runs sp_ProcessTransaction once per transaction, so every
+  transaction goes through the velocity, location and amount fraud checks
+  and the balance update. Worker threads share a connection pool.
+- bulk mode inserts finished rows with executemany and fast_executemany:
+  one round trip per batch, for dashboard volume. The fraud rules run
+  client side (fraud_engine.py) and set the status and fraud columns; their
+  FraudAlerts rows are inserted in the same database transaction.
+
+Transaction n is due at start + n / tps whichever worker sends it, and each
+call records two latencies: the call itself and the time since it was due
+(which includes queueing when the database falls behind). --anomaly-rate
+mixes in velocity bursts, far-away locations and outsized amounts for the
+fraud procedures to find. With --metrics-port, the latencies are also
+exported for Prometheus.
+"""
+
+import argparse
+import itertools
+import logging
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+
+from prometheus_client import Counter, Histogram, start_http_server
+
+from fraud_engine import CITIES, FOREIGN_LOCATIONS, FraudEngine
+from mssql_common import ConnectionPool, connect, MSSQL_CONFIG, pyodbc
+from replay import stream_rng
+from sampling import CategoricalSampler
+
+logger = logging.getLogger('mssql_workload')
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+TRANSACTION_TYPES = CategoricalSampler(
+    ["Purchase", "Payment", "Transfer", "Withdrawal", "Deposit"], [35, 25, 20, 12, 8])
+CHANNELS = CategoricalSampler(["Mobile", "Web", "POS", "ATM", "Agent"], [40, 20, 20, 12, 8])
+# Transfers, deposits and withdrawals do not go through a merchant
+MERCHANT_TYPES = {"Purchase", "Payment"}
+
+PROCESS_TRANSACTION = """
+SET NOCOUNT ON;
+DECLARE @TransactionID BIGINT;
+EXEC sp_ProcessTransaction
+    @ClientID = ?, @MerchantID = ?, @AgentID = ?, @TransactionType = ?, @Amount = ?,
+    @Channel = ?, @DeviceID = ?, @IPAddress = ?, @Location = ?, @Latitude = ?, @Longitude = ?,
+    @TransactionID = @TransactionID OUTPUT;
+SELECT @TransactionID;
+"""
+
+INSERT_TRANSACTION = """
+INSERT INTO Transactions (
+    TransactionCode, ClientID, MerchantID, AgentID, TransactionType, Amount, Currency, Status,
+    Channel, DeviceID, IPAddress, Location, Latitude, Longitude,
+    FraudScore, IsFraudulent, FraudReason, ProcessingTime, TransactionDate
+) VALUES (?, ?, ?, ?, ?, ?, 'TND', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Alerts of a bulk batch reference their transaction by code (the IDs are assigned by the insert)
+INSERT_ALERT = """
+INSERT INTO FraudAlerts (TransactionID, ClientID, AlertType, Severity, AlertMessage, RiskScore, Status, DetectedAt)
+SELECT TransactionID, ?, ?, ?, ?, ?, 'Open', ? FROM Transactions WHERE TransactionCode = ?
+"""
+
+# How sp_ProcessTransaction and the fraud procedures settle a transaction:
+# impossible travel flags it, an unusual amount holds it (FraudScore > 70 -> Pending)
+SETTLEMENTS = {
+    "Location": ("Flagged", 95.0, True, "Impossible travel pattern"),
+    "Amount": ("Pending", 80.0, False, "Unusual transaction amount"),
+}
+DECLINE_RATE = 0.03
+
+# ========================
+# PROMETHEUS METRICS
+# ========================
+
+workload_call_duration = Histogram(
+    'ebanking_mssql_workload_call_duration_seconds',
+    'Duration of one database call (one transaction in call mode, one batch in bulk mode)',
+    ['mode', 'outcome'],
+    buckets=[0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+)
+
+workload_response_time = Histogram(
+    'ebanking_mssql_workload_response_time_seconds',
+    'Time from when a call was due until it completed (includes queueing behind a slow database)',
+    ['mode'],
+    buckets=[0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+)
+
+workload_transactions = Counter(
+    'ebanking_mssql_workload_transactions_total',
+    'Transactions sent to MSSQL by the workload driver',
+    ['mode', 'outcome']
+)
+
+
+def parse_duration(text: str) -> float:
+    """Parse '300', '10m', '2h' or '1d' into seconds"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhd]?)', text.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid duration: {text!r}")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2) or 's']
+
+
+class LatencyRecorder:
+    """Thread-safe latency histogram with ~1% relative error per bucket
+
+    Latencies land in logarithmic buckets, so memory stays constant however
+    long the run is and percentiles stay within 1% of the exact value.
+    """
+
+    GAMMA = 1.02
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._log_gamma = math.log(self.GAMMA)
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        key = math.ceil(math.log(max(seconds, 1e-6)) / self._log_gamma)
+        with self._lock:
+            self.buckets[key] = self.buckets.get(key, 0) + 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentiles(self, qs=(0.5, 0.9, 0.99, 0.999)) -> dict:
+        with self._lock:
+            buckets = sorted(self.buckets.items())
+            count = self.count
+        result = {}
+        if not count:
+            return {q: 0.0 for q in qs}
+        targets = iter(sorted(qs))
+        q = next(targets)
+        seen = 0
+        for key, n in buckets:
+            seen += n
+            while q is not None and seen >= q * count:
+                # Bucket midpoint: (gamma^(k-1), gamma^k]
+                result[q] = 2 * self.GAMMA ** key / (self.GAMMA + 1)
+                q = next(targets, None)
+            if q is None:
+                break
+        return result
+
+    def summary(self) -> str:
+        if not self.count:
+            return "no calls"
+        p = self.percentiles()
+        return (f"avg={self.total / self.count * 1000:.1f}ms p50={p[0.5] * 1000:.1f}ms "
+                f"p90={p[0.9] * 1000:.1f}ms p99={p[0.99] * 1000:.1f}ms "
+                f"p99.9={p[0.999] * 1000:.1f}ms max={self.max * 1000:.1f}ms")
+
+
+class WorkloadStats:
+    """Counters shared by the workers"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.transactions = 0
+        self.errors = 0
+        self.service = LatencyRecorder()
+        self.response = LatencyRecorder()
+
+    def add(self, transactions: int = 0, errors: int = 0):
+        with self.lock:
+            self.transactions += transactions
+            self.errors += errors
+
+
+class TransactionFactory:
+    """Draws transactions over the seeded clients, merchants and agents"""
+
+    def __init__(self, clients, merchants, agents, anomaly_rate: float = 0.01, seed=None):
+        self.clients = clients      # [(ClientID, City)]
+        self.merchants = merchants  # [MerchantID]
+        self.agents = agents        # [AgentID]
+        self.anomaly_rate = anomaly_rate
+        self.seed = seed
+        self.engine = FraudEngine(max_clients=max(len(clients), 1))
+        self._engine_lock = threading.Lock()
+        self._local = threading.local()
+        self._streams = itertools.count()
+
+    @property
+    def rng(self):
+        """One random stream per worker thread (reproducible with --seed)"""
+        rng = getattr(self._local, "rng", None)
+        if rng is None:
+            if self.seed is None:
+                rng = random.Random()
+            else:
+                rng = stream_rng(self.seed, "mssql-workload", next(self._streams))
+            self._local.rng = rng
+            self._local.burst = []
+        return rng
+
+    def next(self) -> tuple:
+        """Parameters of one sp_ProcessTransaction call, in declaration order"""
+        rng = self.rng
+        burst = self._local.burst
+        if burst:
+            # Velocity anomaly: the same client several times in quick succession
+            client_id, city = burst.pop()
+            anomaly = None
+        else:
+            client_id, city = rng.choice(self.clients)
+            anomaly = rng.choice(("velocity", "location", "amount")) if rng.random() < self.anomaly_rate else None
+            if anomaly == "velocity":
+                burst.extend([(client_id, city)] * rng.randint(5, 8))
+
+        transaction_type = TRANSACTION_TYPES.draw(rng)
+        channel = "Agent" if transaction_type == "Deposit" and rng.random() < 0.5 else CHANNELS.draw(rng)
+        merchant_id = rng.choice(self.merchants) if transaction_type in MERCHANT_TYPES and self.merchants else None
+        agent_id = rng.choice(self.agents) if channel == "Agent" and self.agents else None
+
+        if anomaly == "amount":
+            amount = rng.uniform(20000, 80000)
+        else:
+            amount = min(rng.lognormvariate(4.5, 1.1) + 5, 12500)
+
+        if anomaly == "location":
+            location, (latitude, longitude) = rng.choice(list(FOREIGN_LOCATIONS.items()))
+        else:
+            latitude, longitude = CITIES.get(city, CITIES["Tunis"])
+            location = f"{city or 'Tunis'}, Tunisia"
+        latitude += rng.uniform(-0.05, 0.05)
+        longitude += rng.uniform(-0.05, 0.05)
+
+        return (client_id, merchant_id, agent_id, transaction_type,
+                Decimal(f"{amount:.2f}"), channel,
+                f"DEV{client_id:08d}" if rng.random() < 0.9 else f"DEV{rng.randrange(10 ** 8):08d}",
+                f"41.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+                location, Decimal(f"{latitude:.8f}"), Decimal(f"{longitude:.8f}"))
+
+    def batch(self, codes) -> tuple:
+        """Finished Transactions rows and their FraudAlerts rows for one bulk insert
+
+        Status and fraud columns come from the streaming fraud rules
+        (fraud_engine.py), applied in the order the rows are generated.
+        """
+        rows = []
+        alerts = []
+        with self._engine_lock:
+            for code in codes:
+                (client_id, merchant_id, agent_id, transaction_type, amount, channel,
+                 device_id, ip_address, location, latitude, longitude) = self.next()
+                rng = self.rng
+                declined = rng.random() < DECLINE_RATE
+                now = time.time()
+                found = self.engine.process(code, client_id, float(amount), now,
+                                            float(latitude), float(longitude), declined)
+                status, fraud_score, fraudulent, reason = "Failed" if declined else "Completed", 0.0, False, None
+                for alert in found:
+                    settlement = SETTLEMENTS.get(alert.alert_type)
+                    if settlement and settlement[1] > fraud_score:
+                        status, fraud_score, fraudulent, reason = settlement
+                    alerts.append((alert.client_id, alert.alert_type, alert.severity, alert.message,
+                                   alert.risk_score, alert.detected_at, code))
+                rows.append((code, client_id, merchant_id, agent_id, transaction_type, amount, status,
+                             channel, device_id, ip_address, location, latitude, longitude,
+                             Decimal(f"{fraud_score:.2f}"), fraudulent, reason,
+                             int(rng.uniform(50, 550)), datetime.fromtimestamp(now)))
+        return rows, alerts
+
+
+def load_reference_data(limit_clients: int = None):
+    """Client (ID, city), merchant and agent IDs from the database"""
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        top = f"TOP {int(limit_clients)} " if limit_clients else ""
+        cursor.execute(f"SELECT {top}ClientID, City FROM Clients WHERE AccountStatus = 'Active' ORDER BY ClientID")
+        clients = [(row.ClientID, row.City) for row in cursor.fetchall()]
+        cursor.execute("SELECT MerchantID FROM Merchants WHERE IsActive = 1")
+        merchants = [row.MerchantID for row in cursor.fetchall()]
+        cursor.execute("SELECT AgentID FROM FieldAgents WHERE IsActive = 1")
+        agents = [row.AgentID for row in cursor.fetchall()]
+    finally:
+        conn.close()
+    return clients, merchants, agents
+
+
+def process_transaction(cursor, params: tuple):
+    """Run sp_ProcessTransaction; returns the new TransactionID"""
+    cursor.execute(PROCESS_TRANSACTION, params)
+    # Skip anything the procedure emits before the final SELECT
+    while cursor.description is None:
+        if not cursor.nextset():
+            return None
+    return cursor.fetchone()[0]
+
+
+def run_workload(args, factory: TransactionFactory, pool: ConnectionPool, stats: WorkloadStats):
+    """Send transactions (call mode) or batches (bulk mode) on schedule from the worker threads"""
+    bulk = args.mode == "bulk"
+    per_slot = args.batch_size if bulk else 1
+    slot_rate = args.tps / per_slot if args.tps > 0 else 0
+    slots = itertools.count()  # next transaction (call) or batch (bulk) number
+    run_id = uuid.uuid4().hex[:8].upper()
+    stop = threading.Event()
+    start = time.monotonic()
+
+    def worker():
+        while not stop.is_set():
+            n = next(slots)
+            if args.count and n * per_slot >= args.count:
+                return
+            due = start + n / slot_rate if slot_rate else time.monotonic()
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if args.duration and time.monotonic() - start >= args.duration:
+                return
+
+            size = min(per_slot, args.count - n * per_slot) if args.count else per_slot
+            if bulk:
+                # Unique per run and row: TXN + run id + row number (fits NVARCHAR(50))
+                payload, alerts = factory.batch(f"TXN{run_id}{n * per_slot + i:012d}" for i in range(size))
+            else:
+                payload = factory.next()
+
+            called = time.monotonic()
+            outcome = "success"
+            try:
+                with pool.connection() as conn:
+                    cursor = conn.cursor()
+                    if bulk:
+                        # Transactions and their alerts are committed together
+                        conn.autocommit = False
+                        cursor.fast_executemany = True
+                        cursor.executemany(INSERT_TRANSACTION, payload)
+                        if alerts:
+                            cursor.executemany(INSERT_ALERT, alerts)
+                        conn.commit()
+                        conn.autocommit = True
+                    else:
+                        process_transaction(cursor, payload)
+                    cursor.close()
+            except pyodbc.Error as e:
+                outcome = "error"
+                logger.warning(f"{args.mode} call failed: {e}")
+            done = time.monotonic()
+
+            stats.service.record(done - called)
+            stats.response.record(done - min(due, called))
+            workload_call_duration.labels(mode=args.mode, outcome=outcome).observe(done - called)
+            workload_response_time.labels(mode=args.mode).observe(done - min(due, called))
+            workload_transactions.labels(mode=args.mode, outcome=outcome).inc(size)
+            if outcome == "success":
+                stats.add(transactions=size)
+            else:
+                stats.add(errors=size)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(worker) for _ in range(args.workers)]
+        last_total, last_time = 0, start
+        try:
+            while not all(f.done() for f in futures):
+                time.sleep(0.2)
+                now = time.monotonic()
+                if now - last_time >= args.report_every:
+                    total = stats.transactions + stats.errors
+                    print(f"📊 [{datetime.now():%H:%M:%S}] {total} transactions "
+                          f"({(total - last_total) / (now - last_time):.0f}/s), errors={stats.errors} | "
+                          f"call {stats.service.summary()}")
+                    last_total, last_time = total, now
+        except KeyboardInterrupt:
+            # Inside the `with`: the executor's shutdown(wait=True) only returns once the workers see it
+            stop.set()
+            print(f"\n\n🛑 Stopped by user")
+        for future in futures:
+            future.result()
+    return time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive transactions into the eBanking MSSQL database")
+    parser.add_argument("--mode", choices=["call", "bulk"], default="call",
+                        help="call: one sp_ProcessTransaction per transaction; bulk: batched inserts (default: call)")
+    parser.add_argument("--tps", type=float, default=50.0, help="Target transactions per second, 0 = as fast as possible (default: 50)")
+    parser.add_argument("--duration", type=parse_duration, help="Stop after this long, e.g. 300, 10m, 2h")
+    parser.add_argument("--count", type=int, help="Stop after N transactions")
+    parser.add_argument("--workers", type=int, default=16, help="Worker threads / pooled connections (default: 16)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per executemany in bulk mode (default: 1000)")
+    parser.add_argument("--anomaly-rate", type=float, default=0.01,
+                        help="Share of transactions starting a velocity, location or amount anomaly (default: 0.01)")
+    parser.add_argument("--clients", type=int, help="Only use the first N active clients")
+    parser.add_argument("--seed", help="Seed for reproducible transaction streams")
+    parser.add_argument("--metrics-port", type=int, help="Expose the latency metrics on this port")
+    parser.add_argument("--report-every", type=float, default=5.0, help="Seconds between progress lines (default: 5)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if pyodbc is None:
+        print("❌ pyodbc is not available: pip install -r requirements-mssql.txt (needs the ODBC driver)", file=sys.stderr)
+        sys.exit(1)
+    try:
+        clients, merchants, agents = load_reference_data(args.clients)
+    except pyodbc.Error as e:
+        print(f"❌ Could not read the reference data from {MSSQL_CONFIG['host']}: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not clients:
+        print("❌ No active clients: run the mssql/init scripts first", file=sys.stderr)
+        sys.exit(1)
+
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+
+    print("🚀 Starting MSSQL transaction workload...")
+    print(f"🗄️  Database: {MSSQL_CONFIG['database']} on {MSSQL_CONFIG['host']}:{MSSQL_CONFIG['port']} | "
+          f"{len(clients)} clients, {len(merchants)} merchants, {len(agents)} agents")
+    print(f"⚙️  Mode: {args.mode} | TPS: {'unthrottled' if args.tps <= 0 else f'{args.tps:g}'} | "
+          f"Workers: {args.workers} | Duration: {f'{args.duration:g}s' if args.duration else '-'} | "
+          f"Count: {args.count or '-'}\n")
+
+    factory = TransactionFactory(clients, merchants, agents, args.anomaly_rate, args.seed)
+    pool = ConnectionPool(size=args.workers)
+    stats = WorkloadStats()
+    try:
+        elapsed = run_workload(args, factory, pool, stats)
+    finally:
+        pool.close()
+
+    print(f"\n📊 Final Stats:")
+    print(f"   Transactions: {stats.transactions} in {elapsed:.1f}s ({stats.transactions / elapsed:.0f}/s)")
+    print(f"   Errors: {stats.errors}")
+    print(f"   Call latency{' (per batch)' if args.mode == 'bulk' else ''}: {stats.service.summary()}")
+    print(f"   Response time (from schedule): {stats.response.summary()}")
+
+
+if __name__ == "__main__":
+    main()
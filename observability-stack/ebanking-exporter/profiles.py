@@ -0,0 +1,146 @@
+"""
+Declarative simulation profiles for the eBanking exporter
+
+Profiles are read from a JSON (or YAML, if PyYAML is installed) file:
+
+- buckets:  histogram bucket layouts, by metric name
+- defaults: settings shared by every profile
+- profiles: per-environment overrides, deep-merged over the defaults
+
+At startup each profile is compiled once: weight tables become alias
+samplers and distribution specs become distribution objects, so the
+simulation loop only draws from prepared samplers.
+
+Weighted choices are written as {"value": weight, ...}. Distributions are
+{"type": "uniform", "low": .., "high": ..}, {"type": "normal", "mean": ..,
+"stddev": .., "min": ..}, {"type": "lognormal", "mu": .., "sigma": ..} or
+{"type": "choice", "values": [...], "weights": [...]}.
+"""
+
+import copy
+import json
+import os
+
+from sampling import AliasSampler, LogNormal, Normal, Uniform
+
+try:
+    import yaml
+except ImportError:  # YAML profiles are optional
+    yaml = None
+
+DEFAULT_PROFILE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles.json')
+
+
+def load_profile_file(path=None):
+    """Read a profile file (JSON, or YAML for .yaml/.yml)"""
+    path = path or DEFAULT_PROFILE_FILE
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise RuntimeError(f"PyYAML is required to read {path} (pip install pyyaml)")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    if not isinstance(data, dict) or 'profiles' not in data:
+        raise ValueError(f"{path}: expected a mapping with a 'profiles' section")
+    data.setdefault('buckets', {})
+    data.setdefault('defaults', {})
+    return data
+
+
+def _merge(base, override):
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _weighted(spec, name):
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError(f"'{name}' must be a non-empty mapping of value -> weight")
+    return AliasSampler(list(spec.keys()), list(spec.values()))
+
+
+def _distribution(spec, name):
+    kind = spec.get('type')
+    if kind == 'uniform':
+        return Uniform(spec['low'], spec['high'])
+    if kind == 'normal':
+        return Normal(spec['mean'], spec['stddev'], spec.get('min', float('-inf')))
+    if kind == 'lognormal':
+        return LogNormal(spec['mu'], spec['sigma'])
+    if kind == 'choice':
+        return AliasSampler(spec['values'], spec.get('weights'))
+    raise ValueError(f"'{name}': unknown distribution type {kind!r}")
+
+
+class CompiledProfile:
+    """A profile with every weight table and distribution turned into a sampler"""
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.banner = spec.get('banner', f"{name.upper()} mode")
+        self.transaction_multiplier = float(spec['transaction_multiplier'])
+        self.error_rate = float(spec['error_rate'])
+        self.fraud_rate = float(spec['fraud_rate'])
+        self.clients = int(spec['clients'])
+        self.base_revenue = float(spec['base_revenue'])
+        self.base_sessions = int(spec['base_sessions'])
+        self.satisfaction_range = tuple(spec['satisfaction_range'])
+        self.requests_per_tick = tuple(spec['requests_per_tick'])
+
+        self.transaction_types = _weighted(spec['transaction_types'], 'transaction_types')
+        self.transaction_statuses = _weighted(spec['transaction_statuses'], 'transaction_statuses')
+        self.channels = _weighted(spec['channels'], 'channels')
+        self.transaction_amounts = {
+            trans_type: _distribution(dist, f'transaction_amounts.{trans_type}')
+            for trans_type, dist in spec['transaction_amounts'].items()
+        }
+        missing = set(self.transaction_types.values) - set(self.transaction_amounts)
+        if missing:
+            raise ValueError(f"profile '{name}': no transaction_amounts for {sorted(missing)}")
+
+        self.endpoints = _weighted(spec['endpoints'], 'endpoints')
+        self.methods = _weighted(spec['methods'], 'methods')
+        self.status_codes = _weighted(spec['status_codes'], 'status_codes')
+        self.request_durations = {
+            method: _distribution(dist, f'request_durations.{method}')
+            for method, dist in spec['request_durations'].items()
+        }
+        missing = set(self.methods.values) - set(self.request_durations)
+        if missing:
+            raise ValueError(f"profile '{name}': no request_durations for {sorted(missing)}")
+        self.session_durations = _distribution(spec['session_durations'], 'session_durations')
+        self.query_durations = _distribution(spec['query_durations'], 'query_durations')
+
+        self.login_statuses = _weighted(spec['login_statuses'], 'login_statuses')
+        self.login_methods = _weighted(spec['login_methods'], 'login_methods')
+        self.login_failure_reasons = _weighted(spec['login_failure_reasons'], 'login_failure_reasons')
+
+        self.error_types = _weighted(spec['error_types'], 'error_types')
+        self.error_severities = _weighted(spec['error_severities'], 'error_severities')
+
+
+class ProfileSet:
+    """All profiles of a profile file, compiled at startup"""
+
+    def __init__(self, data):
+        self.buckets = data['buckets']
+        self.profiles = {}
+        for name, overrides in data['profiles'].items():
+            try:
+                self.profiles[name] = CompiledProfile(name, _merge(data['defaults'], overrides or {}))
+            except KeyError as e:
+                raise ValueError(f"profile '{name}': missing setting {e}") from None
+
+    def get(self, name, fallback='training'):
+        """Return the compiled profile, or the fallback profile (None if it does not exist)"""
+        return self.profiles.get(name) or self.profiles.get(fallback)
+
+
+def load_profiles(path=None):
+    """Load and compile a profile file"""
+    return ProfileSet(load_profile_file(path))
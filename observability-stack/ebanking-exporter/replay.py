@@ -0,0 +1,55 @@
+"""
+Deterministic replay support for the eBanking simulation
+
+- stream_rng: independent, reproducible random stream per (seed, name...)
+  so adding draws to one stream never shifts the others
+- RealClock / VirtualClock: the simulation reads time and sleeps through a
+  clock; the virtual clock just advances, so hours of simulated time run at
+  CPU speed
+"""
+
+import random
+import time
+
+
+def stream_rng(seed, *names):
+    """Return a seeded random.Random for one stream, or the global module if seed is None"""
+    if seed is None:
+        return random
+    return random.Random(':'.join([str(seed), *map(str, names)]))
+
+
+class RealClock:
+    """Wall-clock time (live exporter)"""
+
+    virtual = False
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def timestamp(self) -> float:
+        """Unix time, for samples that carry a timestamp"""
+        return time.time()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class VirtualClock:
+    """Simulated time starting at a Unix timestamp; sleep() only advances it"""
+
+    virtual = True
+
+    def __init__(self, start: float = 0.0):
+        self._now = float(start)
+
+    def now(self) -> float:
+        return self._now
+
+    def timestamp(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            self._now += seconds
@@ -0,0 +1,162 @@
+"""
+Batch sampling helpers for the eBanking simulation
+
+- CategoricalSampler: weighted choice with cumulative weights computed once,
+  drawing a whole tick of events in a single call
+- AliasSampler: weighted choice with Vose's alias tables, O(1) per draw
+- Uniform / Normal / LogNormal: continuous distributions with draw_many()
+- observe_many: apply many observations to a histogram child with one
+  update per bucket instead of one observe() per value
+"""
+
+import bisect
+import random
+from itertools import accumulate
+
+
+class CategoricalSampler:
+    """Weighted categorical distribution with precomputed cumulative weights"""
+
+    __slots__ = ("values", "cum_weights", "total")
+
+    def __init__(self, values, weights=None):
+        self.values = list(values)
+        if weights is None:
+            weights = [1] * len(self.values)
+        if len(weights) != len(self.values):
+            raise ValueError("values and weights must have the same length")
+        self.cum_weights = list(accumulate(weights))
+        self.total = self.cum_weights[-1]
+
+    def draw(self, rng=random):
+        """Draw one value"""
+        return self.values[bisect.bisect(self.cum_weights, rng.random() * self.total)]
+
+    def draw_many(self, k: int, rng=random) -> list:
+        """Draw k values in one call"""
+        return rng.choices(self.values, cum_weights=self.cum_weights, k=k)
+
+
+class AliasSampler:
+    """Weighted categorical distribution using Vose's alias method (O(1) draws)"""
+
+    __slots__ = ("values", "prob", "alias", "n")
+
+    def __init__(self, values, weights=None):
+        self.values = list(values)
+        self.n = len(self.values)
+        if self.n == 0:
+            raise ValueError("AliasSampler needs at least one value")
+        if weights is None:
+            weights = [1] * self.n
+        if len(weights) != self.n:
+            raise ValueError("values and weights must have the same length")
+        total = float(sum(weights))
+        if total <= 0 or any(w < 0 for w in weights):
+            raise ValueError("weights must be non-negative with a positive sum")
+
+        scaled = [w * self.n / total for w in weights]
+        self.prob = [1.0] * self.n
+        self.alias = list(range(self.n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Leftovers are 1.0 up to rounding error
+
+    def draw(self, rng=random):
+        """Draw one value"""
+        u = rng.random() * self.n
+        i = int(u)
+        return self.values[i] if u - i < self.prob[i] else self.values[self.alias[i]]
+
+    def draw_many(self, k: int, rng=random) -> list:
+        """Draw k values"""
+        values, prob, alias, n, rand = self.values, self.prob, self.alias, self.n, rng.random
+        out = []
+        append = out.append
+        for _ in range(k):
+            u = rand() * n
+            i = int(u)
+            append(values[i] if u - i < prob[i] else values[alias[i]])
+        return out
+
+
+class Uniform:
+    """Continuous uniform distribution on [low, high]"""
+
+    __slots__ = ("low", "span")
+
+    def __init__(self, low: float, high: float):
+        self.low = low
+        self.span = high - low
+
+    def draw(self, rng=random):
+        return self.low + self.span * rng.random()
+
+    def draw_many(self, k: int, rng=random) -> list:
+        low, span, rand = self.low, self.span, rng.random
+        return [low + span * rand() for _ in range(k)]
+
+
+class Normal:
+    """Normal distribution, clamped to a minimum value"""
+
+    __slots__ = ("mean", "stddev", "minimum")
+
+    def __init__(self, mean: float, stddev: float, minimum: float = float("-inf")):
+        self.mean = mean
+        self.stddev = stddev
+        self.minimum = minimum
+
+    def draw(self, rng=random):
+        return max(self.minimum, rng.gauss(self.mean, self.stddev))
+
+    def draw_many(self, k: int, rng=random) -> list:
+        mean, stddev, minimum, gauss = self.mean, self.stddev, self.minimum, rng.gauss
+        return [max(minimum, gauss(mean, stddev)) for _ in range(k)]
+
+
+class LogNormal:
+    """Log-normal distribution (heavy right tail, e.g. amounts)"""
+
+    __slots__ = ("mu", "sigma")
+
+    def __init__(self, mu: float, sigma: float):
+        self.mu = mu
+        self.sigma = sigma
+
+    def draw(self, rng=random):
+        return rng.lognormvariate(self.mu, self.sigma)
+
+    def draw_many(self, k: int, rng=random) -> list:
+        mu, sigma, lognorm = self.mu, self.sigma, rng.lognormvariate
+        return [lognorm(mu, sigma) for _ in range(k)]
+
+
+def observe_many(child, values):
+    """Record a batch of observations on a labeled Histogram child
+
+    Counts are aggregated per bucket first, then each bucket and the sum are
+    incremented once. Falls back to observe() if the client internals differ.
+    """
+    buckets = getattr(child, "_buckets", None)
+    upper_bounds = getattr(child, "_upper_bounds", None)
+    if buckets is None or upper_bounds is None:
+        for value in values:
+            child.observe(value)
+        return
+
+    counts = [0] * len(upper_bounds)
+    total = 0.0
+    for value in values:
+        counts[bisect.bisect_left(upper_bounds, value)] += 1
+        total += value
+    for i, count in enumerate(counts):
+        if count:
+            buckets[i].inc(count)
+    child._sum.inc(total)
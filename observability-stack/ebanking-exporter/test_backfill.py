@@ -0,0 +1,54 @@
+"""
+Tests for the offline backfill (backfill.py)
+
+  python -m pytest -q test_backfill.py
+"""
+
+import io
+import re
+
+import backfill
+
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def series_runs(text: str) -> dict:
+    """(family, labels without le) -> [first line, last line] runs of consecutive samples
+
+    A histogram point (its buckets, count and sum at one timestamp) is one
+    unit in OpenMetrics, so `le` is left out of the key.
+    """
+    runs = {}
+    family = previous = None
+    for number, line in enumerate(text.splitlines()):
+        if line.startswith('# TYPE '):
+            family = line.split()[2]
+        if line.startswith('#'):
+            previous = None
+            continue
+        labels = frozenset((k, v) for k, v in LABEL.findall(line.rsplit(' ', 2)[0]) if k != 'le')
+        key = (family, labels)
+        if key == previous:
+            runs[key][-1][1] = number
+        else:
+            runs.setdefault(key, []).append([number, number])
+        previous = key
+    return runs
+
+
+def test_two_environments_keep_each_series_contiguous(tmp_path):
+    out = io.StringIO()
+    samples = backfill.backfill(0, 60, 10, out, seed='42', environments='production,staging',
+                                tmp_dir=str(tmp_path))
+    text = out.getvalue()
+    assert samples > 0 and text.endswith('# EOF\n')
+
+    runs = series_runs(text)
+    scattered = {key: spans for key, spans in runs.items() if len(spans) > 1}
+    assert not scattered
+
+    # ebanking_app_info: one contiguous run of 6 scrapes per environment
+    info = {dict(labels)['environment']: spans for (family, labels), spans in runs.items()
+            if family == 'ebanking_app'}
+    assert sorted(info) == ['production', 'staging']
+    assert all(last - first == 5 for [(first, last)] in info.values())
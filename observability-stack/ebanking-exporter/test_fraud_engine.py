@@ -0,0 +1,188 @@
+"""
+Tests for the streaming fraud rules (fraud_engine.py)
+
+  python -m pytest -q test_fraud_engine.py
+"""
+
+import pytest
+
+from fraud_engine import CITIES, FOREIGN_LOCATIONS, AmountBaseline, FraudEngine, haversine_km
+
+T0 = 1_700_000_000.0
+DAY = 86400
+TUNIS = CITIES["Tunis"]
+SFAX = CITIES["Sfax"]
+PARIS = FOREIGN_LOCATIONS["Paris, France"]
+
+
+def alert_types(alerts):
+    return [alert.alert_type for alert in alerts]
+
+
+# ========================
+# Velocity
+# ========================
+
+def test_velocity_alerts_from_the_fifth_transaction_in_the_window():
+    engine = FraudEngine()
+    results = [alert_types(engine.process(i, 1, 100, T0 + i * 60)) for i in range(5)]
+    assert results == [[], [], [], [], ["Velocity"]]
+
+
+def test_velocity_window_slides():
+    engine = FraudEngine()
+    for i in range(4):
+        engine.process(i, 1, 100, T0 + i * 60)
+    # The first one (T0) is more than 300 s old by now
+    assert engine.process(4, 1, 100, T0 + 301) == []
+    assert engine.clients[1].recent_amount == pytest.approx(400)
+
+
+def test_declined_transactions_do_not_count_towards_velocity():
+    engine = FraudEngine()
+    for i in range(4):
+        engine.process(i, 1, 100, T0 + i)
+    assert engine.process(4, 1, 100, T0 + 4, declined=True) == []
+    assert alert_types(engine.process(5, 1, 100, T0 + 5)) == ["Velocity"]
+
+
+# ========================
+# Location
+# ========================
+
+def test_location_alerts_beyond_the_travel_distance():
+    engine = FraudEngine()
+    assert engine.process(1, 1, 100, T0, *TUNIS) == []
+    alerts = engine.process(2, 1, 100, T0 + 600, *PARIS)
+    assert alert_types(alerts) == ["Location"]
+    assert alerts[0].severity == "Critical" and alerts[0].risk_score == 95.0
+
+
+def test_location_ignores_domestic_moves_and_late_transactions():
+    engine = FraudEngine()
+    assert haversine_km(*TUNIS, *SFAX) < 500
+    engine.process(1, 1, 100, T0, *TUNIS)
+    assert engine.process(2, 1, 100, T0 + 60, *SFAX) == []
+    # An hour later the trip is possible
+    assert engine.process(3, 1, 100, T0 + 60 + 3600, *PARIS) == []
+
+
+def test_declined_transactions_still_move_the_client():
+    engine = FraudEngine()
+    engine.process(1, 1, 100, T0, *TUNIS)
+    assert alert_types(engine.process(2, 1, 100, T0 + 60, *PARIS, declined=True)) == ["Location"]
+    assert engine.process(3, 1, 100, T0 + 120, *PARIS) == []
+
+
+# ========================
+# Amount
+# ========================
+
+def test_amount_alerts_above_mean_plus_three_stddev_and_the_floor():
+    engine = FraudEngine()
+    for i, amount in enumerate([900, 1000, 1100]):
+        engine.process(i, 1, amount, T0 + i * DAY)
+    # mean 1000, stddev 100: the threshold is 1300 (declined, so the baseline stays put)
+    assert engine.process(10, 1, 1300, T0 + 3 * DAY, declined=True) == []
+    alerts = engine.process(11, 1, 1301, T0 + 4 * DAY)
+    assert alert_types(alerts) == ["Amount"]
+    assert alerts[0].risk_score == 80.0
+
+
+def test_amount_below_the_floor_never_alerts():
+    engine = FraudEngine()
+    engine.process(1, 1, 10, T0)
+    engine.process(2, 1, 10, T0 + DAY)
+    assert engine.process(3, 1, 999, T0 + 2 * DAY) == []
+
+
+def test_amount_waits_for_the_minimum_history():
+    engine = FraudEngine(amount_min_history=3)
+    engine.process(1, 1, 100, T0)
+    engine.process(2, 1, 100, T0 + DAY)
+    assert engine.process(3, 1, 5000, T0 + 2 * DAY) == []
+    # The 5000 was completed and joined the history: a larger outlier is needed
+    assert alert_types(engine.process(4, 1, 50000, T0 + 3 * DAY)) == ["Amount"]
+
+
+def test_flagged_amounts_stay_out_of_the_baseline():
+    engine = FraudEngine()
+    engine.process(1, 1, 100, T0)
+    engine.process(2, 1, 100, T0 + DAY)
+    assert alert_types(engine.process(3, 1, 5000, T0 + 2 * DAY)) == ["Amount"]
+    assert alert_types(engine.process(4, 1, 5000, T0 + 3 * DAY)) == ["Amount"]
+    assert engine.clients[1].baselines[None].count == 2
+
+
+def test_amount_baselines_are_per_category():
+    engine = FraudEngine(amount_min_history=3)
+    for i in range(3):
+        engine.process(i, 1, 100, T0 + i * DAY, category="bill_payment")
+        engine.process(10 + i, 1, 9000 + i, T0 + i * DAY, category="transfer")
+    assert engine.process(20, 1, 9001, T0 + 3 * DAY, category="transfer") == []
+    assert alert_types(engine.process(21, 1, 9001, T0 + 3 * DAY, category="bill_payment")) == ["Amount"]
+
+
+def test_baseline_history_fills_a_new_baseline_once():
+    calls = []
+
+    def history(client_id, category):
+        calls.append((client_id, category))
+        return [100.0] * 20
+
+    engine = FraudEngine(amount_min_history=5, baseline_history=history)
+    assert alert_types(engine.process(1, 7, 5000, T0, category="payment")) == ["Amount"]
+    engine.process(2, 7, 100, T0 + 1, category="payment")
+    assert calls == [(7, "payment")]
+    assert engine.clients[7].baselines["payment"].count == 21
+
+
+# ========================
+# Baseline expiry
+# ========================
+
+def test_baseline_expires_whole_days():
+    baseline = AmountBaseline()
+    baseline.add(10, 100)
+    baseline.add(10, 300)
+    baseline.add(11, 200)
+    baseline.expire(11)
+    assert (baseline.count, baseline.total, baseline.squares) == (1, 200, 40000)
+    assert baseline.mean_stddev() == (200, 0.0)
+
+
+def test_amount_history_older_than_the_window_is_forgotten():
+    engine = FraudEngine(amount_days=30)
+    engine.process(1, 1, 5000, T0)
+    engine.process(2, 1, 5000, T0 + DAY)
+    baseline = engine.clients[1].baselines[None]
+    first = int(T0 // DAY)
+    # On day 30 the window starts at day 1: the first day leaves it
+    engine.process(3, 1, 100, T0 + 30 * DAY)
+    assert [day - first for day, *_ in baseline.days] == [1, 30]
+    # Once both 5000s have expired, 5000 is an outlier again
+    assert alert_types(engine.process(4, 1, 5000, T0 + 31 * DAY)) == ["Amount"]
+
+
+# ========================
+# Client state
+# ========================
+
+def test_least_recently_active_client_is_evicted():
+    engine = FraudEngine(max_clients=2)
+    engine.process(1, "a", 100, T0, *TUNIS)
+    engine.process(2, "b", 100, T0 + 1)
+    engine.process(3, "a", 100, T0 + 2)
+    engine.process(4, "c", 100, T0 + 3)
+    assert list(engine.clients) == ["a", "c"]
+    # "b" starts over: no position, no velocity window
+    engine.process(5, "b", 100, T0 + 4, *PARIS)
+    assert list(engine.clients) == ["c", "b"]
+    assert len(engine.clients["b"].recent) == 1
+
+
+def test_evicted_client_loses_its_position():
+    engine = FraudEngine(max_clients=1)
+    engine.process(1, "a", 100, T0, *TUNIS)
+    engine.process(2, "b", 100, T0 + 1)
+    assert engine.process(3, "a", 100, T0 + 2, *PARIS) == []
@@ -0,0 +1,170 @@
+"""
+Optional OpenTelemetry tracing of the simulation ticks
+
+With the SDK installed (requirements-tracing.txt) and
+OTEL_EXPORTER_OTLP_ENDPOINT set (e.g. http://tempo:4317), each tick of each
+environment is a `simulation.tick` trace with one span per simulation
+stage. Ended spans go through two processors:
+
+- TailBiasedSpanProcessor holds the spans of a trace until its root span
+  ends, then keeps or drops the whole trace. It keeps it when the trace id
+  falls within the head ratio (OTEL_TRACES_SAMPLER_ARG, the same test as
+  TraceIdRatioBased), and always when a span has an error status or the
+  root took TRACE_SLOW_THRESHOLD seconds or more. At most TRACE_MAX_PENDING
+  traces are held; past that the oldest is decided on the head ratio alone.
+- BatchSpanProcessor queues the kept spans (at most OTEL_BSP_MAX_QUEUE_SIZE,
+  more are dropped) and exports them over OTLP/gRPC in batches from its own
+  thread.
+
+Without the SDK or the endpoint, start_span() returns a no-op context and
+set_error() does nothing, so the simulation runs unchanged.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from prometheus_client import Counter
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import SpanProcessor, TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ALWAYS_ON, TraceIdRatioBased
+    from opentelemetry.trace import Status, StatusCode
+except ImportError:  # optional dependency
+    trace = None
+    SpanProcessor = object
+
+logger = logging.getLogger(__name__)
+
+TRACE_RATIO = float(os.getenv('OTEL_TRACES_SAMPLER_ARG', '0.1'))
+TRACE_SLOW_THRESHOLD = float(os.getenv('TRACE_SLOW_THRESHOLD', '0.25'))
+TRACE_MAX_PENDING = int(os.getenv('TRACE_MAX_PENDING', '1000'))
+
+# ========================
+# PROMETHEUS METRICS
+# ========================
+
+trace_sampling_decisions = Counter(
+    'ebanking_trace_sampling_decisions_total',
+    'Tick traces by sampling decision (head, error, slow, dropped, evicted)',
+    ['decision', 'environment']
+)
+
+_tracer = None
+
+
+class TailBiasedSpanProcessor(SpanProcessor):
+    """Buffer spans per trace and forward the kept traces to another processor"""
+
+    def __init__(self, delegate, ratio: float = TRACE_RATIO, slow_threshold: float = TRACE_SLOW_THRESHOLD,
+                 max_pending: int = TRACE_MAX_PENDING):
+        self.delegate = delegate
+        self.bound = TraceIdRatioBased.get_bound_for_rate(ratio)
+        self.slow_threshold_ns = int(slow_threshold * 1e9)
+        self.max_pending = max_pending
+        self._pending = OrderedDict()   # trace id -> ended spans, oldest trace first
+        self._lock = threading.Lock()
+
+    def on_start(self, span, parent_context=None):
+        self.delegate.on_start(span, parent_context)
+
+    def _head_sampled(self, trace_id: int) -> bool:
+        return trace_id & TraceIdRatioBased.TRACE_ID_LIMIT < self.bound
+
+    def on_end(self, span):
+        trace_id = span.context.trace_id
+        local_root = span.parent is None or span.parent.is_remote
+        evicted = None
+        with self._lock:
+            spans = self._pending.pop(trace_id, None) or []
+            spans.append(span)
+            if not local_root:
+                self._pending[trace_id] = spans
+                if len(self._pending) > self.max_pending:
+                    evicted = self._pending.popitem(last=False)
+        if evicted is not None:
+            evicted_id, evicted_spans = evicted
+            self._forward(evicted_spans, "head" if self._head_sampled(evicted_id) else "evicted", None)
+        if not local_root:
+            return
+
+        if self._head_sampled(trace_id):
+            decision = "head"
+        elif any(s.status.status_code is StatusCode.ERROR for s in spans):
+            decision = "error"
+        elif span.end_time - span.start_time >= self.slow_threshold_ns:
+            decision = "slow"
+        else:
+            decision = "dropped"
+        self._forward(spans, decision, span.attributes.get("environment"))
+
+    def _forward(self, spans, decision: str, environment):
+        trace_sampling_decisions.labels(decision=decision, environment=environment or "unknown").inc()
+        if decision in ("dropped", "evicted"):
+            return
+        for span in spans:
+            self.delegate.on_end(span)
+
+    def shutdown(self):
+        # Traces still waiting for their root are incomplete: drop them
+        with self._lock:
+            self._pending.clear()
+        self.delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
+
+
+def build_provider(service_name: str, environment: str, exporter=None, ratio: float = TRACE_RATIO,
+                   slow_threshold: float = TRACE_SLOW_THRESHOLD):
+    """TracerProvider exporting the kept tick traces (OTLP/gRPC from the OTEL_* variables by default)"""
+    # Every span is recorded: sampling is decided by TailBiasedSpanProcessor once the trace ends
+    provider = TracerProvider(sampler=ALWAYS_ON, resource=Resource.create({
+        "service.name": service_name,
+        "deployment.environment": environment,
+    }))
+    # Batch limits come from the OTEL_BSP_* variables
+    batch = BatchSpanProcessor(exporter or OTLPSpanExporter())
+    provider.add_span_processor(TailBiasedSpanProcessor(batch, ratio, slow_threshold))
+    return provider
+
+
+def use_provider(provider):
+    """Trace the ticks with `provider` (None turns tracing off)"""
+    global _tracer
+    _tracer = provider.get_tracer("ebanking-exporter") if provider is not None else None
+
+
+def setup_tracing(service_name: str, environment: str):
+    """Install the tracer provider; returns False when tracing is off or the SDK is missing"""
+    if not os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT'):
+        return False
+    if trace is None:
+        logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but the OpenTelemetry SDK is not installed: "
+                       "pip install -r requirements-tracing.txt")
+        return False
+    provider = build_provider(service_name, environment)
+    trace.set_tracer_provider(provider)
+    use_provider(provider)
+    logger.info(f"✓ Tracing ticks to {os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT')} "
+                f"(head ratio {TRACE_RATIO:g}, slow >= {TRACE_SLOW_THRESHOLD:g}s)")
+    return True
+
+
+def start_span(name: str, **attributes):
+    """Context manager for a span (a no-op without tracing); exceptions mark it as an error"""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def set_error(description: str):
+    """Give the current span an error status, so its trace is always kept"""
+    if _tracer is not None:
+        trace.get_current_span().set_status(Status(StatusCode.ERROR, description))
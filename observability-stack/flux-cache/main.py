@@ -0,0 +1,219 @@
+"""
+Flux query cache for the payments dashboards
+
+Sits between Grafana and InfluxDB and speaks the InfluxDB v2 HTTP API:
+
+- POST /api/v2/query is answered from a read-through cache whose TTLs follow
+  the query's time range (query_cache.py)
+- every other /api/v2 call is passed through unchanged
+- at startup, the payments downsampling buckets and tasks are created or
+  updated (rollups.py), so long-range panels can read payments_1m /
+  payments_5m / payments_1h instead of raw points
+
+Point a Flux datasource at http://flux-cache:8087 with the usual org and token.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+import aiohttp
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from starlette.middleware.gzip import GZipMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+import rollups
+from query_cache import QueryCache, trim_csv
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+UPSTREAM_URL = os.getenv("INFLUXDB_URL", "http://influxdb:8086").rstrip("/")
+UPSTREAM_TIMEOUT = float(os.getenv("FLUX_CACHE_UPSTREAM_TIMEOUT", "120"))
+UPSTREAM_CONNECTIONS = int(os.getenv("FLUX_CACHE_UPSTREAM_CONNECTIONS", "32"))
+REGISTER_TASKS = os.getenv("FLUX_CACHE_REGISTER_TASKS", "true").lower() == "true"
+BACKFILL = os.getenv("FLUX_CACHE_BACKFILL", "")
+
+DEFAULT_DIALECT = {"annotations": ["datatype", "group", "default"], "header": True, "delimiter": ","}
+# Hop-by-hop and encoding headers are not forwarded (aiohttp decodes gzip responses itself)
+SKIPPED_HEADERS = {"host", "content-length", "connection", "keep-alive", "transfer-encoding",
+                   "accept-encoding", "content-encoding"}
+
+# ========================
+# PROMETHEUS METRICS
+# ========================
+
+CACHE_REQUESTS = Counter(
+    'flux_cache_requests_total',
+    'Flux queries handled by the cache',
+    ['result']  # hit, coalesced, miss, bypass, error
+)
+
+UPSTREAM_DURATION = Histogram(
+    'flux_cache_upstream_duration_seconds',
+    'Time spent waiting for InfluxDB on cache misses and pass-through calls',
+    buckets=[0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+)
+
+CACHE_TTL = Histogram(
+    'flux_cache_ttl_seconds',
+    'TTL assigned to Flux queries from their time range',
+    buckets=[0, 5, 15, 30, 60, 120, 300, 900, 3600]
+)
+
+CACHE_BYTES = Gauge('flux_cache_bytes', 'Size of the cached query results')
+CACHE_ENTRIES = Gauge('flux_cache_entries', 'Number of cached query results')
+
+app = FastAPI(title="Flux Query Cache", version="1.0.0")
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+cache = QueryCache()
+CACHE_BYTES.set_function(lambda: cache.bytes)
+CACHE_ENTRIES.set_function(lambda: len(cache.entries))
+
+session = None
+
+
+@app.on_event("startup")
+async def start_upstream_session():
+    global session
+    session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=UPSTREAM_CONNECTIONS),
+        timeout=aiohttp.ClientTimeout(total=UPSTREAM_TIMEOUT),
+    )
+    if REGISTER_TASKS:
+        asyncio.create_task(register_rollups())
+
+
+@app.on_event("shutdown")
+async def stop_upstream_session():
+    await session.close()
+
+
+async def register_rollups(attempts: int = 30, delay: float = 10.0):
+    """Create the rollup buckets and tasks, retrying until InfluxDB is up"""
+    backfill = rollups.parse_duration(BACKFILL) if BACKFILL else None
+    for attempt in range(1, attempts + 1):
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, rollups.setup, backfill)
+            logger.info("Payments rollup buckets and tasks are in place")
+            return
+        except Exception as e:
+            logger.warning(f"Rollup setup failed (attempt {attempt}/{attempts}): {e}")
+            await asyncio.sleep(delay)
+    logger.error("Giving up on the rollup setup; run `python rollups.py` by hand")
+
+
+def forward_headers(request: Request) -> dict:
+    return {name: value for name, value in request.headers.items() if name.lower() not in SKIPPED_HEADERS}
+
+
+async def upstream(method: str, path: str, params, headers: dict, body: bytes):
+    """One call to InfluxDB: (status, body, content type)"""
+    started = time.perf_counter()
+    try:
+        async with session.request(method, f"{UPSTREAM_URL}{path}", params=params,
+                                   headers=headers, data=body) as response:
+            content = await response.read()
+            return response.status, content, response.headers.get("Content-Type", "application/octet-stream")
+    finally:
+        UPSTREAM_DURATION.observe(time.perf_counter() - started)
+
+
+def upstream_error(e: Exception) -> JSONResponse:
+    CACHE_REQUESTS.labels(result="error").inc()
+    logger.error(f"InfluxDB request failed: {e!r}")
+    return JSONResponse(status_code=502, content={"code": "unavailable", "message": f"flux-cache: {e!r}"})
+
+
+@app.get("/health")
+async def health_check():
+    return {
+        "status": "healthy",
+        "upstream": UPSTREAM_URL,
+        "entries": len(cache.entries),
+        "bytes": cache.bytes,
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.post("/api/v2/query")
+async def query(request: Request):
+    """Cached Flux query"""
+    raw = await request.body()
+    params = list(request.query_params.multi_items())
+    if request.headers.get("Content-Type", "").startswith("application/vnd.flux"):
+        payload = {"query": raw.decode(), "type": "flux"}
+    else:
+        try:
+            payload = json.loads(raw or b"{}")
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict) or payload.get("type", "flux") != "flux" or "query" not in payload:
+            # InfluxQL or something we do not understand: pass it through
+            CACHE_REQUESTS.labels(result="bypass").inc()
+            try:
+                status, body, content_type = await upstream("POST", "/api/v2/query", params,
+                                                            forward_headers(request), raw)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                return upstream_error(e)
+            return Response(content=body, status_code=status, media_type=content_type,
+                            headers={"X-Flux-Cache": "bypass"})
+
+    requested = payload["query"]
+    payload["query"], ttl, window = cache.policy.plan(requested)
+    payload.setdefault("dialect", DEFAULT_DIALECT)
+    payload.setdefault("type", "flux")
+    CACHE_TTL.observe(ttl)
+
+    headers = forward_headers(request)
+    headers["content-type"] = "application/json"
+    org = request.query_params.get("org") or request.query_params.get("orgID") or ""
+
+    async def fetch():
+        body = json.dumps(payload, sort_keys=True).encode()
+        key = cache.key(org, body.decode(), headers.get("accept", ""), request.headers.get("Authorization", ""))
+        return await cache.fetch(key, ttl, lambda: upstream("POST", "/api/v2/query", params, headers, body))
+
+    try:
+        entry, result = await fetch()
+        content = entry.body
+        if window is not None and entry.status == 200:
+            # The aligned range is wider than the panel's: cut the rows back to it
+            content = trim_csv(entry.body, *window)
+            if content is None:
+                # An aggregate over the whole range: only the exact range gives the right value
+                payload["query"] = requested
+                entry, result = await fetch()
+                content = entry.body
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return upstream_error(e)
+
+    CACHE_REQUESTS.labels(result=result).inc()
+    remaining = max(0, int(entry.expires - time.time()))
+    return Response(content=content, status_code=entry.status, media_type=entry.content_type,
+                    headers={"X-Flux-Cache": result, "Cache-Control": f"max-age={remaining}"})
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"],
+               include_in_schema=False)
+async def passthrough(path: str, request: Request):
+    """Everything else (buckets, ping, writes...) goes straight to InfluxDB"""
+    try:
+        status, body, content_type = await upstream(request.method, f"/{path}", list(request.query_params.multi_items()),
+                                                    forward_headers(request), await request.body())
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return upstream_error(e)
+    return Response(content=body, status_code=status, media_type=content_type)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("FLUX_CACHE_PORT", "8087")))
@@ -0,0 +1,241 @@
+"""
+Read-through cache for Flux query results
+
+The cache key is the org, the query text (after time alignment), the
+requested dialect and a hash of the caller's token. Each result lives for a
+TTL derived from the query's time range:
+
+- ranges ending more than FLUX_CACHE_SETTLE seconds in the past cannot
+  change any more: FLUX_CACHE_HISTORICAL_TTL
+- ranges reaching "now": a fraction (FLUX_CACHE_TTL_RATIO) of the range
+  span, clamped to [FLUX_CACHE_MIN_TTL, FLUX_CACHE_MAX_TTL]. A 1h panel is
+  refreshed every ~36s; a 30d panel can be served from cache for minutes.
+
+Relative ranges (range(start: -1h)) keep the same query text between
+refreshes. Grafana's absolute timestamps move with every refresh, so the
+absolute bounds of a single-range query are floored and ceiled to a multiple
+of the TTL before it is keyed and sent upstream (FLUX_CACHE_ALIGN, on by
+default): refreshes within one TTL share one result. The caller trims that
+result back to the requested [start, stop) by _time (trim_csv); a result
+without a _time column (an aggregate over the whole range) cannot be trimmed
+and is fetched again for the exact range.
+
+Entries are evicted least-recently-used beyond FLUX_CACHE_MAX_BYTES, and
+concurrent misses on one key share a single upstream query.
+"""
+
+import asyncio
+import csv
+import hashlib
+import io
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+DURATION_UNITS = {"ns": 1e-9, "us": 1e-6, "µs": 1e-6, "ms": 1e-3, "s": 1, "m": 60,
+                  "h": 3600, "d": 86400, "w": 604800, "mo": 2592000, "y": 31536000}
+
+RANGE_PATTERN = re.compile(r"range\(\s*start\s*:\s*(?P<start>[^,)]+?)\s*(?:,\s*stop\s*:\s*(?P<stop>[^,)]+?)\s*)?\)")
+DURATION_PATTERN = re.compile(r"(-?)((?:\d+(?:ns|us|µs|ms|mo|s|m|h|d|w|y))+)$")
+DURATION_PART = re.compile(r"(\d+)(ns|us|µs|ms|mo|s|m|h|d|w|y)")
+TIME_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:\d{2})")
+
+
+def _parse_bound(text: str, now: float):
+    """Epoch seconds of a range bound (absolute time, relative duration or now()), or None"""
+    text = text.strip()
+    if text in ("now()", ""):
+        return now
+    match = DURATION_PATTERN.fullmatch(text)
+    if match:
+        seconds = sum(int(n) * DURATION_UNITS[unit] for n, unit in DURATION_PART.findall(match.group(2)))
+        return now - seconds if match.group(1) else now + seconds
+    if TIME_PATTERN.fullmatch(text):
+        return _parse_time(text)
+    return None
+
+
+def _parse_time(text: str) -> float:
+    """Epoch seconds of an RFC3339 timestamp (nanoseconds are truncated to microseconds)"""
+    value = text.replace("Z", "+00:00")
+    if "." in value:
+        # fromisoformat() before 3.11 only takes 3 or 6 fractional digits
+        head, _, rest = value.partition(".")
+        digits = re.match(r"\d+", rest).group(0)
+        value = f"{head}.{digits[:6].ljust(6, '0')}{rest[len(digits):]}"
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _format_time(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class TTLPolicy:
+    """Derives the cache lifetime of a query from its time range"""
+
+    def __init__(self, min_ttl: float = None, max_ttl: float = None, ratio: float = None,
+                 historical_ttl: float = None, settle: float = None, align: bool = None):
+        self.min_ttl = min_ttl if min_ttl is not None else float(os.getenv("FLUX_CACHE_MIN_TTL", "5"))
+        self.max_ttl = max_ttl if max_ttl is not None else float(os.getenv("FLUX_CACHE_MAX_TTL", "300"))
+        self.ratio = ratio if ratio is not None else float(os.getenv("FLUX_CACHE_TTL_RATIO", "0.01"))
+        self.historical_ttl = (historical_ttl if historical_ttl is not None
+                               else float(os.getenv("FLUX_CACHE_HISTORICAL_TTL", "3600")))
+        self.settle = settle if settle is not None else float(os.getenv("FLUX_CACHE_SETTLE", "300"))
+        self.align = align if align is not None else os.getenv("FLUX_CACHE_ALIGN", "true").lower() == "true"
+
+    def plan(self, query: str, now: float = None):
+        """Return (query to run, ttl in seconds, window); ttl 0 means do not cache
+
+        `window` is the (start, stop) the query asked for when its range was
+        aligned to a wider one, else None: trim the result to it.
+        """
+        now = time.time() if now is None else now
+        ranges = []
+        for match in RANGE_PATTERN.finditer(query):
+            start = _parse_bound(match.group("start"), now)
+            stop = _parse_bound(match.group("stop") or "now()", now)
+            if start is None or stop is None:
+                # v.timeRangeStart and friends left uninterpolated, or an expression
+                return query, 0.0, None
+            ranges.append((match, start, stop))
+        if not ranges:
+            return query, 0.0, None
+
+        latest_stop = max(stop for _, _, stop in ranges)
+        if latest_stop < now - self.settle:
+            return query, self.historical_ttl, None
+
+        span = max(stop - start for _, start, stop in ranges)
+        ttl = min(self.max_ttl, max(self.min_ttl, span * self.ratio))
+        # With several ranges, one _time window cannot trim the result back
+        if self.align and len(ranges) == 1 and self._is_absolute(ranges[0][0]):
+            match, start, stop = ranges[0]
+            return self._align(query, match, start, stop, ttl), ttl, (start, stop)
+        return query, ttl, None
+
+    @staticmethod
+    def _is_absolute(match) -> bool:
+        return bool(TIME_PATTERN.fullmatch(match.group("start").strip())
+                    and match.group("stop") and TIME_PATTERN.fullmatch(match.group("stop").strip()))
+
+    @staticmethod
+    def _align(query: str, match, start: float, stop: float, step: float) -> str:
+        """Rewrite the range bounds to multiples of `step` (widens the range)"""
+        aligned_start = math.floor(start / step) * step
+        aligned_stop = math.ceil(stop / step) * step
+        return (f"{query[:match.start()]}"
+                f"range(start: {_format_time(aligned_start)}, stop: {_format_time(aligned_stop)})"
+                f"{query[match.end():]}")
+
+
+def trim_csv(body: bytes, start: float, stop: float):
+    """Keep the rows of an annotated CSV result whose _time is in [start, stop)
+
+    Annotations, headers and table separators are kept; _start and _stop
+    still show the aligned range. Returns None when a table has no _time
+    column, since an aggregate over the wider range cannot be cut back.
+    """
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\r\n")
+    time_index = None
+    for row in csv.reader(io.StringIO(body.decode(), newline="")):
+        if not row or row[0].startswith("#"):
+            # A table separator or annotation: the next plain row is a header
+            time_index = None
+        elif time_index is None:
+            if "_time" not in row:
+                return None
+            time_index = row.index("_time")
+        elif row[time_index] and not start <= _parse_time(row[time_index]) < stop:
+            continue
+        writer.writerow(row)
+    return out.getvalue().encode()
+
+
+class CacheEntry:
+    __slots__ = ("status", "body", "content_type", "expires", "size")
+
+    def __init__(self, status: int, body: bytes, content_type: str, expires: float):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.expires = expires
+        self.size = len(body)
+
+
+class QueryCache:
+    """Byte-bounded LRU of query results with single-flight misses"""
+
+    def __init__(self, max_bytes: int = None, policy: TTLPolicy = None):
+        self.max_bytes = max_bytes or int(os.getenv("FLUX_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        self.policy = policy or TTLPolicy()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self._inflight = {}
+
+    @staticmethod
+    def key(org: str, query: str, dialect: str, authorization: str) -> str:
+        digest = hashlib.sha256()
+        for part in (org, query, dialect, hashlib.sha256(authorization.encode()).hexdigest()):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.time():
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CacheEntry):
+        """Store a successful result (too large or non-cacheable results are skipped)"""
+        if entry.status != 200 or entry.expires <= time.time() or entry.size > self.max_bytes // 4:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = entry
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key)
+        self.bytes -= entry.size
+
+    async def fetch(self, key: str, ttl: float, loader):
+        """Return (entry, "hit" | "coalesced" | "miss")
+
+        `loader` returns (status, body, content_type) and is awaited once per
+        key however many callers miss together.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry, "hit"
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending), "coalesced"
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            status, body, content_type = await loader()
+            entry = CacheEntry(status, body, content_type, time.time() + ttl)
+            self.put(key, entry)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark it retrieved so an exception no other caller awaited is not reported
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(entry)
+        return entry, "miss"
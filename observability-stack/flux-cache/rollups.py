@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Downsampling tasks for the InfluxDB payments bucket
+
+Three rollup levels, each in its own bucket and computed from the level
+below it (raw -> 1m -> 5m -> 1h), so every task reads a small input:
+
+  payments_1m  from payments      (PAYMENTS_1M_RETENTION, default 30d)
+  payments_5m  from payments_1m   (default 90d)
+  payments_1h  from payments_5m   (default 400d)
+
+Rollup points keep the measurement "payment" and the tags status, region
+and payment_method, with four fields that stay additive across levels:
+amount_sum, count, processing_time_sum and processing_time_max
+(mean processing time = processing_time_sum / count).
+
+  python rollups.py                 # create buckets and register/update the tasks
+  python rollups.py --backfill 7d   # also compute the rollups of the last 7 days
+  python rollups.py --print         # show the generated Flux
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+INFLUX_CONFIG = {
+    "url": os.getenv("INFLUXDB_URL", "http://influxdb:8086"),
+    "token": os.getenv("INFLUXDB_TOKEN", "my-super-secret-auth-token"),
+    "org": os.getenv("INFLUXDB_ORG", "myorg"),
+    "bucket": os.getenv("INFLUXDB_BUCKET", "payments")
+}
+
+MEASUREMENT = "payment"
+GROUP_TAGS = ["status", "region", "payment_method"]
+SUM_FIELDS = ["amount_sum", "count", "processing_time_sum"]
+MAX_FIELDS = ["processing_time_max"]
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration(text: str) -> timedelta:
+    """'30s', '5m', '1h', '30d', '2w'"""
+    text = text.strip()
+    if text[-1:] in DURATION_UNITS:
+        return timedelta(seconds=float(text[:-1]) * DURATION_UNITS[text[-1]])
+    return timedelta(seconds=float(text))
+
+
+class Rollup:
+    """One downsampling level: source bucket -> target bucket at a window size"""
+
+    def __init__(self, every: str, source: str, target: str, retention: str, offset: str):
+        self.every = every
+        self.source = source
+        self.target = target
+        self.retention = retention
+        self.offset = offset
+
+    @property
+    def task_name(self) -> str:
+        return f"{self.target}_rollup"
+
+    @property
+    def from_raw(self) -> bool:
+        return self.source == INFLUX_CONFIG["bucket"]
+
+    def flux(self, start: str, stop: str = None) -> str:
+        """Rollup pipeline over [start, stop), written to the target bucket"""
+        range_args = f"start: {start}" + (f", stop: {stop}" if stop else "")
+        group = ", ".join(f'"{column}"' for column in GROUP_TAGS + ["_field"])
+        window = f'every: {self.every}, createEmpty: false, timeSrc: "_start"'
+        if self.from_raw:
+            body = f'''data = from(bucket: "{self.source}")
+    |> range({range_args})
+    |> filter(fn: (r) => r._measurement == "{MEASUREMENT}")
+    |> group(columns: [{group}])
+
+amount = data |> filter(fn: (r) => r._field == "amount")
+processing = data |> filter(fn: (r) => r._field == "processing_time")
+
+union(tables: [
+    amount |> aggregateWindow({window}, fn: sum) |> set(key: "_field", value: "amount_sum"),
+    amount |> aggregateWindow({window}, fn: count) |> set(key: "_field", value: "count"),
+    processing |> aggregateWindow({window}, fn: sum) |> set(key: "_field", value: "processing_time_sum"),
+    processing |> aggregateWindow({window}, fn: max) |> set(key: "_field", value: "processing_time_max"),
+])'''
+        else:
+            sums = " or ".join(f'r._field == "{field}"' for field in SUM_FIELDS)
+            maxes = " or ".join(f'r._field == "{field}"' for field in MAX_FIELDS)
+            body = f'''data = from(bucket: "{self.source}")
+    |> range({range_args})
+    |> filter(fn: (r) => r._measurement == "{MEASUREMENT}")
+    |> group(columns: [{group}])
+
+union(tables: [
+    data |> filter(fn: (r) => {sums}) |> aggregateWindow({window}, fn: sum),
+    data |> filter(fn: (r) => {maxes}) |> aggregateWindow({window}, fn: max),
+])'''
+        return f'''{body}
+    |> set(key: "_measurement", value: "{MEASUREMENT}")
+    |> to(bucket: "{self.target}", org: "{INFLUX_CONFIG['org']}")
+'''
+
+    def task_flux(self) -> str:
+        """Task re-aggregating the last two windows (the previous one may have been partial)"""
+        every = parse_duration(self.every)
+        # Window-aligned start: a truncated first window would be written as a partial rollup
+        start = f"date.truncate(t: -{int(every.total_seconds() * 2)}s, unit: {self.every})"
+        return ('import "date"\n\n'
+                f'option task = {{name: "{self.task_name}", every: {self.every}, offset: {self.offset}}}\n\n'
+                + self.flux(start))
+
+
+ROLLUPS = [
+    Rollup("1m", INFLUX_CONFIG["bucket"], f"{INFLUX_CONFIG['bucket']}_1m",
+           os.getenv("PAYMENTS_1M_RETENTION", "30d"), offset="15s"),
+    Rollup("5m", f"{INFLUX_CONFIG['bucket']}_1m", f"{INFLUX_CONFIG['bucket']}_5m",
+           os.getenv("PAYMENTS_5M_RETENTION", "90d"), offset="30s"),
+    Rollup("1h", f"{INFLUX_CONFIG['bucket']}_5m", f"{INFLUX_CONFIG['bucket']}_1h",
+           os.getenv("PAYMENTS_1H_RETENTION", "400d"), offset="1m"),
+]
+
+
+def ensure_buckets(client, rollups=ROLLUPS):
+    """Create the rollup buckets that do not exist yet"""
+    from influxdb_client import BucketRetentionRules
+
+    buckets_api = client.buckets_api()
+    for rollup in rollups:
+        if buckets_api.find_bucket_by_name(rollup.target) is None:
+            seconds = int(parse_duration(rollup.retention).total_seconds())
+            buckets_api.create_bucket(
+                bucket_name=rollup.target,
+                retention_rules=BucketRetentionRules(type="expire", every_seconds=seconds),
+                org=INFLUX_CONFIG["org"],
+            )
+            print(f"🪣 Created bucket {rollup.target} (retention {rollup.retention})")
+
+
+def register_tasks(client, rollups=ROLLUPS):
+    """Create each rollup task, or update its Flux if it changed"""
+    from influxdb_client import TaskCreateRequest, TaskUpdateRequest
+
+    tasks_api = client.tasks_api()
+    org = client.organizations_api().find_organizations(org=INFLUX_CONFIG["org"])[0]
+    for rollup in rollups:
+        flux = rollup.task_flux()
+        existing = tasks_api.find_tasks(name=rollup.task_name, org_id=org.id)
+        if not existing:
+            tasks_api.create_task(task_create_request=TaskCreateRequest(
+                flux=flux, org_id=org.id, status="active",
+                description=f"Downsample {rollup.source} into {rollup.target} every {rollup.every}"))
+            print(f"⏱️  Registered task {rollup.task_name}")
+        elif existing[0].flux.strip() != flux.strip():
+            tasks_api.update_task_request(existing[0].id, TaskUpdateRequest(flux=flux, status="active"))
+            print(f"⏱️  Updated task {rollup.task_name}")
+        else:
+            print(f"✓ Task {rollup.task_name} is up to date")
+
+
+def backfill(client, duration: timedelta, chunk: timedelta = timedelta(days=1), rollups=ROLLUPS):
+    """Compute the rollups of the last `duration`, level by level, one chunk at a time"""
+    query_api = client.query_api()
+    end = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    for rollup in rollups:
+        # Align chunks on the window so no window is split between two queries
+        every = parse_duration(rollup.every)
+        start = datetime.fromtimestamp(
+            (end - duration).timestamp() // every.total_seconds() * every.total_seconds(), timezone.utc)
+        while start < end:
+            stop = min(start + chunk, end)
+            query_api.query(rollup.flux(_flux_time(start), _flux_time(stop)), org=INFLUX_CONFIG["org"])
+            start = stop
+        print(f"📦 Backfilled {rollup.target} over the last {duration}")
+
+
+def _flux_time(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def setup(backfill_duration: timedelta = None):
+    """Create buckets, register tasks and optionally backfill (used by the cache service at startup)"""
+    from influxdb_client import InfluxDBClient
+
+    with InfluxDBClient(url=INFLUX_CONFIG["url"], token=INFLUX_CONFIG["token"],
+                        org=INFLUX_CONFIG["org"], timeout=300_000) as client:
+        ensure_buckets(client)
+        register_tasks(client)
+        if backfill_duration:
+            backfill(client, backfill_duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Register the payments downsampling tasks")
+    parser.add_argument("--backfill", type=parse_duration, help="Also roll up this much history, e.g. 7d")
+    parser.add_argument("--print", action="store_true", help="Print the task Flux and exit")
+    args = parser.parse_args()
+
+    if args.print:
+        for rollup in ROLLUPS:
+            print(f"// ---- {rollup.task_name} ----")
+            print(rollup.task_flux())
+        return
+    try:
+        setup(args.backfill)
+    except Exception as e:
+        print(f"❌ Could not set up the rollups on {INFLUX_CONFIG['url']}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Tests for the Flux query cache: TTL policy and single-flight LRU
+
+  python -m pytest -q
+"""
+
+import asyncio
+
+import pytest
+
+from query_cache import CacheEntry, QueryCache, TTLPolicy, trim_csv
+
+NOW = 1_700_000_000.0   # 2023-11-14T22:13:20Z
+
+
+def policy(**overrides):
+    settings = dict(min_ttl=5, max_ttl=300, ratio=0.01, historical_ttl=3600, settle=300, align=False)
+    settings.update(overrides)
+    return TTLPolicy(**settings)
+
+
+# ========================
+# TTLPolicy.plan
+# ========================
+
+def test_relative_range_ttl_is_a_fraction_of_the_span():
+    query = 'from(bucket: "payments") |> range(start: -1h)'
+    assert policy().plan(query, NOW) == (query, 36.0, None)
+
+
+def test_ttl_is_clamped():
+    assert policy().plan('range(start: -1m)', NOW)[1] == 5
+    assert policy().plan('range(start: -30d)', NOW)[1] == 300
+
+
+def test_settled_range_gets_the_historical_ttl():
+    query = 'range(start: 2023-11-13T00:00:00Z, stop: 2023-11-14T00:00:00Z)'
+    assert policy().plan(query, NOW) == (query, 3600, None)
+
+
+def test_range_ending_within_the_settle_window_is_live():
+    query = 'range(start: 2023-11-14T21:13:20Z, stop: 2023-11-14T22:10:00Z)'
+    assert policy().plan(query, NOW)[1] == 34.0
+
+
+def test_widest_range_sets_the_ttl():
+    query = 'a = range(start: -1h)\nb = range(start: -10h, stop: -9h)'
+    assert policy().plan(query, NOW)[1] == 36.0
+
+
+@pytest.mark.parametrize("query", [
+    'from(bucket: "payments") |> range(start: v.timeRangeStart, stop: v.timeRangeStop)',
+    'from(bucket: "payments") |> last()',
+])
+def test_unparseable_or_missing_range_is_not_cached(query):
+    assert policy().plan(query, NOW) == (query, 0.0, None)
+
+
+def test_alignment_is_on_by_default_and_can_be_turned_off(monkeypatch):
+    monkeypatch.delenv("FLUX_CACHE_ALIGN", raising=False)
+    assert TTLPolicy().align
+    query = 'range(start: 2023-11-14T21:13:21Z, stop: 2023-11-14T22:13:19Z)'
+    assert policy(align=False).plan(query, NOW) == (query, pytest.approx(35.98), None)
+
+
+def test_alignment_snaps_to_the_ttl_and_returns_the_requested_window():
+    query = 'range(start: 2023-11-14T21:13:21Z, stop: 2023-11-14T22:13:19Z)'
+    planned, ttl, window = policy(align=True).plan(query, NOW)
+    assert ttl == pytest.approx(35.98)
+    assert window == (NOW - 3599, NOW - 1)
+    later, _, later_window = policy(align=True).plan(query.replace(":21Z", ":23Z").replace(":19Z", ":21Z"), NOW + 2)
+    assert planned == later and later_window == (NOW - 3597, NOW + 1)
+
+
+@pytest.mark.parametrize("query", [
+    'range(start: -1h)',
+    'range(start: 2023-11-14T21:13:21Z)',
+    'a = range(start: 2023-11-14T21:13:21Z, stop: 2023-11-14T22:13:19Z)\nb = range(start: -2h)',
+])
+def test_only_a_single_absolute_range_is_aligned(query):
+    assert policy(align=True).plan(query, NOW)[::2] == (query, None)
+
+
+def test_fractional_seconds_are_parsed():
+    query = 'range(start: 2023-11-14T21:13:20.123456789Z, stop: 2023-11-14T22:13:20.5+00:00)'
+    assert policy().plan(query, NOW)[1] == pytest.approx(36.0, abs=0.01)
+
+
+# ========================
+# trim_csv
+# ========================
+
+TABLES = (
+    "#datatype,string,long,dateTime:RFC3339,double\r\n"
+    "#group,false,false,false,false\r\n"
+    "#default,_result,,,\r\n"
+    ",result,table,_time,_value\r\n"
+    ",,0,2023-11-14T21:00:00Z,1\r\n"
+    ",,0,2023-11-14T21:13:21Z,2\r\n"
+    ",,0,2023-11-14T22:13:18.999999999Z,3\r\n"
+    ",,0,2023-11-14T22:13:19Z,4\r\n"
+    "\r\n"
+    "#datatype,string,long,dateTime:RFC3339,string\r\n"
+    "#group,false,false,false,true\r\n"
+    "#default,_result,,,\r\n"
+    ",result,table,_time,region\r\n"
+    ',,1,2023-11-14T21:30:00Z,"Tunis, north"\r\n'
+    "\r\n"
+).encode()
+
+
+def test_trim_keeps_the_rows_within_the_window():
+    trimmed = trim_csv(TABLES, NOW - 3599, NOW - 1)
+    rows = [line for line in trimmed.decode().split("\r\n") if line.startswith(",,")]
+    assert rows == [",,0,2023-11-14T21:13:21Z,2", ",,0,2023-11-14T22:13:18.999999999Z,3",
+                    ',,1,2023-11-14T21:30:00Z,"Tunis, north"']
+
+
+def test_trim_of_the_whole_range_returns_the_result_unchanged():
+    assert trim_csv(TABLES, NOW - 86400, NOW) == TABLES
+
+
+def test_a_table_without_time_cannot_be_trimmed():
+    aggregate = b"#datatype,string,long,double\r\n,result,table,_value\r\n,,0,42\r\n\r\n"
+    assert trim_csv(aggregate, NOW - 3600, NOW) is None
+
+
+# ========================
+# QueryCache
+# ========================
+
+def result(body: bytes = b"x", status: int = 200):
+    async def loader():
+        return status, body, "text/csv"
+    return loader
+
+
+def test_fetch_hit_after_miss():
+    cache = QueryCache(max_bytes=1024, policy=policy())
+
+    async def scenario():
+        first = await cache.fetch("k", 60, result(b"a"))
+        second = await cache.fetch("k", 60, result(b"b"))
+        return first, second
+
+    (entry, outcome), (again, second_outcome) = asyncio.run(scenario())
+    assert (outcome, second_outcome) == ("miss", "hit")
+    assert again is entry and entry.body == b"a"
+
+
+def test_concurrent_misses_share_one_upstream_query():
+    cache = QueryCache(max_bytes=1024, policy=policy())
+    calls = 0
+
+    async def slow_loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 200, b"rows", "text/csv"
+
+    async def scenario():
+        return await asyncio.gather(*(cache.fetch("k", 60, slow_loader) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert calls == 1
+    assert sorted(outcome for _, outcome in results) == ["coalesced"] * 4 + ["miss"]
+    assert len({id(entry) for entry, _ in results}) == 1
+    assert not cache._inflight
+
+
+def test_loader_error_reaches_every_waiter_and_is_not_cached():
+    cache = QueryCache(max_bytes=1024, policy=policy())
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("upstream down")
+
+    async def scenario():
+        return await asyncio.gather(*(cache.fetch("k", 60, failing) for _ in range(3)),
+                                    return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert all(isinstance(e, ConnectionError) for e in errors)
+    assert "k" not in cache.entries and not cache._inflight
+
+
+def test_error_status_and_zero_ttl_are_not_stored():
+    cache = QueryCache(max_bytes=1024, policy=policy())
+    asyncio.run(cache.fetch("error", 60, result(status=500)))
+    asyncio.run(cache.fetch("uncached", 0, result()))
+    assert not cache.entries and cache.bytes == 0
+
+
+def test_expired_entry_is_refetched(monkeypatch):
+    cache = QueryCache(max_bytes=1024, policy=policy())
+    clock = [NOW]
+    monkeypatch.setattr("query_cache.time.time", lambda: clock[0])
+    asyncio.run(cache.fetch("k", 10, result(b"old")))
+    clock[0] += 11
+    entry, outcome = asyncio.run(cache.fetch("k", 10, result(b"new")))
+    assert (outcome, entry.body) == ("miss", b"new")
+    assert cache.bytes == 3
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = QueryCache(max_bytes=400, policy=policy())
+    expires = NOW * 2
+    for key in "abcd":
+        cache.put(key, CacheEntry(200, b"x" * 100, "text/csv", expires))
+    assert cache.get("a") is not None   # a becomes the most recently used
+    cache.put("e", CacheEntry(200, b"x" * 100, "text/csv", expires))
+    assert list(cache.entries) == ["c", "d", "a", "e"]
+    assert cache.bytes == 400
+
+
+def test_results_over_a_quarter_of_the_cache_are_not_stored():
+    cache = QueryCache(max_bytes=400, policy=policy())
+    cache.put("big", CacheEntry(200, b"x" * 101, "text/csv", NOW * 2))
+    assert not cache.entries and cache.bytes == 0
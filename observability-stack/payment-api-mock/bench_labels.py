@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-request payment instrumentation overhead
+
+Compares the old hot path (build two label dicts, three .labels(**dict)
+calls) with the pre-bound children index (one dict lookup). Metrics are
+registered on a private registry with the same definitions as main.py.
+
+Usage:
+  python bench_labels.py
+  python bench_labels.py -n 500000
+"""
+
+import argparse
+import random
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Histogram
+
+from metric_children import PaymentMetricChildren
+
+STATUSES = ["success", "failed", "pending"]
+CURRENCIES = ["EUR", "USD", "GBP", "CHF", "JPY"]
+PAYMENT_METHODS = ["card", "bank_transfer", "wallet", "crypto"]
+REGIONS = ["EU", "US", "ASIA", "LATAM"]
+CARD_BRANDS = ["VISA", "MASTERCARD", "AMEX", "DISCOVER"]
+
+
+def build_metrics():
+    registry = CollectorRegistry()
+    amount = Counter('payment_amount_sum', 'amount',
+                     ['status', 'currency', 'payment_method', 'region', 'card_brand'], registry=registry)
+    count = Counter('payment_count_total', 'count',
+                    ['status', 'currency', 'payment_method', 'region', 'card_brand'], registry=registry)
+    duration = Histogram('payment_processing_duration_seconds', 'duration',
+                         ['status', 'payment_method', 'region', 'card_brand'],
+                         buckets=[0.05, 0.1, 0.2, 0.3, 0.5, 0.8, 1.0, 2.0, 5.0], registry=registry)
+    return count, amount, duration
+
+
+def labels_path(events, count, amount, duration):
+    for status, currency, payment_method, region, card_brand in events:
+        counter_labels = {
+            "status": status,
+            "currency": currency,
+            "payment_method": payment_method,
+            "region": region,
+            "card_brand": card_brand
+        }
+        histogram_labels = {
+            "status": status,
+            "payment_method": payment_method,
+            "region": region,
+            "card_brand": card_brand
+        }
+        count.labels(**counter_labels).inc()
+        if status in ("success", "failed"):
+            amount.labels(**counter_labels).inc(42.0)
+        duration.labels(**histogram_labels).observe(0.24)
+
+
+def children_path(events, children):
+    for status, currency, payment_method, region, card_brand in events:
+        count_child, amount_child, duration_child = children.get(
+            status, currency, payment_method, region, card_brand
+        )
+        count_child.inc()
+        if status in ("success", "failed"):
+            amount_child.inc(42.0)
+        duration_child.observe(0.24)
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payment instrumentation micro-benchmark")
+    parser.add_argument("-n", "--num-events", type=int, default=200000,
+                        help="Simulated payments (default: 200000)")
+    args = parser.parse_args()
+
+    events = [
+        (random.choice(STATUSES), random.choice(CURRENCIES), random.choice(PAYMENT_METHODS),
+         random.choice(REGIONS), random.choice(CARD_BRANDS))
+        for _ in range(args.num_events)
+    ]
+
+    before = timed(labels_path, events, *build_metrics())
+    children = PaymentMetricChildren(*build_metrics())
+    children.warm(STATUSES, CURRENCIES, PAYMENT_METHODS, REGIONS, CARD_BRANDS)
+    after = timed(children_path, events, children)
+
+    per_before = before / args.num_events * 1e6
+    per_after = after / args.num_events * 1e6
+    print(f"Events:               {args.num_events}")
+    print(f".labels(**dict):      {per_before:.2f} us/request")
+    print(f"pre-bound children:   {per_after:.2f} us/request")
+    print(f"Speedup:              {per_before / per_after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark: blocking time.sleep vs awaitable latency simulation
+
+Runs the same number of simulated payments through one event loop at several
+concurrency levels. With time.sleep the throughput stays flat (the loop is
+blocked), with simulate_latency it grows with the number of concurrent clients.
+
+Usage:
+  python bench_latency.py
+  python bench_latency.py -n 400 -l 0.05 -c 1 10 50 100
+  python bench_latency.py --model gaussian -n 200
+"""
+
+import argparse
+import asyncio
+import time
+
+from latency import build_latency_model, simulate_latency
+
+
+async def blocking_payment(model):
+    time.sleep(model.sample("success"))
+
+
+async def async_payment(model):
+    await simulate_latency(model.sample("success"))
+
+
+async def run_batch(handler, model, num_requests: int, concurrency: int) -> float:
+    """Run num_requests handlers with at most `concurrency` in flight, return req/s"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await handler(model)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(num_requests)))
+    return num_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency engine throughput benchmark")
+    parser.add_argument("-n", "--num-requests", type=int, default=200,
+                        help="Simulated payments per run (default: 200)")
+    parser.add_argument("-m", "--model", default="fixed",
+                        choices=["fixed", "gaussian"],
+                        help="Latency model (default: fixed)")
+    parser.add_argument("-l", "--latency", type=float, default=0.05,
+                        help="Delay in seconds for the fixed model (default: 0.05)")
+    parser.add_argument("-c", "--concurrency", type=int, nargs="+", default=[1, 10, 50, 100],
+                        help="Concurrency levels to test (default: 1 10 50 100)")
+    args = parser.parse_args()
+
+    model = build_latency_model(args.model, args.latency)
+
+    print(f"Model: {model.name}, requests per run: {args.num_requests}")
+    print(f"{'concurrency':>12} {'time.sleep req/s':>18} {'asyncio req/s':>15} {'speedup':>9}")
+    for concurrency in args.concurrency:
+        blocking = asyncio.run(run_batch(blocking_payment, model, args.num_requests, concurrency))
+        awaited = asyncio.run(run_batch(async_payment, model, args.num_requests, concurrency))
+        print(f"{concurrency:>12} {blocking:>18.1f} {awaited:>15.1f} {awaited / blocking:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
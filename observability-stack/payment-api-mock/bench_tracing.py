@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request tracing overhead
+
+Runs the tracing work of main.py (trace start, payment span, sampling
+decision, queueing) for N simulated requests on one event loop, while the
+OTLP exporter posts the kept traces to an in-process stand-in collector
+(an HTTP server on a local port that counts the spans it receives). Each
+configuration is compared with the same loop without tracing; the export
+itself (JSON encoding and HTTP) runs in the exporter's background task and
+thread, so its cost shows up in the wall time too. When spans are produced
+faster than they are exported, the bounded queue (--queue-size) drops whole
+traces and the exported share falls below the sampled share.
+
+Usage:
+  python bench_tracing.py
+  python bench_tracing.py -n 50000 --ratios 0 0.1 1 --error-rate 0.01 --slow-rate 0.005
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tracing import OTLPSpanExporter, Tracer
+
+
+class StandInCollector:
+    """OTLP/HTTP JSON receiver counting spans, on 127.0.0.1 and a free port"""
+
+    def __init__(self):
+        self.spans = 0
+        self.requests = 0
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                spans = sum(len(scope["spans"]) for resource in body["resourceSpans"]
+                            for scope in resource["scopeSpans"])
+                collector.spans += spans
+                collector.requests += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.endpoint = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reset(self):
+        self.spans = self.requests = 0
+
+    def close(self):
+        self.server.shutdown()
+
+
+def draws(num_requests: int, error_rate: float, slow_rate: float, seed: int) -> list:
+    """(failed, processing_time) per request, the same for every configuration"""
+    rng = random.Random(seed)
+    return [(rng.random() < error_rate, 2.0 if rng.random() < slow_rate else 0.2)
+            for _ in range(num_requests)]
+
+
+async def run(tracer, requests: list) -> float:
+    """Seconds per request, tracer=None for the untraced baseline"""
+    if tracer is not None:
+        await tracer.exporter.start()
+    start = time.perf_counter()
+    for failed, processing_time in requests:
+        request_start = time.time()
+        if tracer is not None:
+            trace = tracer.start(None)
+            now_ns = time.time_ns()
+            tracer.add_span(trace, "payment.process", now_ns, now_ns + int(processing_time * 1e9),
+                            {"payment.status": "failed" if failed else "success", "payment.amount": 75.0,
+                             "payment.currency": "EUR", "payment.method": "card", "payment.region": "EU"},
+                            failed)
+            tracer.finish(trace, "POST /api/payments", request_start, processing_time,
+                          {"http.method": "POST", "http.target": "/api/payments", "http.status_code": 200})
+        # A real request yields to the loop at least once
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    if tracer is not None:
+        await tracer.exporter.stop()
+    return elapsed / len(requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracing overhead benchmark")
+    parser.add_argument("-n", "--num-requests", type=int, default=20000,
+                        help="Simulated requests per run (default: 20000)")
+    parser.add_argument("-r", "--ratios", type=float, nargs="+", default=[0.0, 0.1, 1.0],
+                        help="Head sampling ratios to test (default: 0 0.1 1)")
+    parser.add_argument("--error-rate", type=float, default=0.01,
+                        help="Share of failed payments, always kept (default: 0.01)")
+    parser.add_argument("--slow-rate", type=float, default=0.005,
+                        help="Share of requests above the slow threshold, always kept (default: 0.005)")
+    parser.add_argument("--queue-size", type=int, default=2048,
+                        help="Exporter queue size (default: 2048)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    requests = draws(args.num_requests, args.error_rate, args.slow_rate, args.seed)
+    collector = StandInCollector()
+    baseline = asyncio.run(run(None, requests))
+
+    print(f"Requests per run: {args.num_requests}, errors: {args.error_rate:.1%}, slow: {args.slow_rate:.1%}")
+    print(f"Baseline (no tracing): {baseline * 1e6:.2f} us/request")
+    print(f"{'ratio':>7} {'us/request':>11} {'overhead':>10} {'exported':>8} {'spans recv':>11} {'posts':>6}")
+    for ratio in args.ratios:
+        collector.reset()
+        exporter = OTLPSpanExporter(endpoint=collector.endpoint, queue_size=args.queue_size,
+                                    flush_interval=0.2)
+        tracer = Tracer(exporter, ratio=ratio, slow_threshold=1.0)
+        per_request = asyncio.run(run(tracer, requests))
+        exported = collector.spans / 2 / args.num_requests
+        print(f"{ratio:>7g} {per_request * 1e6:>11.2f} {(per_request - baseline) * 1e6:>8.2f}us "
+              f"{exported:>8.1%} {collector.spans:>11} {collector.requests:>6}")
+    collector.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Histogram exemplars for the Payment API
+
+prometheus_client attaches exemplars to histogram buckets, but only in
+single-process mode: in multiprocess mode (gunicorn.conf.py) set_exemplar()
+is a no-op and MultiProcessCollector exposes none. ExemplarStore keeps the
+last exemplar of every bucket observed by this worker, and
+ExemplarCollector adds them to the aggregated samples at render time.
+Exemplars are examples, not totals, so the scraped worker's are as good as
+any.
+
+Exemplars are only exposed in the OpenMetrics format, which the exposition
+cache serves when the scraper asks for it (Prometheus does).
+"""
+
+import bisect
+import threading
+import time
+
+from prometheus_client.samples import Exemplar, Sample
+
+
+class ExemplarStore:
+    """Last (labels, value, timestamp) exemplar per histogram bucket, per process"""
+
+    def __init__(self, multiprocess: bool = False):
+        self.multiprocess = multiprocess
+        self._exemplars = {}
+        self._lock = threading.Lock()
+
+    def observe(self, child, value: float, trace_id: str):
+        """Observe `value` on a histogram child with a trace_id exemplar (none if trace_id is None)"""
+        if trace_id is None:
+            child.observe(value)
+            return
+        exemplar = {"trace_id": trace_id}
+        if not self.multiprocess:
+            child.observe(value, exemplar)
+            return
+        child.observe(value)
+        # The child's name, label values and bounds are only reachable through private attributes
+        bounds = child._upper_bounds
+        le = bounds[bisect.bisect_left(bounds, value)]
+        labels = frozenset(zip(child._labelnames, child._labelvalues))
+        key = (child._name + "_bucket", labels, le)
+        with self._lock:
+            self._exemplars[key] = Exemplar(exemplar, value, time.time())
+
+    def get(self, sample_name: str, labels: dict, le: float):
+        return self._exemplars.get((sample_name, frozenset(labels.items()), le))
+
+
+class ExemplarCollector:
+    """Wrap a collector (MultiProcessCollector) and attach this worker's exemplars"""
+
+    def __init__(self, collector, store: ExemplarStore):
+        self.collector = collector
+        self.store = store
+
+    def collect(self):
+        for metric in self.collector.collect():
+            if metric.type == "histogram":
+                metric.samples = [self._with_exemplar(sample) for sample in metric.samples]
+            yield metric
+
+    def _with_exemplar(self, sample: Sample) -> Sample:
+        if not sample.name.endswith("_bucket") or sample.exemplar is not None:
+            return sample
+        labels = dict(sample.labels)
+        le = labels.pop("le", None)
+        if le is None:
+            return sample
+        exemplar = self.store.get(sample.name, labels, float(le))
+        if exemplar is None:
+            return sample
+        return sample._replace(exemplar=exemplar)
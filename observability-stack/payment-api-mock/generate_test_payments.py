@@ -2,23 +2,38 @@
 """
 Script to generate test payment data by calling the Payment API
 Generates realistic payment traffic to populate InfluxDB
+
+Without options it trickles one payment every 1-5 seconds. With --rate,
+--duration or --count it switches to high-throughput mode: a thread pool
+sharing one pooled keep-alive session sends pre-encoded payloads at the
+target rate (or as fast as possible with --rate 0).
 """
 
-import requests
+import argparse
+import itertools
+import json
 import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import requests
+from requests.adapters import HTTPAdapter
+
 API_URL = "http://localhost:8080/api/payments"
 
 # Sample customer IDs for realistic distribution
 CUSTOMER_IDS = [f"cust_{i:05d}" for i in range(1, 5001)]
+CURRENCIES = ["EUR", "USD", "GBP", "CHF", "JPY"]
+
+JSON_HEADERS = {"Content-Type": "application/json"}
 
 def generate_payment():
     """Generate a single payment request"""
     customer_id = random.choice(CUSTOMER_IDS)
-    currency = random.choice(["EUR", "USD", "GBP", "CHF", "JPY"])
-    
+    currency = random.choice(CURRENCIES)
+
     # Let the API generate realistic amounts by passing 0
     payload = {
         "amount": 0.0,  # API will generate realistic amount
@@ -26,12 +41,100 @@ def generate_payment():
         "customer_id": customer_id,
         "description": f"Test payment from {customer_id}"
     }
-    
+
     return payload
 
-def main():
+def precompute_payloads(size):
+    """Encode `size` payloads once; the senders cycle through them"""
+    return [json.dumps(generate_payment()).encode() for _ in range(size)]
+
+def build_session(pool_size):
+    """One session whose connection pool holds a keep-alive connection per thread"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class ThroughputStats:
+    """Thread-safe counters for the high-throughput mode"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.successful = 0
+        self.failed = 0
+        self.errors = 0
+
+    def add(self, field):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    @property
+    def total(self):
+        return self.successful + self.failed + self.errors
+
+def run_high_throughput(url, rate, duration, count, threads, payload_pool, timeout):
+    """Send payments from a thread pool at `rate` per second (0 = unthrottled)"""
+    print("🚀 Starting high-throughput payment generation...")
+    print(f"📡 API URL: {url}")
+    print(f"⚙️  Rate: {'unthrottled' if rate <= 0 else f'{rate:g}/s'} | Threads: {threads} | "
+          f"Duration: {f'{duration:g}s' if duration else '-'} | Count: {count or '-'}\n")
+
+    payloads = precompute_payloads(payload_pool)
+    session = build_session(threads)
+    stats = ThroughputStats()
+    slots = itertools.count()  # next payment number, shared by all threads
+    stop = threading.Event()
+    start = time.monotonic()
+
+    def sender():
+        while not stop.is_set():
+            n = next(slots)
+            if count and n >= count:
+                return
+            if rate > 0:
+                # Payment n is due at start + n / rate, whichever thread sends it
+                delay = start + n / rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            if duration and time.monotonic() - start >= duration:
+                return
+            try:
+                response = session.post(url, data=payloads[n % len(payloads)],
+                                         headers=JSON_HEADERS, timeout=timeout)
+                stats.add("successful" if response.status_code == 200 else "failed")
+            except requests.exceptions.RequestException:
+                stats.add("errors")
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(sender) for _ in range(threads)]
+        last_total, last_time = 0, start
+        try:
+            while not all(f.done() for f in futures):
+                time.sleep(0.2)
+                now = time.monotonic()
+                if now - last_time >= 5:
+                    total = stats.total
+                    print(f"📊 [{datetime.now():%H:%M:%S}] Total={total} "
+                          f"({(total - last_total) / (now - last_time):.0f}/s), "
+                          f"Success={stats.successful}, Failed={stats.failed}, Errors={stats.errors}")
+                    last_total, last_time = total, now
+        except KeyboardInterrupt:
+            # Inside the `with`: the pool's shutdown(wait=True) only returns once the senders see it
+            stop.set()
+            print(f"\n\n🛑 Stopped by user")
+
+    elapsed = time.monotonic() - start
+    print(f"\n📊 Final Stats:")
+    print(f"   Total Payments: {stats.total} in {elapsed:.1f}s ({stats.total / elapsed:.0f}/s)")
+    print(f"   Successful: {stats.successful}")
+    print(f"   Failed: {stats.failed}")
+    print(f"   Errors: {stats.errors}")
+
+def run_trickle(url):
+    """Original behavior: one payment every 1-5 seconds, until interrupted"""
     print("🚀 Starting payment generation...")
-    print(f"📡 API URL: {API_URL}\n")
+    print(f"📡 API URL: {url}\n")
     
     total_payments = 0
     successful_payments = 0
@@ -41,7 +144,7 @@ def main():
         while True:
             try:
                 payload = generate_payment()
-                response = requests.post(API_URL, json=payload, timeout=5)
+                response = requests.post(url, json=payload, timeout=5)
                 
                 if response.status_code == 200:
                     successful_payments += 1
@@ -70,5 +173,22 @@ def main():
         print(f"   Successful: {successful_payments}")
         print(f"   Failed: {failed_payments}")
 
+def main():
+    parser = argparse.ArgumentParser(description="Generate test payments against the Payment API")
+    parser.add_argument("--url", default=API_URL, help=f"Payment endpoint (default: {API_URL})")
+    parser.add_argument("--rate", type=float, help="High-throughput mode: payments per second (0 = as fast as possible)")
+    parser.add_argument("--duration", type=float, help="High-throughput mode: stop after N seconds")
+    parser.add_argument("--count", type=int, help="High-throughput mode: stop after N payments")
+    parser.add_argument("--threads", type=int, default=32, help="Concurrent senders / pooled connections (default: 32)")
+    parser.add_argument("--payload-pool", type=int, default=10000, help="Pre-computed payloads to cycle through (default: 10000)")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Request timeout in seconds (default: 5)")
+    args = parser.parse_args()
+
+    if args.rate is None and args.duration is None and args.count is None:
+        run_trickle(args.url)
+    else:
+        run_high_throughput(args.url, args.rate or 0.0, args.duration, args.count,
+                            args.threads, args.payload_pool, args.timeout)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,38 @@
+"""
+Production launch configuration for the Payment API
+
+Runs N uvicorn workers under gunicorn. prometheus_client keeps its metrics
+per process, so every worker writes them to PROMETHEUS_MULTIPROC_DIR and
+/metrics aggregates the files of all workers (see main.py).
+
+Usage:
+  gunicorn -c gunicorn.conf.py main:app
+  WEB_CONCURRENCY=8 gunicorn -c gunicorn.conf.py main:app
+"""
+
+import multiprocessing
+import os
+import shutil
+
+# Must be set before any worker imports prometheus_client
+multiproc_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-multiproc")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+graceful_timeout = 30
+accesslog = None
+
+
+def on_starting(server):
+    # Metric files from a previous run would be summed into the new one
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+    server.log.info(f"Prometheus multiprocess dir: {multiproc_dir} ({workers} workers)")
+
+
+def child_exit(server, worker):
+    # Drop live gauges of dead workers from the aggregation
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Offline InfluxDB seeder for the payments bucket
+
+Generates payment points with the same schema as main-influxdb.py
+(payment_schema.payment_record) without going through the HTTP API or its
+simulated processing delay, and streams them as line protocol in large
+batches, either gzip-compressed to InfluxDB or to a file.
+
+Points are evenly spread (with jitter) over the time range and written in
+time order. Customer and merchant cardinality are configurable so Flux
+queries can be capacity-tested against realistic series counts.
+
+  # One million points over the last 7 days, straight into InfluxDB
+  python influx_seeder.py --duration 7d --points 1000000
+
+  # 50 points per simulated second for one day, to a gzip file
+  python influx_seeder.py --start 2024-01-01T00:00:00Z --duration 1d --rate 50 -o payments.lp.gz
+"""
+
+import argparse
+import gzip
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from latency import generate_processing_time
+from payment_schema import MEASUREMENT, MERCHANT_COUNT, generate_realistic_amount, payment_record, pick_status, to_line_protocol
+from schema_policy import SchemaPolicy, parse_policy
+
+CURRENCIES = ["EUR", "USD", "GBP", "CHF", "JPY"]
+
+INFLUX_CONFIG = {
+    "url": os.getenv("INFLUXDB_URL", "http://influxdb:8086"),
+    "token": os.getenv("INFLUXDB_TOKEN", "my-super-secret-auth-token"),
+    "org": os.getenv("INFLUXDB_ORG", "myorg"),
+    "bucket": os.getenv("INFLUXDB_BUCKET", "payments")
+}
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration(text: str) -> timedelta:
+    """'90s', '15m', '12h', '7d', '2w' or plain seconds"""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smhdw]?)", text.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid duration: {text}")
+    return timedelta(seconds=float(match.group(1)) * DURATION_UNITS.get(match.group(2) or "s"))
+
+
+def parse_time(text: str) -> datetime:
+    """ISO 8601 timestamp (UTC if no offset) or 'now'"""
+    if text == "now":
+        return datetime.now(timezone.utc)
+    try:
+        value = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid timestamp: {text}")
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def generate_lines(start_ns: int, end_ns: int, points: int, customers: int,
+                   merchants: int, rng: random.Random, policy: SchemaPolicy = None):
+    """Yield `points` line-protocol lines in time order between start and end"""
+    customer_ids = [f"cust_{i:05d}" for i in range(1, customers + 1)]
+    step = (end_ns - start_ns) / points
+    for n in range(points):
+        status = pick_status(rng)
+        amount = generate_realistic_amount(rng)
+        processing_time = generate_processing_time(status, rng)
+        tags, fields = payment_record(status, rng.choice(CURRENCIES), rng.choice(customer_ids),
+                                      amount, processing_time, rng=rng, merchant_count=merchants)
+        if policy is not None:
+            tags, fields = policy.apply(MEASUREMENT, tags, fields)
+        # One point per slot, jittered inside it, so timestamps stay increasing
+        yield to_line_protocol(tags, fields, start_ns + int((n + rng.random()) * step))
+
+
+class FileSink:
+    """Line protocol to a file (gzip if the name ends in .gz) or stdout"""
+
+    def __init__(self, path: str):
+        self.path = path
+        if path == "-":
+            self.file = sys.stdout
+        elif path.endswith(".gz"):
+            self.file = gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+        else:
+            self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, lines):
+        self.file.write("\n".join(lines))
+        self.file.write("\n")
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class InfluxSink:
+    """Synchronous gzip-compressed batch writes, retried with backoff"""
+
+    def __init__(self, config: dict, max_retries: int = 5):
+        from influxdb_client import InfluxDBClient, WritePrecision
+        from influxdb_client.client.write_api import SYNCHRONOUS
+
+        self.path = f"{config['url']} (bucket {config['bucket']})"
+        self.bucket = config["bucket"]
+        self.org = config["org"]
+        self.precision = WritePrecision.NS
+        self.max_retries = max_retries
+        self.client = InfluxDBClient(url=config["url"], token=config["token"], org=config["org"],
+                                     enable_gzip=True, timeout=60_000)
+        self.write_api = self.client.write_api(write_options=SYNCHRONOUS)
+
+    def write(self, lines):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.write_api.write(bucket=self.bucket, org=self.org, record=lines,
+                                     write_precision=self.precision)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"⚠️ Write failed ({e}), retrying in {delay:.1f}s", file=sys.stderr)
+                time.sleep(delay)
+
+    def close(self):
+        self.write_api.close()
+        self.client.close()
+
+
+def seed(sink, start: datetime, end: datetime, points: int, customers: int,
+         merchants: int, batch_size: int, seed_value=None, policy: SchemaPolicy = None):
+    """Generate and write all points, printing progress per batch"""
+    rng = random.Random(seed_value)
+    start_ns = int(start.timestamp() * 1e9)
+    end_ns = int(end.timestamp() * 1e9)
+
+    print(f"🌱 Seeding {points} points from {start:%Y-%m-%d %H:%M:%S} to {end:%Y-%m-%d %H:%M:%S} UTC",
+          file=sys.stderr)
+    print(f"⚙️  Customers: {customers} | Merchants: {merchants} | Batch: {batch_size} | "
+          f"Output: {sink.path}", file=sys.stderr)
+
+    started = time.monotonic()
+    written = 0
+    batch = []
+    for line in generate_lines(start_ns, end_ns, points, customers, merchants, rng, policy):
+        batch.append(line)
+        if len(batch) >= batch_size:
+            sink.write(batch)
+            written += len(batch)
+            batch = []
+            elapsed = time.monotonic() - started
+            print(f"📊 {written}/{points} points ({written / elapsed:.0f}/s)", file=sys.stderr)
+    if batch:
+        sink.write(batch)
+        written += len(batch)
+
+    elapsed = time.monotonic() - started
+    print(f"✅ Wrote {written} points in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.0f}/s)",
+          file=sys.stderr)
+    if policy is not None:
+        print(f"🏷️  Schema policy: {policy.describe()}, ~{policy.check_budget():.0f} series", file=sys.stderr)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the InfluxDB payments bucket without the HTTP API")
+    parser.add_argument("--start", type=parse_time, help="First timestamp (ISO 8601, default: end - duration)")
+    parser.add_argument("--end", type=parse_time, help="Last timestamp (ISO 8601 or 'now', default: now)")
+    parser.add_argument("--duration", type=parse_duration, default=timedelta(days=1),
+                        help="Time range when --start or --end is missing, e.g. 12h, 7d (default: 1d)")
+    volume = parser.add_mutually_exclusive_group()
+    volume.add_argument("--points", type=int, help="Total number of points (default: 100000)")
+    volume.add_argument("--rate", type=float, help="Points per simulated second")
+    parser.add_argument("--customers", type=int, default=5000, help="Distinct customer_id tags (default: 5000)")
+    parser.add_argument("--merchants", type=int, default=MERCHANT_COUNT,
+                        help=f"Distinct merchant_id tags (default: {MERCHANT_COUNT})")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Lines per write (default: 50000)")
+    parser.add_argument("--seed", help="Random seed for a reproducible data set")
+    parser.add_argument("--schema-policy",
+                        help="Apply a schema policy like the API, e.g. customer_id=hash:64,merchant_id=field")
+    parser.add_argument("--series-budget", type=int,
+                        help="Apply a schema policy and demote tags above this many series")
+    parser.add_argument("-o", "--output",
+                        help="Write line protocol to this file instead of InfluxDB (.gz = gzip, - = stdout)")
+    args = parser.parse_args()
+
+    if args.start and args.end:
+        start, end = args.start, args.end
+    elif args.start:
+        start, end = args.start, args.start + args.duration
+    else:
+        end = args.end or datetime.now(timezone.utc)
+        start = end - args.duration
+    if end <= start:
+        parser.error("the end of the time range must be after its start")
+
+    if args.rate is not None:
+        points = int(args.rate * (end - start).total_seconds())
+    else:
+        points = args.points or 100000
+    if points < 1:
+        parser.error("nothing to write: the point count must be at least 1")
+
+    policy = None
+    if args.schema_policy is not None or args.series_budget is not None:
+        policy = SchemaPolicy(policy=parse_policy(args.schema_policy or ""), series_budget=args.series_budget or 0)
+
+    sink = FileSink(args.output) if args.output else InfluxSink(INFLUX_CONFIG)
+    try:
+        seed(sink, start, end, points, args.customers, args.merchants, args.batch_size, args.seed, policy)
+    except KeyboardInterrupt:
+        print(f"\n🛑 Stopped by user", file=sys.stderr)
+    finally:
+        sink.close()
+
+
+if __name__ == "__main__":
+    main()
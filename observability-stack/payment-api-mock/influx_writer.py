@@ -0,0 +1,175 @@
+"""
+Asynchronous batched InfluxDB writer for the Payment API
+
+Points are queued in memory and written in line-protocol batches by a
+background task, so the request path never waits on an InfluxDB round-trip.
+
+- Bounded queue (INFLUX_QUEUE_SIZE)
+- Batches flushed by size (INFLUX_BATCH_SIZE) or age (INFLUX_FLUSH_INTERVAL)
+- Retries with exponential backoff and jitter (INFLUX_MAX_RETRIES)
+- Overflow policy when the queue is full (INFLUX_OVERFLOW_POLICY):
+    drop  - discard the point and count it
+    block - wait for room in the queue (backpressure on the request)
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# ========================
+# PROMETHEUS METRICS
+# ========================
+
+INFLUX_QUEUE_DEPTH = Gauge(
+    'payment_influx_queue_depth',
+    'Points waiting in the InfluxDB write queue',
+    multiprocess_mode='livesum'
+)
+
+INFLUX_BATCH_SIZE = Histogram(
+    'payment_influx_batch_size',
+    'Number of points per InfluxDB write batch',
+    buckets=[1, 10, 50, 100, 250, 500, 1000, 2500, 5000]
+)
+
+INFLUX_FLUSH_LATENCY = Histogram(
+    'payment_influx_flush_duration_seconds',
+    'Time spent writing one batch to InfluxDB (including retries)',
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+)
+
+INFLUX_POINTS = Counter(
+    'payment_influx_points_total',
+    'Points handled by the InfluxDB writer',
+    ['result']  # written, dropped, failed
+)
+
+
+class BatchingInfluxWriter:
+    """Background writer sending line-protocol batches to InfluxDB"""
+
+    def __init__(self, write_api, bucket: str, org: str,
+                 queue_size: int = None, batch_size: int = None,
+                 flush_interval: float = None, max_retries: int = None,
+                 retry_interval: float = None, overflow_policy: str = None):
+        self.write_api = write_api
+        self.bucket = bucket
+        self.org = org
+        self.queue_size = queue_size or int(os.getenv("INFLUX_QUEUE_SIZE", "10000"))
+        self.batch_size = batch_size or int(os.getenv("INFLUX_BATCH_SIZE", "500"))
+        self.flush_interval = flush_interval or float(os.getenv("INFLUX_FLUSH_INTERVAL", "1.0"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("INFLUX_MAX_RETRIES", "3"))
+        self.retry_interval = retry_interval or float(os.getenv("INFLUX_RETRY_INTERVAL", "0.5"))
+        self.overflow_policy = (overflow_policy or os.getenv("INFLUX_OVERFLOW_POLICY", "drop")).lower()
+        if self.overflow_policy not in ("drop", "block"):
+            raise ValueError(f"Unknown overflow policy: {self.overflow_policy}")
+
+        self._queue = None
+        self._task = None
+        self._stopping = False
+
+    async def start(self):
+        """Create the queue and start the flush loop (call from app startup)"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"InfluxDB writer started: batch={self.batch_size}, interval={self.flush_interval}s, "
+            f"queue={self.queue_size}, policy={self.overflow_policy}"
+        )
+
+    async def stop(self):
+        """Flush remaining points and stop the flush loop (call from app shutdown)"""
+        if self._task is None:
+            return
+        # wait_for() can swallow a cancellation that lands as its get() completes: the flag ends the loop then
+        self._stopping = True
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        while not self._queue.empty():
+            await self._flush(self._drain(self.batch_size))
+
+    async def submit(self, point) -> bool:
+        """Queue a Point (or line-protocol string), returns False if it was dropped"""
+        if self._queue is None:
+            raise RuntimeError("InfluxDB writer is not started")
+        line = point if isinstance(point, str) else point.to_line_protocol()
+        if self.overflow_policy == "block":
+            await self._queue.put(line)
+        else:
+            try:
+                self._queue.put_nowait(line)
+            except asyncio.QueueFull:
+                INFLUX_POINTS.labels(result="dropped").inc()
+                return False
+        INFLUX_QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    def _drain(self, limit: int) -> list:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        INFLUX_QUEUE_DEPTH.set(self._queue.qsize())
+        return batch
+
+    async def _run(self):
+        batch = []
+        try:
+            while not self._stopping:
+                # Wait for the first point, then fill the batch until it is full or too old
+                batch = [await self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size and not self._stopping:
+                    batch.extend(self._drain(self.batch_size - len(batch)))
+                    if len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                INFLUX_QUEUE_DEPTH.set(self._queue.qsize())
+                pending, batch = batch, []
+                await self._flush(pending)
+        except asyncio.CancelledError:
+            # Shutdown: write what was already taken off the queue
+            await self._flush(batch)
+            raise
+
+    async def _flush(self, batch: list):
+        if not batch:
+            return
+        INFLUX_BATCH_SIZE.observe(len(batch))
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                # The client call is blocking: run it off the event loop
+                await loop.run_in_executor(None, self._write, "\n".join(batch))
+                INFLUX_POINTS.labels(result="written").inc(len(batch))
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    INFLUX_POINTS.labels(result="failed").inc(len(batch))
+                    logger.error(f"InfluxDB batch of {len(batch)} points failed: {e}")
+                    break
+                # Exponential backoff with full jitter
+                delay = random.uniform(0, self.retry_interval * (2 ** attempt))
+                logger.warning(f"InfluxDB write failed (attempt {attempt + 1}), retrying in {delay:.2f}s: {e}")
+                await asyncio.sleep(delay)
+        INFLUX_FLUSH_LATENCY.observe(time.perf_counter() - start)
+
+    def _write(self, body: str):
+        self.write_api.write(bucket=self.bucket, org=self.org, record=body)
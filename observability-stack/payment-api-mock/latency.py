@@ -0,0 +1,98 @@
+"""
+Latency simulation engine for the Payment API mock
+
+The processing delay of a payment is drawn from a latency model and then
+awaited with asyncio.sleep, so a single uvicorn worker keeps serving other
+requests while a payment is "being processed".
+
+Models:
+- gaussian: status-dependent normal distribution (default, historical behavior)
+- fixed:    constant delay, useful for benchmarks
+- none:     no delay at all
+
+With SIMULATION_SEED set, draws come from per-stream seeded generators
+(stream_rng) so a run can be replayed; with VIRTUAL_TIME=true the delay is
+recorded in the metrics but not awaited.
+"""
+
+import abc
+import asyncio
+import os
+import random
+
+VIRTUAL_TIME = os.getenv("VIRTUAL_TIME", "false").lower() == "true"
+
+
+def stream_rng(seed, *names):
+    """Return a seeded random.Random for one stream, or the global module if seed is None"""
+    if seed is None:
+        return random
+    return random.Random(":".join([str(seed), *map(str, names)]))
+
+
+def generate_processing_time(status: str, rng=random) -> float:
+    """Realistic processing time based on status"""
+    if status == "success":
+        return max(0.05, round(rng.gauss(0.24, 0.10), 3))
+    else:
+        return max(0.1, round(rng.gauss(0.80, 0.35), 3))
+
+
+class LatencyModel(abc.ABC):
+    """Base latency model: returns the simulated processing time in seconds"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def sample(self, status: str, rng=random) -> float:
+        """Processing time in seconds of a payment with this status"""
+
+
+class GaussianLatencyModel(LatencyModel):
+    """Status-dependent Gaussian delay (success ~240ms, failure ~800ms)"""
+
+    name = "gaussian"
+
+    def sample(self, status: str, rng=random) -> float:
+        return generate_processing_time(status, rng)
+
+
+class FixedLatencyModel(LatencyModel):
+    """Constant delay regardless of status"""
+
+    name = "fixed"
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def sample(self, status: str, rng=random) -> float:
+        return self.seconds
+
+
+class NoLatencyModel(FixedLatencyModel):
+    """No simulated processing delay"""
+
+    name = "none"
+
+    def __init__(self):
+        super().__init__(0.0)
+
+
+def build_latency_model(name: str = None, fixed_seconds: float = None) -> LatencyModel:
+    """Build a latency model from its name (LATENCY_MODEL / LATENCY_FIXED_SECONDS env)"""
+    name = (name or os.getenv("LATENCY_MODEL", "gaussian")).lower()
+    if name == "gaussian":
+        return GaussianLatencyModel()
+    if name == "fixed":
+        if fixed_seconds is None:
+            fixed_seconds = float(os.getenv("LATENCY_FIXED_SECONDS", "0.24"))
+        return FixedLatencyModel(fixed_seconds)
+    if name == "none":
+        return NoLatencyModel()
+    raise ValueError(f"Unknown latency model: {name}")
+
+
+async def simulate_latency(seconds: float) -> None:
+    """Wait for the simulated processing time without blocking the event loop"""
+    if seconds > 0 and not VIRTUAL_TIME:
+        await asyncio.sleep(seconds)
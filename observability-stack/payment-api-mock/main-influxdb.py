@@ -7,9 +7,14 @@ import random
 import time
 import os
 from dotenv import load_dotenv
-from influxdb_client import InfluxDBClient, Point
+from influxdb_client import InfluxDBClient
 from influxdb_client.client.write_api import SYNCHRONOUS
+from influx_writer import BatchingInfluxWriter
 from prometheus_fastapi_instrumentator import Instrumentator
+from latency import build_latency_model, simulate_latency
+from payment_schema import MEASUREMENT, build_point, generate_realistic_amount, payment_record, pick_status
+from schema_policy import SchemaPolicy
+from stats_store import PaymentStatsStore
 import logging
 
 # Load environment variables
@@ -27,6 +32,9 @@ INFLUX_CONFIG = {
     "bucket": os.getenv("INFLUXDB_BUCKET", "payments")
 }
 
+# Simulated processing delay (gaussian | fixed | none)
+latency_model = build_latency_model()
+
 # Initialize FastAPI app
 app = FastAPI(title="Payment API", version="1.0.0")
 
@@ -49,23 +57,36 @@ influx_client = InfluxDBClient(
 )
 write_api = influx_client.write_api(write_options=SYNCHRONOUS)
 
-# Helper functions for realistic data generation
-def generate_realistic_amount() -> float:
-    """Distribution réaliste: 80% < 200€, 15% 200-1000€, 5% > 1000€"""
-    rand = random.random()
-    if rand < 0.80:
-        return round(random.gauss(75, 45), 2)
-    elif rand < 0.95:
-        return round(random.gauss(500, 250), 2)
-    else:
-        return round(random.gauss(2000, 1000), 2)
+# Background batched writer: points are queued, never written on the request path
+influx_writer = BatchingInfluxWriter(
+    write_api,
+    bucket=INFLUX_CONFIG["bucket"],
+    org=INFLUX_CONFIG["org"]
+)
 
-def generate_processing_time(status: str) -> float:
-    """Temps réaliste selon statut"""
-    if status == "success":
-        return max(0.05, round(random.gauss(0.24, 0.10), 3))
-    else:
-        return max(0.1, round(random.gauss(0.80, 0.35), 3))
+# Tag/field/hash/drop per attribute, with automatic tag demotion over the series budget
+schema_policy = SchemaPolicy()
+
+@app.on_event("startup")
+async def start_influx_writer():
+    await influx_writer.start()
+    logger.info(f"InfluxDB schema policy: {schema_policy.describe()}, series budget {schema_policy.series_budget}")
+
+@app.on_event("shutdown")
+async def stop_influx_writer():
+    await influx_writer.stop()
+    influx_client.close()
+
+# In-memory streaming statistics served by /api/payments/stats
+payment_stats = PaymentStatsStore()
+
+@app.on_event("startup")
+async def start_payment_stats():
+    await payment_stats.start()
+
+@app.on_event("shutdown")
+async def stop_payment_stats():
+    await payment_stats.stop()
 
 # Models
 class PaymentRequest(BaseModel):
@@ -139,13 +160,7 @@ async def process_payment(payment: PaymentRequest):
     start_time = time.time()
     
     # Determine status (97% success, 2% failed, 1% pending)
-    status_rand = random.random()
-    if status_rand < 0.97:
-        status = "success"
-    elif status_rand < 0.99:
-        status = "failed"
-    else:
-        status = "pending"
+    status = pick_status()
     
     is_success = status == "success"
     
@@ -153,57 +168,24 @@ async def process_payment(payment: PaymentRequest):
     amount = payment.amount if payment.amount > 0 else generate_realistic_amount()
     
     # Generate realistic processing time
-    processing_time = generate_processing_time(status)
-    time.sleep(processing_time)
-    
-    # Generate additional metrics
-    network_latency = round(random.uniform(5, 50), 1)
-    gateway_latency = round(random.uniform(10, 100), 1)
+    processing_time = latency_model.sample(status)
+    await simulate_latency(processing_time)
     
     # Create payment record
     payment_id = f"pay_{int(time.time() * 1000)}_{random.randint(1000, 9999)}"
     timestamp = datetime.utcnow().isoformat()
     
-    # Write comprehensive data to InfluxDB
+    # Write comprehensive data to InfluxDB (schema shared with influx_seeder.py)
     try:
-        point = Point("payment")
-        
-        # Tags
-        point.tag("status", status)
-        point.tag("currency", payment.currency)
-        point.tag("customer_id", payment.customer_id)
-        point.tag("merchant_id", f"merch_{random.randint(1, 500):04d}")
-        point.tag("payment_method", random.choice(["card", "bank_transfer", "wallet", "crypto"]))
-        point.tag("region", random.choice(["EU", "US", "ASIA", "LATAM"]))
-        point.tag("card_brand", random.choice(["VISA", "MASTERCARD", "AMEX", "DISCOVER"]))
-        point.tag("risk_level", random.choices(
-            ["low", "medium", "high", "critical"],
-            weights=[0.80, 0.15, 0.04, 0.01]
-        )[0])
-        
-        # Fields
-        point.field("amount", float(amount))
-        point.field("processing_time", processing_time)
-        point.field("network_latency", network_latency)
-        point.field("gateway_latency", gateway_latency)
-        point.field("error_code", 0 if is_success else random.randint(5001, 5010))
-        point.field("retry_count", 0 if is_success else random.randint(1, 3))
-        point.field("fraud_score", round(random.uniform(0, 0.05), 3) if is_success 
-                    else round(random.uniform(0.70, 1.0), 3))
-        point.field("response_time", processing_time * 1000)
-        point.field("fee", round(amount * 0.029 + 0.30, 2))  # 2.9% + 0.30€
-        point.field("success", 1 if is_success else 0)
+        tags, fields = payment_record(status, payment.currency, payment.customer_id, amount, processing_time)
+        payment_stats.record(status, amount, processing_time, tags)
+        tags, fields = schema_policy.apply(MEASUREMENT, tags, fields)
+        point = build_point(tags, fields, datetime.utcnow())
         
-        point.time(datetime.utcnow())
-            
-        write_api.write(
-            bucket=INFLUX_CONFIG["bucket"],
-            org=INFLUX_CONFIG["org"],
-            record=point
-        )
-        logger.info(f"Payment {payment_id} written to InfluxDB: {status}")
+        if await influx_writer.submit(point):
+            logger.info(f"Payment {payment_id} queued for InfluxDB: {status}")
     except Exception as e:
-        logger.error(f"Failed to write to InfluxDB: {str(e)}")
+        logger.error(f"Failed to queue InfluxDB point: {str(e)}")
     
     # Prepare response
     if is_success:
@@ -223,18 +205,14 @@ async def process_payment(payment: PaymentRequest):
 
 # Get payment statistics
 @app.get("/api/payments/stats")
-async def get_payment_stats():
+async def get_payment_stats(dimension: str = None):
+    """Totals, quantiles and per-dimension breakdowns (?dimension=region adds that dimension's quantiles)"""
     try:
-        # This is a simplified example - you'd typically query InfluxDB here
-        return {
-            "total_payments": 0,  # Replace with actual query
-            "success_rate": 1.0,   # Replace with actual calculation
-            "avg_processing_time": 0.0  # Replace with actual calculation
-        }
-    except Exception as e:
+        return payment_stats.stats(dimension)
+    except KeyError:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown dimension {dimension!r}, expected one of: {', '.join(payment_stats.dimensions)}"
         )
 
 # Initialize Prometheus instrumentation
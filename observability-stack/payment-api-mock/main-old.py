@@ -7,6 +7,8 @@ import random
 import time
 import os
 from dotenv import load_dotenv
+from latency import build_latency_model, simulate_latency
+from rolling_window import RollingWindow, WindowCollector
 import logging
 
 # Prometheus metrics
@@ -37,6 +39,9 @@ app.add_middleware(
 # Prometheus Registry
 registry = CollectorRegistry()
 
+# Simulated processing delay (gaussian | fixed | none)
+latency_model = build_latency_model()
+
 # ============================================
 # PROMETHEUS METRICS DEFINITIONS
 # ============================================
@@ -115,12 +120,17 @@ payment_retries_total = Counter(
     registry=registry
 )
 
-# Current gauges for real-time monitoring
+# Sliding 1m/5m/15m windows of payment outcomes (per-second ring buffers)
+rolling_window = RollingWindow()
+registry.register(WindowCollector(rolling_window))
+
+# Current gauges for real-time monitoring (computed at scrape time)
 payment_success_rate = Gauge(
     'payment_success_rate',
-    'Current success rate percentage',
+    'Success rate percentage over the last 5 minutes',
     registry=registry
 )
+payment_success_rate.set_function(lambda: rolling_window.window("5m")["success_rate"])
 
 # Helper functions
 def generate_realistic_amount() -> float:
@@ -133,13 +143,6 @@ def generate_realistic_amount() -> float:
     else:
         return round(random.gauss(2000, 1000), 2)
 
-def generate_processing_time(status: str) -> float:
-    """Realistic processing time based on status"""
-    if status == "success":
-        return max(0.05, round(random.gauss(0.24, 0.10), 3))
-    else:
-        return max(0.1, round(random.gauss(0.80, 0.35), 3))
-
 # Models
 class PaymentRequest(BaseModel):
     amount: float = 0.0
@@ -155,19 +158,8 @@ class PaymentResponse(BaseModel):
     timestamp: str
     processing_time_ms: float
 
-# Success rate tracker (simple moving average)
-success_count = 0
-total_count = 0
-
 def update_success_rate(is_success: bool):
-    global success_count, total_count
-    total_count += 1
-    if is_success:
-        success_count += 1
-    
-    if total_count > 0:
-        rate = (success_count / total_count) * 100
-        payment_success_rate.set(rate)
+    rolling_window.record(is_success)
 
 # Health check endpoint
 @app.get("/health")
@@ -202,8 +194,8 @@ async def process_payment(payment: PaymentRequest):
     amount = payment.amount if payment.amount > 0 else generate_realistic_amount()
     
     # Generate realistic processing time
-    processing_time = generate_processing_time(status)
-    time.sleep(processing_time)
+    processing_time = latency_model.sample(status)
+    await simulate_latency(processing_time)
     
     # Generate additional metrics
     network_latency = round(random.uniform(5, 50), 1)
@@ -304,8 +296,9 @@ async def process_payment(payment: PaymentRequest):
 @app.get("/api/payments/stats")
 async def get_payment_stats():
     return {
-        "total_payments": total_count,
-        "success_rate": (success_count / total_count * 100) if total_count > 0 else 0,
+        "total_payments": rolling_window.lifetime_total,
+        "success_rate": rolling_window.lifetime_success_rate,
+        "windows": rolling_window.snapshot(),
         "message": "Check /metrics endpoint for detailed Prometheus metrics"
     }
 
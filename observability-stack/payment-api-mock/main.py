@@ -3,13 +3,21 @@ from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from datetime import datetime
+import asyncio
 import random
 import time
 import os
 from dotenv import load_dotenv
 from influxdb_client import InfluxDBClient, Point
 from influxdb_client.client.write_api import SYNCHRONOUS
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from influx_writer import BatchingInfluxWriter
+from metrics_cache import ExpositionCache
+from metric_children import PaymentMetricChildren
+from prometheus_client import Counter, Histogram, CollectorRegistry, REGISTRY, multiprocess
+from latency import build_latency_model, simulate_latency, stream_rng
+from stats_store import PaymentStatsStore
+from exemplars import ExemplarCollector, ExemplarStore
+from tracing import OTLPSpanExporter, Tracer
 import logging
 
 # Load environment variables
@@ -27,6 +35,17 @@ INFLUX_CONFIG = {
     "bucket": os.getenv("INFLUXDB_BUCKET", "payments")
 }
 
+# Simulated processing delay (gaussian | fixed | none)
+latency_model = build_latency_model()
+
+# Seeded replay: one random stream per concern (unset = global random)
+SIMULATION_SEED = os.getenv("SIMULATION_SEED")
+STATUS_RNG = stream_rng(SIMULATION_SEED, "status")
+AMOUNT_RNG = stream_rng(SIMULATION_SEED, "amount")
+LATENCY_RNG = stream_rng(SIMULATION_SEED, "latency")
+DIMENSION_RNG = stream_rng(SIMULATION_SEED, "dimensions")
+ID_RNG = stream_rng(SIMULATION_SEED, "ids")
+
 # Initialize FastAPI app
 app = FastAPI(title="Payment API", version="1.0.0")
 
@@ -49,10 +68,56 @@ influx_client = InfluxDBClient(
 )
 write_api = influx_client.write_api(write_options=SYNCHRONOUS)
 
+# Background batched writer: points are queued, never written on the request path
+influx_writer = BatchingInfluxWriter(
+    write_api,
+    bucket=INFLUX_CONFIG["bucket"],
+    org=INFLUX_CONFIG["org"]
+)
+
+@app.on_event("startup")
+async def start_influx_writer():
+    await influx_writer.start()
+
+@app.on_event("shutdown")
+async def stop_influx_writer():
+    await influx_writer.stop()
+    influx_client.close()
+
+# In-memory streaming statistics served by /api/payments/stats
+payment_stats = PaymentStatsStore()
+
+@app.on_event("startup")
+async def start_payment_stats():
+    await payment_stats.start()
+
+@app.on_event("shutdown")
+async def stop_payment_stats():
+    await payment_stats.stop()
+
+# Spans batched to OTEL_EXPORTER_OTLP_ENDPOINT (e.g. http://tempo:4318) by a background task,
+# for the traces kept by the head ratio or because they failed or were slow
+span_exporter = OTLPSpanExporter()
+tracer = Tracer(span_exporter)
+
+@app.on_event("startup")
+async def start_span_exporter():
+    await span_exporter.start()
+
+@app.on_event("shutdown")
+async def stop_span_exporter():
+    await span_exporter.stop()
+
 # ========================
 # PROMETHEUS METRICS
 # ========================
 
+# Multi-worker mode (gunicorn.conf.py): metrics live in PROMETHEUS_MULTIPROC_DIR
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# trace_id exemplars of the request and processing histograms
+exemplar_store = ExemplarStore(multiprocess=MULTIPROCESS)
+
 # Counter: total amount by status + dimensions (includes currency)
 PAYMENT_AMOUNT = Counter(
     'payment_amount_sum',
@@ -75,6 +140,18 @@ PAYMENT_PROCESSING_DURATION = Histogram(
     buckets=[0.05, 0.1, 0.2, 0.3, 0.5, 0.8, 1.0, 2.0, 5.0]
 )
 
+# Payment dimensions
+STATUSES = ["success", "failed", "pending"]
+CURRENCIES = ["EUR", "USD", "GBP", "CHF", "JPY"]
+PAYMENT_METHODS = ["card", "bank_transfer", "wallet", "crypto"]
+REGIONS = ["EU", "US", "ASIA", "LATAM"]
+CARD_BRANDS = ["VISA", "MASTERCARD", "AMEX", "DISCOVER"]
+
+# Pre-bound children: one dict lookup per request instead of three .labels() calls
+PAYMENT_CHILDREN = PaymentMetricChildren(PAYMENT_COUNT, PAYMENT_AMOUNT, PAYMENT_PROCESSING_DURATION)
+if os.getenv("PREBIND_METRIC_CHILDREN", "false").lower() == "true":
+    PAYMENT_CHILDREN.warm(STATUSES, CURRENCIES, PAYMENT_METHODS, REGIONS, CARD_BRANDS)
+
 # Optional: generic HTTP metrics
 from prometheus_client import Counter as GenCounter, Histogram as GenHistogram
 REQUEST_COUNT = GenCounter(
@@ -92,20 +169,14 @@ REQUEST_LATENCY = GenHistogram(
 # HELPERS
 # ========================
 
-def generate_realistic_amount() -> float:
-    rand = random.random()
+def generate_realistic_amount(rng=random) -> float:
+    rand = rng.random()
     if rand < 0.80:
-        return max(0.01, round(random.gauss(75, 45), 2))
+        return max(0.01, round(rng.gauss(75, 45), 2))
     elif rand < 0.95:
-        return max(0.01, round(random.gauss(500, 250), 2))
-    else:
-        return max(0.01, round(random.gauss(2000, 1000), 2))
-
-def generate_processing_time(status: str) -> float:
-    if status == "success":
-        return max(0.05, round(random.gauss(0.24, 0.10), 3))
+        return max(0.01, round(rng.gauss(500, 250), 2))
     else:
-        return max(0.1, round(random.gauss(0.80, 0.35), 3))
+        return max(0.01, round(rng.gauss(2000, 1000), 2))
 
 # ========================
 # MODELS
@@ -134,15 +205,28 @@ async def monitor_requests(request: Request, call_next):
     start = time.time()
     method = request.method
     endpoint = request.url.path
+    trace = request.state.trace = tracer.start(request.headers.get("traceparent"))
     try:
         response = await call_next(request)
+        duration = time.time() - start
         REQUEST_COUNT.labels(method, endpoint, response.status_code).inc()
-        REQUEST_LATENCY.labels(method, endpoint).observe(time.time() - start)
+        kept = finish_request_trace(trace, method, endpoint, start, duration, response.status_code)
+        exemplar_store.observe(REQUEST_LATENCY.labels(method, endpoint), duration,
+                               trace.trace_id if kept else None)
+        response.headers["X-Trace-Id"] = trace.trace_id
         return response
     except Exception as e:
         REQUEST_COUNT.labels(method, endpoint, 500).inc()
+        finish_request_trace(trace, method, endpoint, start, time.time() - start, 500)
         raise e
 
+def finish_request_trace(trace, method: str, endpoint: str, start: float, duration: float, status_code: int) -> bool:
+    return tracer.finish(
+        trace, f"{method} {endpoint}", start, duration,
+        {"http.method": method, "http.target": endpoint, "http.status_code": status_code},
+        status_code >= 500
+    )
+
 # ========================
 # ENDPOINTS
 # ========================
@@ -151,9 +235,26 @@ async def monitor_requests(request: Request, call_next):
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
 
+# Multi-worker mode (gunicorn.conf.py): aggregate the metric files of all workers,
+# plus the exemplars of the worker answering the scrape
+if MULTIPROCESS:
+    exposition_registry = CollectorRegistry()
+    exposition_registry.register(ExemplarCollector(multiprocess.MultiProcessCollector(None), exemplar_store))
+else:
+    exposition_registry = REGISTRY
+
+# Shared by /metrics and /metrics-auto: one render per METRICS_CACHE_TTL
+exposition_cache = ExpositionCache(registry=exposition_registry)
+
 @app.get("/metrics")
-async def metrics():
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+async def metrics(request: Request):
+    # Rendering blocks: run it on the default executor so payments keep being served meanwhile
+    body, headers = await asyncio.get_running_loop().run_in_executor(
+        None, exposition_cache.render,
+        request.headers.get("Accept"),
+        request.headers.get("Accept-Encoding")
+    )
+    return Response(content=body, headers=headers)
 
 @app.post("/api/payments", response_model=PaymentResponse)
 async def process_payment(payment: PaymentRequest, request: Request):
@@ -172,7 +273,7 @@ async def process_payment(payment: PaymentRequest, request: Request):
         pending_rate /= total
     
     # Determine status based on custom or default rates
-    r = random.random()
+    r = STATUS_RNG.random()
     if r < success_rate:
         status = "success"
     elif r < success_rate + failure_rate:
@@ -181,58 +282,65 @@ async def process_payment(payment: PaymentRequest, request: Request):
         status = "pending"
 
     is_success = (status == "success")
-    amount = payment.amount if payment.amount > 0 else generate_realistic_amount()
-    processing_time = generate_processing_time(status)
-    time.sleep(processing_time)
+    amount = payment.amount if payment.amount > 0 else generate_realistic_amount(AMOUNT_RNG)
+    processing_time = latency_model.sample(status, LATENCY_RNG)
+    processing_start_ns = time.time_ns()
+    await simulate_latency(processing_time)
 
     # Generate dimensions
-    payment_method = random.choice(["card", "bank_transfer", "wallet", "crypto"])
-    region = random.choice(["EU", "US", "ASIA", "LATAM"])
-    card_brand = random.choice(["VISA", "MASTERCARD", "AMEX", "DISCOVER"])
+    payment_method = DIMENSION_RNG.choice(PAYMENT_METHODS)
+    region = DIMENSION_RNG.choice(REGIONS)
+    card_brand = DIMENSION_RNG.choice(CARD_BRANDS)
+    risk_level = DIMENSION_RNG.choices(["low","medium","high","critical"], weights=[0.80,0.15,0.04,0.01])[0]
 
     # ------------------------
     # ✅ PROMETHEUS METRICS
     # ------------------------
-    counter_labels = {
-        "status": status,
-        "currency": payment.currency,
-        "payment_method": payment_method,
-        "region": region,
-        "card_brand": card_brand
-    }
-
-    histogram_labels = {
-        "status": status,
-        "payment_method": payment_method,
-        "region": region,
-        "card_brand": card_brand
-    }
-
-    PAYMENT_COUNT.labels(**counter_labels).inc()
+    count_child, amount_child, duration_child = PAYMENT_CHILDREN.get(
+        status, payment.currency, payment_method, region, card_brand
+    )
+    count_child.inc()
     if status in ("success", "failed"):
-        PAYMENT_AMOUNT.labels(**counter_labels).inc(amount)
-    PAYMENT_PROCESSING_DURATION.labels(**histogram_labels).observe(processing_time)
+        amount_child.inc(amount)
+    trace = request.state.trace
+    failed = status == "failed"
+    exemplar_store.observe(duration_child, processing_time,
+                           trace.trace_id if tracer.may_keep(trace, failed, processing_time) else None)
+    payment_stats.record(status, amount, processing_time, {
+        "currency": payment.currency, "payment_method": payment_method, "region": region,
+        "card_brand": card_brand, "risk_level": risk_level,
+    })
+
+    tracer.add_span(
+        trace, "payment.process", processing_start_ns, processing_start_ns + int(processing_time * 1e9),
+        {"payment.status": status, "payment.amount": float(amount), "payment.currency": payment.currency,
+         "payment.method": payment_method, "payment.region": region},
+        failed
+    )
 
     # ------------------------
     # 📦 InfluxDB (optional)
     # ------------------------
     try:
         point = Point("payment")
-        for k, v in counter_labels.items():
-            point.tag(k, v)
-        point.tag("risk_level", random.choices(["low","medium","high","critical"], weights=[0.80,0.15,0.04,0.01])[0])
+        point.tag("status", status)
+        point.tag("currency", payment.currency)
+        point.tag("payment_method", payment_method)
+        point.tag("region", region)
+        point.tag("card_brand", card_brand)
+        point.tag("risk_level", risk_level)
         point.field("amount", float(amount))
         point.field("processing_time", processing_time)
         point.field("success", 1 if is_success else 0)
         point.time(datetime.utcnow())
-        write_api.write(bucket=INFLUX_CONFIG["bucket"], org=INFLUX_CONFIG["org"], record=point)
+        await influx_writer.submit(point)
     except Exception as e:
-        logger.error(f"InfluxDB write failed: {e}")
+        logger.error(f"InfluxDB queue failed: {e}")
 
     # ------------------------
     # 📤 Response
     # ------------------------
-    payment_id = f"pay_{int(time.time() * 1000)}_{random.randint(1000, 9999)}"
+    payment_id = f"pay_{int(time.time() * 1000)}_{ID_RNG.randint(1000, 9999)}"
     if is_success:
         return PaymentResponse(
             payment_id=payment_id,
@@ -249,12 +357,20 @@ async def process_payment(payment: PaymentRequest, request: Request):
         )
 
 @app.get("/api/payments/stats")
-async def get_payment_stats():
-    return {"info": "Use /metrics for Prometheus data"}
+async def get_payment_stats(dimension: str = None):
+    """Totals, quantiles and per-dimension breakdowns (?dimension=region adds that dimension's quantiles)"""
+    try:
+        return payment_stats.stats(dimension)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown dimension {dimension!r}, expected one of: {', '.join(payment_stats.dimensions)}"
+        )
 
 # Optional: auto-instrumentation
 from prometheus_fastapi_instrumentator import Instrumentator
-Instrumentator().instrument(app).expose(app, include_in_schema=False, endpoint="/metrics-auto")
+Instrumentator().instrument(app)
+app.add_api_route("/metrics-auto", metrics, methods=["GET"], include_in_schema=False)
 
 if __name__ == "__main__":
     import uvicorn
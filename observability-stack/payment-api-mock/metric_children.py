@@ -0,0 +1,49 @@
+"""
+Pre-bound label children for the payment metrics hot path
+
+Calling .labels(**dict) hashes the label values and takes the metric lock on
+every request. The payment dimensions (status x currency x method x region x
+brand) form a small finite space, so each combination is resolved once and
+the three child metrics are kept in a plain dict keyed by the value tuple.
+"""
+
+import itertools
+
+
+class PaymentMetricChildren:
+    """Index of resolved (count, amount, duration) children per label combination"""
+
+    __slots__ = ("count", "amount", "duration", "_children")
+
+    def __init__(self, count_metric, amount_metric, duration_metric):
+        self.count = count_metric
+        self.amount = amount_metric
+        self.duration = duration_metric
+        self._children = {}
+
+    def get(self, status: str, currency: str, payment_method: str, region: str, card_brand: str):
+        """Return (count_child, amount_child, duration_child) for one combination"""
+        key = (status, currency, payment_method, region, card_brand)
+        children = self._children.get(key)
+        if children is None:
+            children = self._resolve(key)
+        return children
+
+    def warm(self, statuses, currencies, payment_methods, regions, card_brands):
+        """Resolve every combination up front (also exports them as zero-valued series)"""
+        for key in itertools.product(statuses, currencies, payment_methods, regions, card_brands):
+            if key not in self._children:
+                self._resolve(key)
+
+    def _resolve(self, key):
+        status, currency, payment_method, region, card_brand = key
+        children = (
+            self.count.labels(status, currency, payment_method, region, card_brand),
+            self.amount.labels(status, currency, payment_method, region, card_brand),
+            self.duration.labels(status, payment_method, region, card_brand),
+        )
+        self._children[key] = children
+        return children
+
+    def __len__(self):
+        return len(self._children)
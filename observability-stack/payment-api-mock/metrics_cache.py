@@ -0,0 +1,114 @@
+"""
+Cached Prometheus exposition for the Payment API
+
+Rendering the registry is proportional to the number of series, and the
+payment counters have many label combinations. The rendered body is kept for
+METRICS_CACHE_TTL seconds per format (Prometheus text / OpenMetrics), together
+with a pre-compressed gzip copy, so concurrent scrapers (/metrics,
+/metrics-auto, federation, several Prometheus replicas) share one render.
+render() blocks while it renders: call it from a thread, not the event loop.
+"""
+
+import gzip
+import os
+import threading
+import time
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.exposition import choose_encoder
+
+# ========================
+# PROMETHEUS METRICS
+# ========================
+
+METRICS_RENDER_DURATION = Histogram(
+    'payment_metrics_render_duration_seconds',
+    'Time spent rendering the /metrics exposition',
+    ['format'],
+    buckets=[0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+)
+
+METRICS_BODY_SIZE = Gauge(
+    'payment_metrics_body_bytes',
+    'Size of the last rendered /metrics body',
+    ['format', 'encoding'],
+    multiprocess_mode='livemax'
+)
+
+METRICS_CACHE_REQUESTS = Counter(
+    'payment_metrics_cache_requests_total',
+    'Scrapes served by the exposition cache',
+    ['result']  # hit, miss
+)
+
+
+class _Entry:
+    __slots__ = ("rendered_at", "content_type", "body", "gzip_body")
+
+    def __init__(self, rendered_at, content_type, body, gzip_body):
+        self.rendered_at = rendered_at
+        self.content_type = content_type
+        self.body = body
+        self.gzip_body = gzip_body
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip (q=0 refuses a coding, * covers unlisted ones)"""
+    wildcard = False
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding in ("gzip", "x-gzip"):
+            return q > 0
+        if coding == "*":
+            wildcard = q > 0
+    return wildcard
+
+
+class ExpositionCache:
+    """Render the registry at most once per TTL and per exposition format"""
+
+    def __init__(self, registry=REGISTRY, ttl: float = None, gzip_level: int = 6):
+        self.registry = registry
+        self.ttl = ttl if ttl is not None else float(os.getenv("METRICS_CACHE_TTL", "1.0"))
+        self.gzip_level = gzip_level
+        self._entries = {}
+        # One lock per format: scrapers of one format wait for its render, not for the other's
+        self._locks = {"text": threading.Lock(), "openmetrics": threading.Lock()}
+
+    def render(self, accept: str = None, accept_encoding: str = None):
+        """Return (body, headers) negotiated from the Accept / Accept-Encoding headers"""
+        encoder, content_type = choose_encoder(accept)
+        fmt = "openmetrics" if content_type.startswith("application/openmetrics-text") else "text"
+
+        with self._locks[fmt]:
+            entry = self._entries.get(fmt)
+            if entry is None or time.monotonic() - entry.rendered_at >= self.ttl:
+                METRICS_CACHE_REQUESTS.labels(result="miss").inc()
+                entry = self._render(fmt, encoder, content_type)
+                self._entries[fmt] = entry
+            else:
+                METRICS_CACHE_REQUESTS.labels(result="hit").inc()
+
+        headers = {"Content-Type": entry.content_type, "Vary": "Accept, Accept-Encoding"}
+        if accept_encoding and accepts_gzip(accept_encoding):
+            headers["Content-Encoding"] = "gzip"
+            return entry.gzip_body, headers
+        return entry.body, headers
+
+    def _render(self, fmt: str, encoder, content_type: str) -> _Entry:
+        start = time.perf_counter()
+        body = encoder(self.registry)
+        gzip_body = gzip.compress(body, compresslevel=self.gzip_level)
+        METRICS_RENDER_DURATION.labels(format=fmt).observe(time.perf_counter() - start)
+        METRICS_BODY_SIZE.labels(format=fmt, encoding="identity").set(len(body))
+        METRICS_BODY_SIZE.labels(format=fmt, encoding="gzip").set(len(gzip_body))
+        return _Entry(time.monotonic(), content_type, body, gzip_body)
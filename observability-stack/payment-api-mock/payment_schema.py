@@ -0,0 +1,118 @@
+"""
+InfluxDB point schema of a processed payment
+
+Shared by the API (main-influxdb.py) and the offline seeder (influx_seeder.py)
+so both write exactly the same measurement, tags and fields:
+
+- tags:   status, currency, customer_id, merchant_id, payment_method,
+          region, card_brand, risk_level
+- fields: amount, processing_time, network_latency, gateway_latency,
+          error_code, retry_count, fraud_score, response_time, fee, success
+
+payment_record() draws one payment's tags and fields; build_point() turns
+them into an influxdb_client Point and to_line_protocol() encodes them
+directly (same output as Point, much cheaper for bulk generation).
+"""
+
+import random
+
+MEASUREMENT = "payment"
+
+PAYMENT_METHODS = ["card", "bank_transfer", "wallet", "crypto"]
+REGIONS = ["EU", "US", "ASIA", "LATAM"]
+CARD_BRANDS = ["VISA", "MASTERCARD", "AMEX", "DISCOVER"]
+RISK_LEVELS = ["low", "medium", "high", "critical"]
+RISK_WEIGHTS = [0.80, 0.15, 0.04, 0.01]
+MERCHANT_COUNT = 500
+
+
+def pick_status(rng=random) -> str:
+    """97% success, 2% failed, 1% pending"""
+    status_rand = rng.random()
+    if status_rand < 0.97:
+        return "success"
+    elif status_rand < 0.99:
+        return "failed"
+    return "pending"
+
+
+def generate_realistic_amount(rng=random) -> float:
+    """Distribution réaliste: 80% < 200€, 15% 200-1000€, 5% > 1000€"""
+    rand = rng.random()
+    if rand < 0.80:
+        return round(rng.gauss(75, 45), 2)
+    elif rand < 0.95:
+        return round(rng.gauss(500, 250), 2)
+    else:
+        return round(rng.gauss(2000, 1000), 2)
+
+
+def merchant_id(number: int) -> str:
+    return f"merch_{number:04d}"
+
+
+def payment_record(status: str, currency: str, customer_id: str, amount: float,
+                   processing_time: float, rng=random, merchant_count: int = MERCHANT_COUNT):
+    """Draw the tags and fields of one payment point"""
+    is_success = status == "success"
+    tags = {
+        "status": status,
+        "currency": currency,
+        "customer_id": customer_id,
+        "merchant_id": merchant_id(rng.randint(1, merchant_count)),
+        "payment_method": rng.choice(PAYMENT_METHODS),
+        "region": rng.choice(REGIONS),
+        "card_brand": rng.choice(CARD_BRANDS),
+        "risk_level": rng.choices(RISK_LEVELS, weights=RISK_WEIGHTS)[0],
+    }
+    fields = {
+        "amount": float(amount),
+        "processing_time": processing_time,
+        "network_latency": round(rng.uniform(5, 50), 1),
+        "gateway_latency": round(rng.uniform(10, 100), 1),
+        "error_code": 0 if is_success else rng.randint(5001, 5010),
+        "retry_count": 0 if is_success else rng.randint(1, 3),
+        "fraud_score": (round(rng.uniform(0, 0.05), 3) if is_success
+                        else round(rng.uniform(0.70, 1.0), 3)),
+        "response_time": processing_time * 1000,
+        "fee": round(amount * 0.029 + 0.30, 2),  # 2.9% + 0.30€
+        "success": 1 if is_success else 0,
+    }
+    return tags, fields
+
+
+def build_point(tags: dict, fields: dict, time=None):
+    """influxdb_client Point for a payment record"""
+    from influxdb_client import Point
+
+    point = Point(MEASUREMENT)
+    for key, value in tags.items():
+        point.tag(key, value)
+    for key, value in fields.items():
+        point.field(key, value)
+    if time is not None:
+        point.time(time)
+    return point
+
+
+def _escape_tag(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(",", "\\,").replace("=", "\\=").replace(" ", "\\ ")
+
+
+def _format_field(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        # Like influxdb_client: whole numbers without the trailing ".0"
+        text = str(value)
+        return text[:-2] if text.endswith(".0") else text
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def to_line_protocol(tags: dict, fields: dict, timestamp_ns: int) -> str:
+    """Encode a payment record as one line of line protocol (ns precision)"""
+    tag_text = ",".join(f"{key}={_escape_tag(tags[key])}" for key in sorted(tags) if tags[key] != "")
+    field_text = ",".join(f"{key}={_format_field(fields[key])}" for key in sorted(fields))
+    return f"{MEASUREMENT},{tag_text} {field_text} {timestamp_ns}"
@@ -0,0 +1,124 @@
+"""
+Rolling-window payment outcome aggregator
+
+Payments are counted in a ring of per-second buckets covering the longest
+window (15 minutes by default). Each window (1m, 5m, 15m) keeps running
+success/total sums: recording a payment adds to the current bucket and the
+sums, and when the clock moves on, the buckets leaving each window are
+subtracted. Recording and reading are therefore O(1) whatever the request
+rate, and memory is fixed.
+
+Single writer: record() and the readers are called from the event loop
+thread only, so no lock is taken on the request path.
+
+WindowCollector exports the windows at scrape time:
+
+- payment_window_success_rate{window}           success percentage
+- payment_window_throughput_per_second{window}  payments per second
+- payment_window_payments{window}               payments in the window
+"""
+
+import time
+
+from prometheus_client.core import GaugeMetricFamily
+
+DEFAULT_WINDOWS = {"1m": 60, "5m": 300, "15m": 900}
+
+
+class RollingWindow:
+    """Success and total counts over sliding windows of per-second buckets"""
+
+    def __init__(self, windows: dict = None, clock=time.monotonic):
+        self.windows = dict(windows or DEFAULT_WINDOWS)
+        self.size = max(self.windows.values())
+        self.clock = clock
+        self.successes = [0] * self.size
+        self.totals = [0] * self.size
+        # window name -> [successes, total] over the last `seconds` buckets
+        self._sums = {name: [0, 0] for name in self.windows}
+        self._seconds = list(self.windows.items())
+        self.started = clock()
+        self.current = int(self.started)
+        self.lifetime_successes = 0
+        self.lifetime_total = 0
+
+    def _advance(self, second: int):
+        """Move the ring forward to `second`, expiring buckets from every window"""
+        gap = second - self.current
+        if gap <= 0:
+            return
+        if gap >= self.size:
+            self.successes = [0] * self.size
+            self.totals = [0] * self.size
+            for sums in self._sums.values():
+                sums[0] = sums[1] = 0
+        else:
+            successes, totals, size = self.successes, self.totals, self.size
+            for new_second in range(self.current + 1, second + 1):
+                for name, seconds in self._seconds:
+                    # The bucket of `new_second - seconds` drops out of this window
+                    slot = (new_second - seconds) % size
+                    sums = self._sums[name]
+                    sums[0] -= successes[slot]
+                    sums[1] -= totals[slot]
+                slot = new_second % size
+                successes[slot] = 0
+                totals[slot] = 0
+        self.current = second
+
+    def record(self, is_success: bool):
+        self._advance(int(self.clock()))
+        slot = self.current % self.size
+        self.totals[slot] += 1
+        self.lifetime_total += 1
+        if is_success:
+            self.successes[slot] += 1
+            self.lifetime_successes += 1
+            for sums in self._sums.values():
+                sums[0] += 1
+                sums[1] += 1
+        else:
+            for sums in self._sums.values():
+                sums[1] += 1
+
+    def window(self, name: str) -> dict:
+        """Payments, success rate (%) and throughput (/s) over one window"""
+        now = self.clock()
+        self._advance(int(now))
+        successes, total = self._sums[name]
+        # A young process has not filled the window yet
+        span = min(self.windows[name], max(1.0, now - self.started))
+        return {
+            "payments": total,
+            "success_rate": round(successes / total * 100, 2) if total else 0.0,
+            "throughput_per_second": round(total / span, 3),
+        }
+
+    def snapshot(self) -> dict:
+        return {name: self.window(name) for name in self.windows}
+
+    @property
+    def lifetime_success_rate(self) -> float:
+        return self.lifetime_successes / self.lifetime_total * 100 if self.lifetime_total else 0.0
+
+
+class WindowCollector:
+    """Prometheus collector computing the window gauges at scrape time"""
+
+    def __init__(self, rolling: RollingWindow):
+        self.rolling = rolling
+
+    def collect(self):
+        success_rate = GaugeMetricFamily(
+            'payment_window_success_rate', 'Success rate percentage over a sliding window', labels=['window'])
+        throughput = GaugeMetricFamily(
+            'payment_window_throughput_per_second', 'Payments per second over a sliding window', labels=['window'])
+        payments = GaugeMetricFamily(
+            'payment_window_payments', 'Payments processed within a sliding window', labels=['window'])
+        for name, values in self.rolling.snapshot().items():
+            success_rate.add_metric([name], values["success_rate"])
+            throughput.add_metric([name], values["throughput_per_second"])
+            payments.add_metric([name], values["payments"])
+        yield success_rate
+        yield throughput
+        yield payments
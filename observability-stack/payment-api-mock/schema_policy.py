@@ -0,0 +1,198 @@
+"""
+Schema policy for InfluxDB payment points
+
+Every tag multiplies the number of series InfluxDB has to index, and
+customer_id (thousands of values) and merchant_id (hundreds) dominate that
+product. The policy decides, per attribute, how it is written:
+
+- tag:      indexed tag (historical behavior)
+- field:    string field <attribute>_value, kept but not indexed (a field
+            sharing the key of the tag it replaces would clash with the
+            tag in older points of the same measurement)
+- hash:     tag holding one of N stable hash buckets (SCHEMA_HASH_BUCKETS)
+- drop:     not written at all (also applies to fields)
+
+SCHEMA_POLICY overrides the default (everything a tag), e.g.
+"customer_id=hash:64,merchant_id=tag".
+
+Series cardinality is estimated with a HyperLogLog sketch over the series
+keys written so far. When the estimate exceeds SCHEMA_SERIES_BUDGET, the
+demotable tag (SCHEMA_DEMOTABLE) with the highest estimated cardinality is
+switched to SCHEMA_DEMOTE_TO and the series sketch starts over, so the
+estimate always describes the series produced by the current policy.
+"""
+
+import logging
+import math
+import os
+import threading
+import zlib
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+MODES = ("tag", "field", "hash", "drop")
+FIELD_SUFFIX = "_value"
+
+# ========================
+# PROMETHEUS METRICS
+# ========================
+
+SERIES_CARDINALITY = Gauge(
+    'payment_influx_series_cardinality_estimate',
+    'Estimated number of distinct series written under the current schema policy (HyperLogLog)',
+    multiprocess_mode='livemax'
+)
+
+TAG_CARDINALITY = Gauge(
+    'payment_influx_tag_cardinality_estimate',
+    'Estimated number of distinct values of a demotable tag (HyperLogLog)',
+    ['tag'],
+    multiprocess_mode='livemax'
+)
+
+SERIES_BUDGET = Gauge(
+    'payment_influx_series_budget',
+    'Series budget above which tags are demoted (0 = no budget)',
+    multiprocess_mode='livemax'
+)
+
+TAG_DEMOTIONS = Counter(
+    'payment_influx_tag_demotions_total',
+    'Tags demoted by the schema policy because the series budget was exceeded',
+    ['tag', 'mode']
+)
+
+
+class HyperLogLog:
+    """Fixed-memory distinct-count estimator (2^precision one-byte registers)"""
+
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"HyperLogLog precision must be between 4 and 16, got {precision}")
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        self._rank_bits = 64 - precision
+        self._rank_mask = (1 << self._rank_bits) - 1
+        self._alpha = 0.7213 / (1 + 1.079 / self.size)
+
+    def add(self, value: str):
+        # str hashes are SipHash, salted per process: uniform and stable for the process lifetime
+        x = hash(value) & 0xFFFFFFFFFFFFFFFF
+        index = x >> self._rank_bits
+        rank = self._rank_bits - (x & self._rank_mask).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self) -> float:
+        total = sum(2.0 ** -r for r in self.registers)
+        raw = self._alpha * self.size * self.size / total
+        if raw <= 2.5 * self.size:
+            zeros = self.registers.count(0)
+            if zeros:
+                # Small range: linear counting is more accurate
+                return self.size * math.log(self.size / zeros)
+        return raw
+
+    def clear(self):
+        self.registers = bytearray(self.size)
+
+
+def parse_policy(text: str) -> dict:
+    """'customer_id=hash:64,merchant_id=field' -> {attribute: (mode, buckets)}"""
+    policy = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        attribute, _, spec = item.partition("=")
+        mode, _, buckets = spec.strip().lower().partition(":")
+        if mode not in MODES:
+            raise ValueError(f"Unknown schema mode for {attribute}: {mode!r} (expected one of {', '.join(MODES)})")
+        policy[attribute.strip()] = (mode, int(buckets) if buckets else None)
+    return policy
+
+
+class SchemaPolicy:
+    """Rewrites the tags and fields of a point according to the per-attribute policy"""
+
+    def __init__(self, policy: dict = None, series_budget: int = None, demotable=None,
+                 demote_to: str = None, hash_buckets: int = None, precision: int = None,
+                 check_every: int = None):
+        self.policy = dict(policy if policy is not None else parse_policy(os.getenv("SCHEMA_POLICY", "")))
+        self.series_budget = series_budget if series_budget is not None else int(os.getenv("SCHEMA_SERIES_BUDGET", "100000"))
+        self.demotable = list(demotable if demotable is not None else
+                              filter(None, os.getenv("SCHEMA_DEMOTABLE", "customer_id,merchant_id").split(",")))
+        self.demote_to = (demote_to or os.getenv("SCHEMA_DEMOTE_TO", "field")).lower()
+        if self.demote_to not in MODES or self.demote_to == "tag":
+            raise ValueError(f"Unknown demotion mode: {self.demote_to}")
+        self.hash_buckets = hash_buckets or int(os.getenv("SCHEMA_HASH_BUCKETS", "64"))
+        self.check_every = check_every or int(os.getenv("SCHEMA_CHECK_EVERY", "1000"))
+        precision = precision or int(os.getenv("SCHEMA_HLL_PRECISION", "12"))
+
+        self.series = HyperLogLog(precision)
+        self.tag_values = {tag: HyperLogLog(precision) for tag in self.demotable}
+        self._since_check = 0
+        self._lock = threading.Lock()
+        SERIES_BUDGET.set(self.series_budget)
+
+    def mode(self, attribute: str):
+        return self.policy.get(attribute, ("tag", None))
+
+    def apply(self, measurement: str, tags: dict, fields: dict):
+        """Return the (tags, fields) to write and account for the resulting series"""
+        if self.policy:
+            tags = dict(tags)
+            fields = dict(fields)
+            for attribute, (mode, buckets) in self.policy.items():
+                if attribute not in tags:
+                    if mode == "drop":
+                        fields.pop(attribute, None)
+                    continue
+                if mode == "tag":
+                    continue
+                value = tags.pop(attribute)
+                if mode == "field":
+                    fields[attribute + FIELD_SUFFIX] = value
+                elif mode == "hash":
+                    bucket = zlib.crc32(value.encode()) % (buckets or self.hash_buckets)
+                    tags[attribute] = f"h{bucket:03d}"
+
+        for tag, sketch in self.tag_values.items():
+            value = tags.get(tag)
+            if value is not None:
+                sketch.add(value)
+        self.series.add(measurement + "," + ",".join(f"{key}={tags[key]}" for key in sorted(tags)))
+
+        self._since_check += 1
+        if self._since_check >= self.check_every:
+            self.check_budget()
+        return tags, fields
+
+    def check_budget(self) -> float:
+        """Refresh the cardinality metrics and demote a tag if the budget is exceeded"""
+        with self._lock:
+            self._since_check = 0
+            estimate = self.series.estimate()
+            SERIES_CARDINALITY.set(estimate)
+            candidates = {}
+            for tag, sketch in self.tag_values.items():
+                tag_estimate = sketch.estimate()
+                TAG_CARDINALITY.labels(tag=tag).set(tag_estimate)
+                if self.mode(tag)[0] == "tag":
+                    candidates[tag] = tag_estimate
+
+            if self.series_budget and estimate > self.series_budget and candidates:
+                tag = max(candidates, key=candidates.get)
+                self.policy[tag] = (self.demote_to, None)
+                TAG_DEMOTIONS.labels(tag=tag, mode=self.demote_to).inc()
+                logger.warning(
+                    f"Series cardinality ~{estimate:.0f} exceeds budget {self.series_budget}: "
+                    f"demoting tag {tag} (~{candidates[tag]:.0f} values) to {self.demote_to}"
+                )
+                self.series.clear()
+            return estimate
+
+    def describe(self) -> dict:
+        """Current mode of every policy-controlled attribute"""
+        attributes = set(self.policy) | set(self.demotable)
+        return {attribute: self.mode(attribute)[0] for attribute in sorted(attributes)}
@@ -0,0 +1,428 @@
+"""
+In-process streaming payment statistics for /api/payments/stats
+
+Every processed payment updates an aggregate held in memory, so the stats
+endpoint answers without querying InfluxDB or Prometheus:
+
+- counts, success rate, sums, min/max of amount and processing time
+- approximate quantiles from DDSketch sketches (relative error
+  STATS_RELATIVE_ACCURACY, 1% by default, with a bounded number of bins)
+- the same aggregates broken down by status, currency, payment method,
+  region, card brand and risk level
+
+Statistics are recorded per process. With STATS_SNAPSHOT_PATH set, each
+process saves its store as JSON to STATS_SNAPSHOT_PATH.<pid> every
+STATS_SNAPSHOT_INTERVAL seconds and at shutdown, and the stats endpoint
+merges its live store with the snapshots of every other process (the other
+gunicorn workers, up to one interval behind, and earlier runs). Without it,
+each worker reports only the payments it served.
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import math
+import os
+import re
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+BREAKDOWN_DIMENSIONS = ("status", "currency", "payment_method", "region", "card_brand", "risk_level")
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+MIN_INDEXABLE = 1e-9
+SNAPSHOT_SUFFIX = re.compile(r"\.\d+$")
+
+
+class DDSketch:
+    """Quantile sketch with relative-error guarantees (DDSketch, Masson et al. 2019)"""
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}   # bin key -> count, for values > 0
+        self.negative = {}   # bin key of |value| -> count, for values < 0
+        self.zero = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float):
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if value > MIN_INDEXABLE:
+            store = self.positive
+            key = self._key(value)
+        elif value < -MIN_INDEXABLE:
+            store = self.negative
+            key = self._key(-value)
+        else:
+            self.zero += 1
+            self.count += 1
+            return
+        store[key] = store.get(key, 0) + 1
+        self.count += 1
+        if len(store) > self.max_bins:
+            self._collapse(store)
+
+    def _collapse(self, store: dict):
+        """Fold the lowest bins together until the store fits in max_bins"""
+        keys = sorted(store)
+        excess = len(keys) - self.max_bins
+        folded = sum(store.pop(key) for key in keys[:excess + 1])
+        store[keys[excess]] = folded
+
+    def _bins(self):
+        """(sign, bin key, count) in ascending value order"""
+        # Most negative values first (largest |value| key), then zero, then positives
+        negative, positive = self.negative, self.positive
+        for key in sorted(negative, reverse=True):
+            yield -1, key, negative[key]
+        if self.zero:
+            yield 0, 0, self.zero
+        for key in sorted(positive):
+            yield 1, key, positive[key]
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles((q,))[f"p{q * 100:g}"]
+
+    def quantiles(self, qs=QUANTILES) -> dict:
+        """Several quantiles in one pass over the sorted bins"""
+        if self.count == 0:
+            return {f"p{q * 100:g}": 0.0 for q in qs}
+        targets = sorted(qs)
+        ranks = [q * (self.count - 1) for q in targets]
+        result = {}
+        position = 0
+        rank = ranks[0]
+        seen = 0
+        sign = key = 0
+        for sign, key, count in self._bins():
+            seen += count
+            if seen <= rank:
+                continue
+            while position < len(targets) and seen > ranks[position]:
+                result[f"p{targets[position] * 100:g}"] = self._estimate(sign, key)
+                position += 1
+            if position == len(targets):
+                return result
+            rank = ranks[position]
+        for q in targets[position:]:
+            result[f"p{q * 100:g}"] = self._estimate(sign, key)
+        return result
+
+    def _estimate(self, sign: int, key: int) -> float:
+        """Value of a bin, clamped to the observed range (a bin's midpoint can lie outside it)"""
+        value = sign * self._value(key)
+        if self.min is not None:
+            value = min(max(value, self.min), self.max)
+        return round(value, 4)
+
+    def merge(self, other: 'DDSketch'):
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+            if len(mine) > self.max_bins:
+                self._collapse(mine)
+        self.zero += other.zero
+        self.count += other.count
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def to_dict(self) -> dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "positive": {str(k): c for k, c in self.positive.items()},
+            "negative": {str(k): c for k, c in self.negative.items()},
+            "zero": self.zero,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, max_bins: int = 2048) -> 'DDSketch':
+        sketch = cls(data["relative_accuracy"], max_bins)
+        sketch.positive = {int(k): c for k, c in data["positive"].items()}
+        sketch.negative = {int(k): c for k, c in data["negative"].items()}
+        sketch.zero = data["zero"]
+        sketch.count = sketch.zero + sum(sketch.positive.values()) + sum(sketch.negative.values())
+        # Snapshots written before min/max were tracked have none: quantiles are then unclamped
+        sketch.min = data.get("min")
+        sketch.max = data.get("max")
+        return sketch
+
+
+class PaymentAggregate:
+    """Count, success count, sums, extremes and sketches of one group of payments"""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.count = 0
+        self.successes = 0
+        self.amount_sum = 0.0
+        self.processing_sum = 0.0
+        self.amount_min = None
+        self.amount_max = None
+        self.processing_max = 0.0
+        self.amount = DDSketch(relative_accuracy)
+        self.processing_time = DDSketch(relative_accuracy)
+
+    def record(self, is_success: bool, amount: float, processing_time: float):
+        self.count += 1
+        if is_success:
+            self.successes += 1
+        self.amount_sum += amount
+        self.processing_sum += processing_time
+        if self.amount_min is None or amount < self.amount_min:
+            self.amount_min = amount
+        if self.amount_max is None or amount > self.amount_max:
+            self.amount_max = amount
+        if processing_time > self.processing_max:
+            self.processing_max = processing_time
+        self.amount.add(amount)
+        self.processing_time.add(processing_time)
+
+    def merge(self, other: 'PaymentAggregate'):
+        self.count += other.count
+        self.successes += other.successes
+        self.amount_sum += other.amount_sum
+        self.processing_sum += other.processing_sum
+        if other.amount_min is not None and (self.amount_min is None or other.amount_min < self.amount_min):
+            self.amount_min = other.amount_min
+        if other.amount_max is not None and (self.amount_max is None or other.amount_max > self.amount_max):
+            self.amount_max = other.amount_max
+        self.processing_max = max(self.processing_max, other.processing_max)
+        self.amount.merge(other.amount)
+        self.processing_time.merge(other.processing_time)
+
+    def summary(self, quantiles: bool = True) -> dict:
+        count = self.count
+        result = {
+            "count": count,
+            "success_rate": round(self.successes / count * 100, 2) if count else 0.0,
+            "amount_sum": round(self.amount_sum, 2),
+            "avg_amount": round(self.amount_sum / count, 2) if count else 0.0,
+            "avg_processing_time": round(self.processing_sum / count, 4) if count else 0.0,
+        }
+        if quantiles:
+            result["amount"] = {"min": self.amount_min, "max": self.amount_max, **self.amount.quantiles()}
+            result["processing_time"] = {"max": self.processing_max, **self.processing_time.quantiles()}
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "successes": self.successes,
+            "amount_sum": self.amount_sum,
+            "processing_sum": self.processing_sum,
+            "amount_min": self.amount_min,
+            "amount_max": self.amount_max,
+            "processing_max": self.processing_max,
+            "amount": self.amount.to_dict(),
+            "processing_time": self.processing_time.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'PaymentAggregate':
+        aggregate = cls()
+        for name in ("count", "successes", "amount_sum", "processing_sum",
+                     "amount_min", "amount_max", "processing_max"):
+            setattr(aggregate, name, data[name])
+        aggregate.amount = DDSketch.from_dict(data["amount"])
+        aggregate.processing_time = DDSketch.from_dict(data["processing_time"])
+        return aggregate
+
+
+class PaymentStatsStore:
+    """Overall and per-dimension payment aggregates, with optional JSON snapshots"""
+
+    def __init__(self, snapshot_path: str = None, snapshot_interval: float = None,
+                 relative_accuracy: float = None, dimensions=BREAKDOWN_DIMENSIONS):
+        self.snapshot_path = snapshot_path if snapshot_path is not None else os.getenv("STATS_SNAPSHOT_PATH")
+        self.snapshot_interval = snapshot_interval or float(os.getenv("STATS_SNAPSHOT_INTERVAL", "60"))
+        self.relative_accuracy = relative_accuracy or float(os.getenv("STATS_RELATIVE_ACCURACY", "0.01"))
+        self.dimensions = tuple(dimensions)
+        self.since = datetime.utcnow().isoformat()
+        self.overall = PaymentAggregate(self.relative_accuracy)
+        self.by_dimension = {dimension: {} for dimension in self.dimensions}
+        self._peers = {}   # snapshot path -> (mtime, store) of the other processes
+        self._task = None
+
+    @property
+    def snapshot_file(self) -> str:
+        """This process's snapshot: STATS_SNAPSHOT_PATH.<pid>, so workers never share a file"""
+        return f"{self.snapshot_path}.{os.getpid()}"
+
+    def record(self, status: str, amount: float, processing_time: float, dimensions: dict):
+        """Account for one payment; `dimensions` maps breakdown names to values"""
+        is_success = status == "success"
+        self.overall.record(is_success, amount, processing_time)
+        for dimension, groups in self.by_dimension.items():
+            value = status if dimension == "status" else dimensions.get(dimension)
+            if value is None:
+                continue
+            aggregate = groups.get(value)
+            if aggregate is None:
+                aggregate = groups[value] = PaymentAggregate(self.relative_accuracy)
+            aggregate.record(is_success, amount, processing_time)
+
+    def stats(self, dimension: str = None) -> dict:
+        """Overall statistics plus a per-dimension breakdown, across all processes
+
+        Without `dimension`, breakdown entries carry counts and averages only;
+        with it, that dimension's groups include their quantiles as well.
+        """
+        if dimension is not None and dimension not in self.by_dimension:
+            raise KeyError(dimension)
+        store = self._merged()
+        overall = store.overall.summary()
+        result = {
+            "since": store.since,
+            "total_payments": overall["count"],
+            "success_rate": overall["success_rate"],
+            "avg_processing_time": overall["avg_processing_time"],
+            "amount": {"sum": overall["amount_sum"], "avg": overall["avg_amount"], **overall["amount"]},
+            "processing_time": {"avg": overall["avg_processing_time"], **overall["processing_time"]},
+        }
+        if dimension is not None:
+            result["by_dimension"] = {dimension: {
+                value: aggregate.summary() for value, aggregate in sorted(store.by_dimension[dimension].items())
+            }}
+        else:
+            result["by_dimension"] = {
+                name: {value: aggregate.summary(quantiles=False) for value, aggregate in sorted(groups.items())}
+                for name, groups in store.by_dimension.items()
+            }
+        return result
+
+    def merge(self, other: 'PaymentStatsStore'):
+        """Add another store's payments to this one"""
+        self.since = min(self.since, other.since)
+        self.overall.merge(other.overall)
+        for name, groups in self.by_dimension.items():
+            for value, aggregate in other.by_dimension.get(name, {}).items():
+                mine = groups.get(value)
+                if mine is None:
+                    mine = groups[value] = PaymentAggregate(self.relative_accuracy)
+                mine.merge(aggregate)
+
+    def _merged(self) -> 'PaymentStatsStore':
+        """This process's live store, plus the snapshots of the others when snapshots are on"""
+        peers = self._peer_snapshots()
+        if not peers:
+            return self
+        store = PaymentStatsStore(snapshot_path="", relative_accuracy=self.relative_accuracy,
+                                  dimensions=self.dimensions)
+        store.since = self.since
+        for other in (self, *peers):
+            store.merge(other)
+        return store
+
+    def _peer_snapshots(self) -> list:
+        """Stores saved by the other processes sharing snapshot_path, re-read when they change"""
+        if not self.snapshot_path:
+            return []
+        own = self.snapshot_file
+        peers = {}
+        for path in glob.glob(f"{glob.escape(self.snapshot_path)}.*"):
+            if path == own or not SNAPSHOT_SUFFIX.search(path):
+                continue
+            try:
+                mtime = os.path.getmtime(path)
+                cached = self._peers.get(path)
+                if cached is None or cached[0] != mtime:
+                    store = PaymentStatsStore(snapshot_path="", relative_accuracy=self.relative_accuracy,
+                                              dimensions=self.dimensions)
+                    store.load(path)
+                    cached = (mtime, store)
+                peers[path] = cached
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping payment stats snapshot {path}: {e}")
+        self._peers = peers
+        return [store for _, store in peers.values()]
+
+    def to_dict(self) -> dict:
+        return {
+            "since": self.since,
+            "overall": self.overall.to_dict(),
+            "by_dimension": {
+                name: {value: aggregate.to_dict() for value, aggregate in groups.items()}
+                for name, groups in self.by_dimension.items()
+            },
+        }
+
+    def save(self, path: str = None):
+        """Write a snapshot atomically (temporary file + rename)"""
+        path = path or self.snapshot_file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str = None) -> bool:
+        """Restore a snapshot if one exists; returns whether it was loaded"""
+        path = path or (self.snapshot_file if self.snapshot_path else None)
+        if not path or not os.path.exists(path):
+            return False
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.since = data["since"]
+        self.overall = PaymentAggregate.from_dict(data["overall"])
+        for name in self.dimensions:
+            self.by_dimension[name] = {value: PaymentAggregate.from_dict(aggregate)
+                                       for value, aggregate in data["by_dimension"].get(name, {}).items()}
+        return True
+
+    async def start(self):
+        """Start periodic saving (call from app startup)
+
+        A new process starts empty: the snapshots of earlier processes are
+        merged at read time. Only a snapshot left under this pid (a reused
+        pid) is reloaded, since this process will overwrite it.
+        """
+        if not self.snapshot_path:
+            return
+        try:
+            if self.load():
+                logger.info(f"Payment stats restored from {self.snapshot_file} ({self.overall.count} payments)")
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Could not load payment stats snapshot {self.snapshot_file}: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop periodic saving and write a final snapshot (call from app shutdown)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.snapshot_path:
+            self._save_logged()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            self._save_logged()
+
+    def _save_logged(self):
+        started = time.perf_counter()
+        try:
+            self.save()
+            logger.debug(f"Payment stats saved to {self.snapshot_file} in {time.perf_counter() - started:.3f}s")
+        except OSError as e:
+            logger.error(f"Could not save payment stats snapshot {self.snapshot_file}: {e}")
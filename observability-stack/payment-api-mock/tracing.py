@@ -0,0 +1,317 @@
+"""
+Lightweight tracing for the Payment API
+
+- W3C trace context: an incoming `traceparent` header is continued,
+  otherwise a new trace id is generated (no OpenTelemetry dependency)
+- Spans are plain tuples queued in memory; a background task converts them
+  to OTLP/HTTP JSON and posts them in batches to
+  OTEL_EXPORTER_OTLP_ENDPOINT (e.g. http://tempo:4318), so the request path
+  only pays for an id draw and a queue append
+- Batches are flushed by size (OTEL_BSP_MAX_EXPORT_BATCH_SIZE) or age
+  (OTEL_BSP_SCHEDULE_DELAY, milliseconds); a trace that does not fit in
+  the queue (OTEL_BSP_MAX_QUEUE_SIZE) is dropped whole and its spans counted
+- Sampling (Tracer): a request's spans are collected with the request and
+  the whole trace is kept or dropped when it ends. It is kept when its trace
+  id falls within the head ratio (OTEL_TRACES_SAMPLER_ARG) or the caller
+  sampled it, and always when one of its spans failed or the request took
+  TRACE_SLOW_THRESHOLD seconds or more
+
+Without OTEL_EXPORTER_OTLP_ENDPOINT no span is recorded, but trace ids are
+still generated for the exemplars of the request and processing histograms.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import urllib.request
+from collections import namedtuple
+
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+Span = namedtuple("Span", "trace_id span_id parent_span_id name kind start_ns end_ns attributes error")
+
+# ========================
+# PROMETHEUS METRICS
+# ========================
+
+TRACE_SPANS = Counter(
+    'payment_trace_spans_total',
+    'Spans handled by the OTLP exporter',
+    ['result']  # exported, dropped, failed
+)
+
+TRACE_SAMPLING_DECISIONS = Counter(
+    'payment_trace_sampling_decisions_total',
+    'Request traces by sampling decision',
+    ['decision']  # head, error, slow, dropped
+)
+
+TRACE_EXPORT_DURATION = Histogram(
+    'payment_trace_export_duration_seconds',
+    'Time spent posting one span batch to the OTLP endpoint',
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+)
+
+# Not SIMULATION_SEED: ids must differ between workers and runs
+_id_rng = random.Random()
+if hasattr(os, "register_at_fork"):
+    # gunicorn forks its workers after import: reseed so they do not share ids
+    os.register_at_fork(after_in_child=_id_rng.seed)
+
+
+def new_trace_id() -> str:
+    return f"{_id_rng.getrandbits(128) or 1:032x}"
+
+
+def new_span_id() -> str:
+    return f"{_id_rng.getrandbits(64) or 1:016x}"
+
+
+def parse_traceparent(header: str):
+    """Return (trace_id, parent_span_id, sampled) of a W3C traceparent header, or None if invalid"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if (len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2
+            or parts[0] == "ff"):
+        return None
+    trace_id, parent_span_id = parts[1].lower(), parts[2].lower()
+    try:
+        if int(trace_id, 16) == 0 or int(parent_span_id, 16) == 0:
+            return None
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return trace_id, parent_span_id, sampled
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class OTLPSpanExporter:
+    """Background exporter posting OTLP/HTTP JSON span batches"""
+
+    def __init__(self, endpoint: str = None, service_name: str = None,
+                 queue_size: int = None, batch_size: int = None,
+                 flush_interval: float = None, timeout: float = None):
+        endpoint = endpoint if endpoint is not None else os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "")
+        self.enabled = bool(endpoint)
+        self.url = endpoint.rstrip("/") + "/v1/traces" if endpoint else None
+        self.service_name = service_name or os.getenv("OTEL_SERVICE_NAME", "payment-api-mock")
+        self.queue_size = queue_size or int(os.getenv("OTEL_BSP_MAX_QUEUE_SIZE", "2048"))
+        self.batch_size = batch_size or int(os.getenv("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", "512"))
+        self.flush_interval = flush_interval or float(os.getenv("OTEL_BSP_SCHEDULE_DELAY", "5000")) / 1000
+        self.timeout = timeout or float(os.getenv("OTEL_EXPORTER_OTLP_TIMEOUT", "10000")) / 1000
+
+        self._resource = {"attributes": [_attribute("service.name", self.service_name)]}
+        self._queue = None
+        self._task = None
+        self._stopping = False
+
+    async def start(self):
+        """Create the queue and start the export loop (call from app startup)"""
+        if not self.enabled:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"OTLP span exporter started: {self.url}, batch={self.batch_size}, "
+            f"interval={self.flush_interval}s, queue={self.queue_size}"
+        )
+
+    async def stop(self):
+        """Export remaining spans and stop the export loop (call from app shutdown)"""
+        if self._task is None:
+            return
+        # wait_for() can swallow a cancellation that lands as its get() completes: the flag ends the loop then
+        self._stopping = True
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        while not self._queue.empty():
+            await self._export(self._drain(self.batch_size))
+
+    def record(self, spans: list) -> bool:
+        """Queue the finished spans of a trace, all or none; returns False if dropped (never blocks)"""
+        if self._queue is None:
+            return False
+        # Only the event loop thread puts and gets, so the free space cannot shrink in between
+        if self.queue_size - self._queue.qsize() < len(spans):
+            TRACE_SPANS.labels(result="dropped").inc(len(spans))
+            return False
+        for span in spans:
+            self._queue.put_nowait(span)
+        return True
+
+    def _drain(self, limit: int) -> list:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        batch = []
+        try:
+            while not self._stopping:
+                # Wait for the first span, then fill the batch until it is full or too old
+                batch = [await self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size and not self._stopping:
+                    batch.extend(self._drain(self.batch_size - len(batch)))
+                    if len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                pending, batch = batch, []
+                await self._export(pending)
+        except asyncio.CancelledError:
+            # Shutdown: export what was already taken off the queue
+            await self._export(batch)
+            raise
+
+    async def _export(self, batch: list):
+        if not batch:
+            return
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            # Encoding and the HTTP call are blocking: run them off the event loop
+            await loop.run_in_executor(None, self._post, batch)
+            TRACE_SPANS.labels(result="exported").inc(len(batch))
+        except Exception as e:
+            # Spans are best effort: no retry, the next batch is independent
+            TRACE_SPANS.labels(result="failed").inc(len(batch))
+            logger.warning(f"OTLP export of {len(batch)} spans failed: {e}")
+        TRACE_EXPORT_DURATION.observe(time.perf_counter() - start)
+
+    def encode(self, batch: list) -> bytes:
+        """OTLP/HTTP JSON body for a list of spans"""
+        spans = []
+        for span in batch:
+            encoded = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": span.kind,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [_attribute(k, v) for k, v in span.attributes.items()],
+                "status": {"code": STATUS_ERROR if span.error else STATUS_UNSET},
+            }
+            if span.parent_span_id:
+                encoded["parentSpanId"] = span.parent_span_id
+            spans.append(encoded)
+        return json.dumps({"resourceSpans": [{
+            "resource": self._resource,
+            "scopeSpans": [{"scope": {"name": self.service_name}, "spans": spans}],
+        }]}).encode()
+
+    def _post(self, batch: list):
+        request = urllib.request.Request(
+            self.url, data=self.encode(batch), method="POST",
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class RequestTrace:
+    """Trace context of one request and the spans it ended so far"""
+
+    __slots__ = ("trace_id", "span_id", "parent_span_id", "head_sampled", "spans")
+
+    def __init__(self, trace_id: str, span_id: str, parent_span_id, head_sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id              # the request (server) span
+        self.parent_span_id = parent_span_id
+        self.head_sampled = head_sampled
+        self.spans = []
+
+
+class Tracer:
+    """Head ratio sampling, biased at the end of the request towards errors and slow requests
+
+    The head decision only needs the trace id (its low 64 bits against the
+    ratio, like OpenTelemetry's TraceIdRatioBased), so every service
+    sampling at the same ratio keeps the same traces. Spans are buffered on
+    the request, not globally: memory is bounded by the requests in flight.
+    A kept trace is queued whole or, when the queue is full, dropped whole.
+    """
+
+    def __init__(self, exporter: OTLPSpanExporter, ratio: float = None, slow_threshold: float = None):
+        self.exporter = exporter
+        self.ratio = ratio if ratio is not None else float(os.getenv("OTEL_TRACES_SAMPLER_ARG", "0.1"))
+        self.slow_threshold = (slow_threshold if slow_threshold is not None
+                               else float(os.getenv("TRACE_SLOW_THRESHOLD", "1.0")))
+        self._bound = int(min(max(self.ratio, 0.0), 1.0) * (1 << 64))
+
+    def start(self, traceparent: str = None) -> RequestTrace:
+        """Continue the caller's trace (W3C traceparent) or start a new one"""
+        parent = parse_traceparent(traceparent)
+        if parent is None:
+            trace_id = new_trace_id()
+            return RequestTrace(trace_id, new_span_id(), None, self._head_sampled(trace_id))
+        trace_id, parent_span_id, sampled = parent
+        return RequestTrace(trace_id, new_span_id(), parent_span_id, sampled or self._head_sampled(trace_id))
+
+    def _head_sampled(self, trace_id: str) -> bool:
+        return int(trace_id[16:], 16) < self._bound
+
+    def may_keep(self, trace: RequestTrace, error: bool = False, duration: float = 0.0) -> bool:
+        """Whether the trace is already known to be kept (exemplars should only point to kept traces)"""
+        return (not self.exporter.enabled or trace.head_sampled or error
+                or duration >= self.slow_threshold)
+
+    def add_span(self, trace: RequestTrace, name: str, start_ns: int, end_ns: int,
+                 attributes: dict, error: bool = False):
+        """Record an ended internal span, child of the request span"""
+        if self.exporter.enabled:
+            trace.spans.append(Span(trace.trace_id, new_span_id(), trace.span_id, name,
+                                    SPAN_KIND_INTERNAL, start_ns, end_ns, attributes, error))
+
+    def finish(self, trace: RequestTrace, name: str, start: float, duration: float,
+               attributes: dict, error: bool = False) -> bool:
+        """End the request span, decide on the whole trace and queue it; returns whether it is kept"""
+        if not self.exporter.enabled:
+            return True
+        if trace.head_sampled:
+            decision = "head"
+        elif error or any(span.error for span in trace.spans):
+            decision = "error"
+        elif duration >= self.slow_threshold:
+            decision = "slow"
+        else:
+            TRACE_SAMPLING_DECISIONS.labels(decision="dropped").inc()
+            return False
+        TRACE_SAMPLING_DECISIONS.labels(decision=decision).inc()
+        start_ns = int(start * 1e9)
+        root = Span(trace.trace_id, trace.span_id, trace.parent_span_id, name,
+                    SPAN_KIND_SERVER, start_ns, start_ns + int(duration * 1e9), attributes, error)
+        self.exporter.record([root, *trace.spans])
+        return True
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Latency recording for the Payment API simulator
+Data2AI Academy - Training Stack
+
+HDR-style histograms: latencies are counted in log-linear buckets (128
+linear sub-buckets per power of two, < 1% relative error) between 1 µs and
+one hour, so memory stays fixed however many requests are recorded.
+
+- LatencyHistogram: one histogram (percentiles, max, mean, merge, save)
+- LatencyRecorder: overall + per-status histograms and interval snapshots
+
+Saved histograms (JSON) can be merged across runs and processes:
+
+  python latency_recorder.py run1.json run2.json -o merged.json
+"""
+
+import argparse
+import json
+from typing import Dict, List, Optional
+
+SUB_BUCKET_BITS = 8                      # 256 values below the first doubling
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF_BITS = SUB_BUCKET_BITS - 1
+HIGHEST_MICROS = 3600 * 1_000_000        # larger values are clamped to one hour
+
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+def _bucket_index(micros: int) -> int:
+    """Index of the bucket holding `micros`"""
+    if micros < SUB_BUCKET_COUNT:
+        return micros
+    shift = micros.bit_length() - SUB_BUCKET_BITS
+    return (shift << SUB_BUCKET_HALF_BITS) + (micros >> shift)
+
+
+def _bucket_bounds(index: int):
+    """(lowest, highest) value in microseconds counted by a bucket"""
+    if index < SUB_BUCKET_COUNT:
+        return index, index
+    shift = (index >> SUB_BUCKET_HALF_BITS) - 1
+    sub_bucket = index - (shift << SUB_BUCKET_HALF_BITS)
+    return sub_bucket << shift, ((sub_bucket + 1) << shift) - 1
+
+
+BUCKET_COUNT = _bucket_index(HIGHEST_MICROS) + 1
+
+
+class LatencyHistogram:
+    """Fixed-memory log-linear latency histogram (values in seconds)"""
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        """Count one latency"""
+        micros = min(max(int(seconds * 1_000_000), 0), HIGHEST_MICROS)
+        self.counts[_bucket_index(micros)] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent: float) -> float:
+        """Latency (s) at or below which `percent` % of the values fall"""
+        if self.count == 0:
+            return 0.0
+        rank = max(1, round(self.count * percent / 100.0))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(_bucket_bounds(index)[1] / 1_000_000, self.max)
+        return self.max
+
+    def percentiles(self, percents=PERCENTILES) -> Dict[float, float]:
+        """Several percentiles in one pass"""
+        result = {}
+        if self.count == 0:
+            return {p: 0.0 for p in percents}
+        targets = sorted((max(1, round(self.count * p / 100.0)), p) for p in percents)
+        seen = 0
+        position = 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            seen += count
+            while position < len(targets) and seen >= targets[position][0]:
+                result[targets[position][1]] = min(_bucket_bounds(index)[1] / 1_000_000, self.max)
+                position += 1
+            if position == len(targets):
+                break
+        return result
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def merge(self, other: 'LatencyHistogram'):
+        """Add the counts of another histogram"""
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def to_dict(self) -> Dict:
+        """Serializable form (sparse bucket counts)"""
+        return {
+            'sub_bucket_bits': SUB_BUCKET_BITS,
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'buckets': {str(i): c for i, c in enumerate(self.counts) if c},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LatencyHistogram':
+        if data.get('sub_bucket_bits') != SUB_BUCKET_BITS:
+            raise ValueError(f"incompatible histogram layout: sub_bucket_bits={data.get('sub_bucket_bits')}")
+        histogram = cls()
+        for index, count in data['buckets'].items():
+            histogram.counts[int(index)] = count
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+
+class LatencyRecorder:
+    """Overall and per-status latency histograms, plus a resettable interval histogram"""
+
+    def __init__(self):
+        self.overall = LatencyHistogram()
+        self.by_status: Dict[str, LatencyHistogram] = {}
+        self.interval = LatencyHistogram()
+
+    def record(self, seconds: float, status: str = 'success'):
+        self.overall.record(seconds)
+        self.interval.record(seconds)
+        histogram = self.by_status.get(status)
+        if histogram is None:
+            histogram = self.by_status[status] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def snapshot_interval(self) -> LatencyHistogram:
+        """Return the histogram since the last snapshot and start a new interval"""
+        snapshot, self.interval = self.interval, LatencyHistogram()
+        return snapshot
+
+    def merge(self, other: 'LatencyRecorder'):
+        self.overall.merge(other.overall)
+        for status, histogram in other.by_status.items():
+            self.by_status.setdefault(status, LatencyHistogram()).merge(histogram)
+
+    def to_dict(self) -> Dict:
+        return {
+            'overall': self.overall.to_dict(),
+            'by_status': {status: h.to_dict() for status, h in self.by_status.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LatencyRecorder':
+        recorder = cls()
+        recorder.overall = LatencyHistogram.from_dict(data['overall'])
+        recorder.by_status = {status: LatencyHistogram.from_dict(h) for status, h in data['by_status'].items()}
+        return recorder
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> 'LatencyRecorder':
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def report_lines(self) -> List[str]:
+        """Percentile table: one line for all requests, then one per status"""
+        header = f"  {'':<10}{'count':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'p99.9':>9}{'max':>9}"
+        lines = [header]
+        rows = [('all', self.overall)] + sorted(self.by_status.items())
+        for name, histogram in rows:
+            p = histogram.percentiles()
+            lines.append(f"  {name:<10}{histogram.count:>9}"
+                         f"{p[50.0]:>8.3f}s{p[90.0]:>8.3f}s{p[99.0]:>8.3f}s{p[99.9]:>8.3f}s"
+                         f"{histogram.max:>8.3f}s")
+        return lines
+
+
+def merge_files(paths: List[str], output: Optional[str] = None) -> LatencyRecorder:
+    """Merge saved recorders, optionally saving the result"""
+    merged = LatencyRecorder()
+    for path in paths:
+        merged.merge(LatencyRecorder.load(path))
+    if output:
+        merged.save(output)
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge and report saved latency histograms')
+    parser.add_argument('files', nargs='+', help='Histogram files written by simulate.py --save-histogram')
+    parser.add_argument('-o', '--output', help='Write the merged histogram to this file')
+    args = parser.parse_args()
+
+    merged = merge_files(args.files, args.output)
+    print(f"Merged {len(args.files)} histogram(s):")
+    for line in merged.report_lines():
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
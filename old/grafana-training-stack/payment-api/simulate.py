@@ -9,10 +9,17 @@ Simulates realistic payment traffic with multiple modes:
 - peak: High concurrent traffic
 - stress: Maximum load testing
 - realistic: Variable traffic with bursts
+- open: Open-loop constant arrival rate (optionally ramped)
+
+The closed-loop modes wait for a batch before sending the next one, so the
+offered load drops whenever the API slows down. The open mode schedules
+arrivals independently of responses and measures latency from the intended
+start time, so queueing in front of a slow API shows up in the results.
 """
 
 import argparse
 import asyncio
+import os
 import random
 import time
 from datetime import datetime
@@ -20,6 +27,10 @@ from typing import Dict, List, Tuple
 import aiohttp
 from colorama import Fore, Style, init
 
+from latency_recorder import LatencyHistogram, LatencyRecorder
+
+HEALTH_TIMEOUT = aiohttp.ClientTimeout(total=5)
+
 # Initialize colorama for cross-platform colored output
 init(autoreset=True)
 
@@ -27,17 +38,51 @@ init(autoreset=True)
 class PaymentSimulator:
     """Payment API traffic simulator with multiple modes"""
     
-    def __init__(self, api_url: str, num_requests: int, mode: str, max_concurrent: int):
+    def __init__(self, api_url: str, num_requests: int, mode: str, max_concurrent: int,
+                 rate: float = 10.0, end_rate: float = None, ramp: str = 'linear',
+                 ramp_steps: int = 5, arrival: str = 'poisson', duration: float = None,
+                 interval: float = 10.0, save_histogram: str = None, verbose: bool = False,
+                 limit_per_host: int = None, keepalive: float = 30.0, dns_ttl: int = 300,
+                 unix_socket: str = None, request_timeout: float = 10.0):
         self.api_url = api_url
         self.num_requests = num_requests
         self.mode = mode
         self.max_concurrent = max_concurrent
         
+        # Open-loop settings (mode 'open')
+        self.rate = rate
+        self.end_rate = rate if end_rate is None else end_rate
+        self.ramp = ramp
+        self.ramp_steps = max(1, ramp_steps)
+        self.arrival = arrival
+        self.duration = duration
+        
+        # Latency reporting
+        self.interval = interval
+        self.save_histogram = save_histogram
+        self.verbose = verbose          # one line per request
+        self.on_interval = None         # callback(snapshot) replacing the interval line
+        self.healthy = None
+        
+        # HTTP client: one pooled session, sized to the concurrency
+        self.limit_per_host = limit_per_host or max_concurrent
+        self.keepalive = keepalive          # idle keep-alive seconds, 0 = new connection per request
+        self.dns_ttl = dns_ttl
+        self.unix_socket = unix_socket
+        self.timeout = aiohttp.ClientTimeout(total=request_timeout)
+        
         # Statistics
         self.total_success = 0
         self.total_failed = 0
         self.total_amount = 0.0
-        self.response_times = []
+        self.latency = LatencyRecorder()    # response time (fixed memory)
+        self.corrected = LatencyRecorder()  # open mode: completion - intended start
+        self.max_start_lag = 0.0            # open mode: actual start - intended start
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.connect_times = LatencyHistogram()  # TCP (+TLS) connection setup
+        self.offered = 0           # open mode: requests scheduled
+        self.offered_span = 0.0    # open mode: seconds over which they were scheduled
         
         # Currency distribution (weighted)
         self.currencies = ['USD', 'EUR', 'GBP', 'CHF', 'JPY']
@@ -92,8 +137,41 @@ class PaymentSimulator:
         }
         return delays.get(self.mode, 1.0)
     
-    async def make_payment(self, session: aiohttp.ClientSession, request_num: int) -> Dict:
-        """Make a single payment request"""
+    def rate_at(self, elapsed: float) -> float:
+        """Target arrival rate (req/s) after `elapsed` seconds of an open-loop run"""
+        if self.end_rate == self.rate or not self.duration:
+            return self.rate
+        progress = min(1.0, elapsed / self.duration)
+        if self.ramp == 'step':
+            # ramp_steps plateaus, from rate to end_rate
+            if self.ramp_steps == 1:
+                return self.end_rate
+            step = min(int(progress * self.ramp_steps), self.ramp_steps - 1)
+            progress = step / (self.ramp_steps - 1)
+        return self.rate + (self.end_rate - self.rate) * progress
+    
+    def next_interval(self, elapsed: float) -> float:
+        """Time until the next arrival: exponential (Poisson) or fixed"""
+        rate = self.rate_at(elapsed)
+        if rate <= 0:
+            return 1.0
+        if self.arrival == 'poisson':
+            return random.expovariate(rate)
+        return 1.0 / rate
+    
+    def record_latency(self, status: str, duration: float, intended_start: float = None):
+        """Record a finished request (and its corrected latency in open mode)"""
+        self.latency.record(duration, status)
+        if intended_start is not None:
+            self.corrected.record(time.time() - intended_start, status)
+    
+    async def make_payment(self, session: aiohttp.ClientSession, request_num: int,
+                           intended_start: float = None) -> Dict:
+        """Make a single payment request
+        
+        With `intended_start` (open mode), the latency measured from the time
+        the request should have been sent is recorded as well.
+        """
         amount = self.random_amount()
         currency = self.random_currency()
         customer = self.random_customer()
@@ -107,47 +185,55 @@ class PaymentSimulator:
         }
         
         start_time = time.time()
+        if intended_start is not None:
+            self.max_start_lag = max(self.max_start_lag, start_time - intended_start)
         
         try:
             async with session.post(
                 f"{self.api_url}/api/payments",
-                json=payload,
-                timeout=aiohttp.ClientTimeout(total=10)
+                json=payload
             ) as response:
                 duration = time.time() - start_time
-                self.response_times.append(duration)
                 
                 if response.status == 200:
+                    self.record_latency('success', duration, intended_start)
                     data = await response.json()
                     self.total_success += 1
                     self.total_amount += data.get('amount', amount)
                     
-                    print(f"[{request_num}] {Fore.GREEN}✓{Style.RESET_ALL} "
-                          f"Payment {data.get('paymentId', 'N/A')} | "
-                          f"{data.get('amount', amount):.2f} {currency} | "
-                          f"Customer: {customer} | {duration:.3f}s")
+                    if self.verbose:
+                        print(f"[{request_num}] {Fore.GREEN}✓{Style.RESET_ALL} "
+                              f"Payment {data.get('paymentId', 'N/A')} | "
+                              f"{data.get('amount', amount):.2f} {currency} | "
+                              f"Customer: {customer} | {duration:.3f}s")
                     
                     return {'status': 'success', 'duration': duration}
                 else:
+                    self.record_latency('failed', duration, intended_start)
                     self.total_failed += 1
-                    print(f"[{request_num}] {Fore.RED}✗{Style.RESET_ALL} "
-                          f"HTTP {response.status} | {amount:.2f} {currency} | "
-                          f"Customer: {customer} | {duration:.3f}s")
+                    if self.verbose:
+                        print(f"[{request_num}] {Fore.RED}✗{Style.RESET_ALL} "
+                              f"HTTP {response.status} | {amount:.2f} {currency} | "
+                              f"Customer: {customer} | {duration:.3f}s")
                     
                     return {'status': 'failed', 'duration': duration}
                     
         except asyncio.TimeoutError:
             duration = time.time() - start_time
+            self.record_latency('timeout', duration, intended_start)
             self.total_failed += 1
-            print(f"[{request_num}] {Fore.RED}✗{Style.RESET_ALL} "
-                  f"TIMEOUT | {amount:.2f} {currency} | {duration:.3f}s")
+            if self.verbose:
+                print(f"[{request_num}] {Fore.RED}✗{Style.RESET_ALL} "
+                      f"TIMEOUT | {amount:.2f} {currency} | {duration:.3f}s")
             return {'status': 'timeout', 'duration': duration}
             
         except Exception as e:
             duration = time.time() - start_time
+            self.record_latency('error', duration, intended_start)
             self.total_failed += 1
-            print(f"[{request_num}] {Fore.RED}✗{Style.RESET_ALL} "
-                  f"ERROR: {str(e)[:50]} | {duration:.3f}s")
+            if self.verbose:
+                print(f"[{request_num}] {Fore.RED}✗{Style.RESET_ALL} "
+                      f"ERROR: {str(e)[:50]} | {duration:.3f}s")
             return {'status': 'error', 'duration': duration}
     
     async def run_concurrent_batch(self, session: aiohttp.ClientSession, 
@@ -161,17 +247,106 @@ class PaymentSimulator:
         
         return await asyncio.gather(*tasks)
     
+    async def run_open_loop(self, session: aiohttp.ClientSession):
+        """Send requests at the target arrival rate through a bounded worker pool
+        
+        Arrivals are scheduled from the clock, never from responses: when all
+        workers are busy, requests wait in the queue and their wait counts in
+        the corrected latency instead of lowering the offered load.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        async def worker():
+            while True:
+                request_num, intended_start = await queue.get()
+                try:
+                    await self.make_payment(session, request_num, intended_start)
+                finally:
+                    queue.task_done()
+        
+        workers = [asyncio.create_task(worker()) for _ in range(self.max_concurrent)]
+        start = time.time()
+        next_arrival = start
+        request_num = 0
+        try:
+            while True:
+                elapsed = next_arrival - start
+                if self.duration is not None:
+                    if elapsed >= self.duration:
+                        break
+                elif request_num >= self.num_requests:
+                    break
+                delay = next_arrival - time.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                request_num += 1
+                queue.put_nowait((request_num, next_arrival))
+                next_arrival += self.next_interval(elapsed)
+            self.offered = request_num
+            self.offered_span = next_arrival - start
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    
+    async def report_intervals(self):
+        """Print a latency snapshot every `interval` seconds"""
+        # In open mode the corrected latency is what a client on schedule sees
+        recorder = self.corrected if self.mode == 'open' else self.latency
+        recorder.snapshot_interval()
+        while True:
+            await asyncio.sleep(self.interval)
+            snapshot = recorder.snapshot_interval()
+            if self.on_interval is not None:
+                self.on_interval(snapshot)
+                continue
+            p = snapshot.percentiles()
+            print(f"{Fore.BLUE}[{datetime.now():%H:%M:%S}] {snapshot.count} req "
+                  f"({snapshot.count / self.interval:.1f}/s) | p50 {p[50.0]:.3f}s | "
+                  f"p99 {p[99.0]:.3f}s | max {snapshot.max:.3f}s{Style.RESET_ALL}")
+    
     async def check_health(self, session: aiohttp.ClientSession) -> bool:
         """Check if Payment API is healthy"""
         try:
             async with session.get(
                 f"{self.api_url}/health",
-                timeout=aiohttp.ClientTimeout(total=5)
+                timeout=HEALTH_TIMEOUT
             ) as response:
                 return response.status == 200
-        except:
+        except (aiohttp.ClientError, asyncio.TimeoutError):
             return False
     
+    def build_connector(self) -> aiohttp.BaseConnector:
+        """Connection pool: max_concurrent connections, reused with keep-alive"""
+        options = dict(limit=self.max_concurrent, limit_per_host=self.limit_per_host)
+        if self.keepalive > 0:
+            options['keepalive_timeout'] = self.keepalive
+        else:
+            options['force_close'] = True
+        if self.unix_socket:
+            return aiohttp.UnixConnector(path=self.unix_socket, **options)
+        return aiohttp.TCPConnector(use_dns_cache=True, ttl_dns_cache=self.dns_ttl, **options)
+    
+    def build_trace_config(self) -> aiohttp.TraceConfig:
+        """Count new vs reused connections and time connection setup"""
+        trace_config = aiohttp.TraceConfig()
+        
+        async def on_create_start(session, context, params):
+            context.connect_start = time.perf_counter()
+        
+        async def on_create_end(session, context, params):
+            self.connections_created += 1
+            self.connect_times.record(time.perf_counter() - context.connect_start)
+        
+        async def on_reuse(session, context, params):
+            self.connections_reused += 1
+        
+        trace_config.on_connection_create_start.append(on_create_start)
+        trace_config.on_connection_create_end.append(on_create_end)
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        return trace_config
+    
     async def run_simulation(self):
         """Run the payment simulation based on selected mode"""
         print(f"{Fore.BLUE}{'='*50}{Style.RESET_ALL}")
@@ -184,10 +359,15 @@ class PaymentSimulator:
         print(f"{Fore.BLUE}{'='*50}{Style.RESET_ALL}\n")
         
         # Create session
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(
+            connector=self.build_connector(),
+            timeout=self.timeout,
+            trace_configs=[self.build_trace_config()]
+        ) as session:
             # Health check
             print(f"{Fore.YELLOW}🔍 Checking API health...{Style.RESET_ALL}")
-            if await self.check_health(session):
+            self.healthy = await self.check_health(session)
+            if self.healthy:
                 print(f"{Fore.GREEN}✓ API is healthy{Style.RESET_ALL}\n")
             else:
                 print(f"{Fore.RED}✗ API is not responding. Please start the service.{Style.RESET_ALL}")
@@ -195,6 +375,7 @@ class PaymentSimulator:
             
             # Start simulation
             start_time = time.time()
+            reporter = asyncio.create_task(self.report_intervals()) if self.interval > 0 else None
             
             if self.mode == 'burst':
                 print(f"{Fore.YELLOW}⚡ Running BURST mode (high-speed sequential){Style.RESET_ALL}\n")
@@ -222,7 +403,8 @@ class PaymentSimulator:
                 while i <= self.num_requests:
                     # Simulate concurrent batches occasionally (30% chance)
                     if random.random() < 0.30 and (self.num_requests - i) >= 3:
-                        print(f"{Fore.BLUE}[Concurrent batch]{Style.RESET_ALL}")
+                        if self.verbose:
+                            print(f"{Fore.BLUE}[Concurrent batch]{Style.RESET_ALL}")
                         await self.run_concurrent_batch(session, i, 3)
                         i += 3
                     else:
@@ -230,6 +412,13 @@ class PaymentSimulator:
                         i += 1
                     await asyncio.sleep(self.get_delay())
             
+            elif self.mode == 'open':
+                target = (f"{self.rate:g} req/s" if self.end_rate == self.rate
+                          else f"{self.rate:g} → {self.end_rate:g} req/s ({self.ramp} ramp)")
+                limit = f"{self.duration:g}s" if self.duration is not None else f"{self.num_requests} requests"
+                print(f"{Fore.YELLOW}📡 Running OPEN mode ({self.arrival} arrivals, {target}, {limit}){Style.RESET_ALL}\n")
+                await self.run_open_loop(session)
+            
             else:  # normal mode
                 print(f"{Fore.YELLOW}⚙️  Running NORMAL mode (standard traffic){Style.RESET_ALL}\n")
                 for i in range(1, self.num_requests + 1):
@@ -238,7 +427,53 @@ class PaymentSimulator:
             
             # Calculate statistics
             elapsed = time.time() - start_time
+            if reporter is not None:
+                reporter.cancel()
             self.show_stats(elapsed)
+            if self.save_histogram:
+                self.save_histograms(self.save_histogram)
+    
+    def save_histograms(self, path: str):
+        """Save the latency histograms for latency_recorder.py merging"""
+        self.latency.save(path)
+        print(f"Histogram saved:  {path}")
+        if self.corrected.overall.count:
+            root, ext = os.path.splitext(path)
+            corrected_path = f"{root}-corrected{ext or '.json'}"
+            self.corrected.save(corrected_path)
+            print(f"Histogram saved:  {corrected_path}")
+    
+    def export_stats(self, elapsed: float) -> Dict:
+        """Mergeable statistics of this run (sent by distributed workers)"""
+        return {
+            'healthy': self.healthy,
+            'elapsed': elapsed,
+            'total_success': self.total_success,
+            'total_failed': self.total_failed,
+            'total_amount': self.total_amount,
+            'latency': self.latency.to_dict(),
+            'corrected': self.corrected.to_dict(),
+            'max_start_lag': self.max_start_lag,
+            'offered': self.offered,
+            'offered_span': self.offered_span,
+            'connections_created': self.connections_created,
+            'connections_reused': self.connections_reused,
+            'connect_times': self.connect_times.to_dict(),
+        }
+    
+    def merge_stats(self, stats: Dict):
+        """Add the statistics exported by another simulator"""
+        self.total_success += stats['total_success']
+        self.total_failed += stats['total_failed']
+        self.total_amount += stats['total_amount']
+        self.latency.merge(LatencyRecorder.from_dict(stats['latency']))
+        self.corrected.merge(LatencyRecorder.from_dict(stats['corrected']))
+        self.max_start_lag = max(self.max_start_lag, stats['max_start_lag'])
+        self.offered += stats['offered']
+        self.offered_span = max(self.offered_span, stats['offered_span'])
+        self.connections_created += stats['connections_created']
+        self.connections_reused += stats['connections_reused']
+        self.connect_times.merge(LatencyHistogram.from_dict(stats['connect_times']))
     
     def show_stats(self, elapsed: float):
         """Display simulation statistics"""
@@ -260,17 +495,34 @@ class PaymentSimulator:
             tps = total / elapsed
             print(f"Throughput:       {tps:.2f} req/s")
         
-        if self.response_times:
-            avg_response = sum(self.response_times) / len(self.response_times)
-            min_response = min(self.response_times)
-            max_response = max(self.response_times)
-            p95_response = sorted(self.response_times)[int(len(self.response_times) * 0.95)]
-            
+        overall = self.latency.overall
+        if overall.count:
             print(f"\nResponse Times:")
-            print(f"  Average:        {avg_response:.3f}s")
-            print(f"  Min:            {min_response:.3f}s")
-            print(f"  Max:            {max_response:.3f}s")
-            print(f"  P95:            {p95_response:.3f}s")
+            print(f"  Average:        {overall.mean:.3f}s")
+            print(f"  Min:            {overall.min:.3f}s")
+            print(f"  Max:            {overall.max:.3f}s")
+            for line in self.latency.report_lines():
+                print(line)
+        
+        if self.corrected.overall.count:
+            # Latency as seen by a client arriving on schedule (coordinated omission corrected)
+            print(f"\nCorrected Latency (from intended start):")
+            print(f"  Average:        {self.corrected.overall.mean:.3f}s")
+            for line in self.corrected.report_lines():
+                print(line)
+            print(f"  Max start lag:  {self.max_start_lag:.3f}s")
+            if self.offered_span > 0:
+                print(f"  Offered rate:   {self.offered / self.offered_span:.2f} req/s")
+        
+        acquired = self.connections_created + self.connections_reused
+        if acquired:
+            p = self.connect_times.percentiles()
+            print(f"\nConnections:")
+            print(f"  Opened:         {self.connections_created}")
+            print(f"  Reused:         {self.connections_reused} ({self.connections_reused / acquired * 100:.1f}%)")
+            if self.connect_times.count:
+                print(f"  Connect time:   p50 {p[50.0] * 1000:.2f}ms | p99 {p[99.0] * 1000:.2f}ms | "
+                      f"max {self.connect_times.max * 1000:.2f}ms")
         
         print(f"{Fore.BLUE}{'='*50}{Style.RESET_ALL}")
 
@@ -287,12 +539,18 @@ Simulation Modes:
   peak       - High concurrent traffic (0.5s delay)
   stress     - Maximum load testing (0.01s delay)
   realistic  - Variable traffic with bursts (0.5-5s delay)
+  open       - Open-loop arrivals at --rate req/s, -c workers, optional ramp to --end-rate
 
 Examples:
   python simulate.py                           # 100 requests, normal mode
   python simulate.py -n 500 -m peak           # 500 requests, peak mode
   python simulate.py -n 1000 -m stress -c 10  # 1000 requests, stress mode, 10 concurrent
   python simulate.py -n 200 -m realistic      # 200 requests, realistic mode
+  python simulate.py -m open --rate 50 -n 3000 -c 100              # 50 req/s Poisson arrivals
+  python simulate.py -m open --rate 10 --end-rate 200 --duration 300 --ramp step --steps 5 -c 200
+  python simulate.py -m open --rate 2000 --duration 60 -c 400 -w 4   # 4 worker processes
+  python simulate.py -m open --rate 5000 --duration 60 -c 800 -w 2 --listen 0.0.0.0:7100 --remote-workers 2
+  python simulate.py --join coordinator-host:7100                   # on each remote host
         """
     )
     
@@ -311,7 +569,7 @@ Examples:
     
     parser.add_argument(
         '-m', '--mode',
-        choices=['normal', 'burst', 'peak', 'stress', 'realistic'],
+        choices=['normal', 'burst', 'peak', 'stress', 'realistic', 'open'],
         default='normal',
         help='Simulation mode (default: normal)'
     )
@@ -323,18 +581,163 @@ Examples:
         help='Maximum concurrent requests (default: 5)'
     )
     
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=10.0,
+        help='Open mode: target arrival rate in req/s (default: 10)'
+    )
+    
+    parser.add_argument(
+        '--end-rate',
+        type=float,
+        help='Open mode: ramp to this rate over --duration (default: constant --rate)'
+    )
+    
+    parser.add_argument(
+        '--ramp',
+        choices=['linear', 'step'],
+        default='linear',
+        help='Open mode: ramp shape between --rate and --end-rate (default: linear)'
+    )
+    
+    parser.add_argument(
+        '--steps',
+        type=int,
+        default=5,
+        help='Open mode: number of plateaus for a step ramp (default: 5)'
+    )
+    
+    parser.add_argument(
+        '--arrival',
+        choices=['poisson', 'fixed'],
+        default='poisson',
+        help='Open mode: inter-arrival distribution (default: poisson)'
+    )
+    
+    parser.add_argument(
+        '--duration',
+        type=float,
+        help='Open mode: run for this many seconds instead of -n requests'
+    )
+    
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=10.0,
+        help='Print a latency snapshot every N seconds (0 disables, default: 10)'
+    )
+    
+    parser.add_argument(
+        '--save-histogram',
+        metavar='PATH',
+        help='Save the latency histogram (JSON) for merging with latency_recorder.py'
+    )
+    
+    parser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help='Print one line per request (default: interval summaries only)'
+    )
+    
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=0,
+        help='Spread the load over N local worker processes (rate, -n and -c are split)'
+    )
+    
+    parser.add_argument(
+        '--listen',
+        metavar='HOST:PORT',
+        help='Coordinator address for remote workers (with --remote-workers)'
+    )
+    
+    parser.add_argument(
+        '--remote-workers',
+        type=int,
+        default=0,
+        help='Number of remote workers to wait for before starting'
+    )
+    
+    parser.add_argument(
+        '--join',
+        metavar='HOST:PORT',
+        help='Run as a remote worker of the coordinator at HOST:PORT'
+    )
+    
+    parser.add_argument(
+        '--limit-per-host',
+        type=int,
+        help='Max connections per host (default: --max-concurrent)'
+    )
+    
+    parser.add_argument(
+        '--keepalive',
+        type=float,
+        default=30.0,
+        help='Seconds an idle connection is kept for reuse (0: new connection per request, default: 30)'
+    )
+    
+    parser.add_argument(
+        '--dns-ttl',
+        type=int,
+        default=300,
+        help='Seconds DNS lookups are cached (default: 300)'
+    )
+    
+    parser.add_argument(
+        '--unix-socket',
+        metavar='PATH',
+        help='Send requests over a unix socket instead of TCP (e.g. uvicorn --uds)'
+    )
+    
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=10.0,
+        help='Request timeout in seconds (default: 10)'
+    )
+    
     args = parser.parse_args()
+    if args.remote_workers and not args.listen:
+        parser.error('--remote-workers needs --listen')
+    if args.mode == 'open' and args.end_rate is not None and args.duration is None:
+        parser.error('--end-rate needs --duration to define the ramp')
     
-    # Create and run simulator
-    simulator = PaymentSimulator(
+    # Create and run simulator (or coordinate worker processes running it)
+    settings = dict(
         api_url=args.url,
         num_requests=args.num_requests,
         mode=args.mode,
-        max_concurrent=args.max_concurrent
+        max_concurrent=args.max_concurrent,
+        rate=args.rate,
+        end_rate=args.end_rate,
+        ramp=args.ramp,
+        ramp_steps=args.steps,
+        arrival=args.arrival,
+        duration=args.duration,
+        interval=args.interval,
+        save_histogram=args.save_histogram,
+        verbose=args.verbose,
+        limit_per_host=args.limit_per_host,
+        keepalive=args.keepalive,
+        dns_ttl=args.dns_ttl,
+        unix_socket=args.unix_socket,
+        request_timeout=args.timeout
     )
+    simulator = PaymentSimulator(**settings)
     
     try:
-        asyncio.run(simulator.run_simulation())
+        if args.join:
+            from simulate_distributed import join_coordinator
+            join_coordinator(args.join)
+            return
+        if args.workers or args.remote_workers:
+            from simulate_distributed import Coordinator
+            Coordinator(settings, args.workers, args.remote_workers, args.listen).run()
+        else:
+            asyncio.run(simulator.run_simulation())
         print(f"\n{Fore.GREEN}✅ Simulation completed!{Style.RESET_ALL}\n")
     except KeyboardInterrupt:
         print(f"\n{Fore.YELLOW}⚠️  Simulation interrupted by user{Style.RESET_ALL}\n")
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Distributed load generation for the Payment API simulator
+Data2AI Academy - Training Stack
+
+One asyncio loop saturates a core long before it saturates the API, so the
+load can be spread over several worker processes:
+
+- the coordinator splits the target rate (or request count) and the
+  concurrency between the workers and starts them together
+- workers run a quiet PaymentSimulator and send their interval snapshots and
+  final statistics (mergeable latency histograms) back over a socket
+- the coordinator prints one summary line per interval and the merged
+  statistics at the end
+
+Workers are local processes (--workers) and/or processes on other hosts that
+join a listening coordinator (--listen + --remote-workers, then
+`simulate.py --join HOST:PORT` on each host).
+
+Messages are length-prefixed JSON over a plain TCP socket, never pickles, so
+a peer can at worst send bad statistics. Both sides prove they know the
+shared key (HMAC of a random challenge) before any settings are exchanged.
+Local-only runs use a random key; listening on a non-loopback address
+requires SIMULATE_AUTHKEY to be set, with the same value on every host.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import ipaddress
+import json
+import math
+import os
+import random
+import secrets
+import socket
+import struct
+import sys
+import time
+from datetime import datetime
+from multiprocessing import Process
+from multiprocessing.connection import wait
+from typing import Dict, List, Optional
+
+from colorama import Fore, Style
+
+from latency_recorder import LatencyHistogram
+from simulate import PaymentSimulator
+
+AUTHKEY = os.getenv('SIMULATE_AUTHKEY')
+
+# Upper bound of one message (final statistics are a few hundred KB at most)
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+HANDSHAKE_TIMEOUT = 10.0
+
+
+class JsonConnection:
+    """Length-prefixed JSON messages over a connected socket"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def send(self, message: Dict):
+        data = json.dumps(message).encode()
+        self.sock.sendall(struct.pack('!I', len(data)) + data)
+
+    def recv(self) -> Dict:
+        size, = struct.unpack('!I', self._read(4))
+        if size > MAX_MESSAGE_BYTES:
+            raise ValueError(f"message of {size} bytes exceeds {MAX_MESSAGE_BYTES}")
+        message = json.loads(self._read(size))
+        if not isinstance(message, dict):
+            raise ValueError("message is not a JSON object")
+        return message
+
+    def _read(self, size: int) -> bytes:
+        # Exactly `size` bytes, nothing buffered beyond the message, so wait() stays accurate
+        chunks = []
+        while size:
+            chunk = self.sock.recv(min(size, 1 << 20))
+            if not chunk:
+                raise EOFError("connection closed")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def close(self):
+        self.sock.close()
+
+
+def sign(authkey: bytes, nonce: str) -> str:
+    return hmac.new(authkey, nonce.encode(), hashlib.sha256).hexdigest()
+
+
+def is_loopback(host: str) -> bool:
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False  # a host name or the wildcard '': assume reachable from elsewhere
+
+
+def parse_address(text: str):
+    """'host:port' -> (host, port)"""
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def split_settings(settings: Dict, workers: int) -> List[Dict]:
+    """Give each worker its share of the rate, request count and concurrency"""
+    shares = []
+    for i in range(workers):
+        share = dict(settings)
+        share['num_requests'] = settings['num_requests'] // workers + (1 if i < settings['num_requests'] % workers else 0)
+        share['max_concurrent'] = max(1, math.ceil(settings['max_concurrent'] / workers))
+        if settings.get('limit_per_host'):
+            share['limit_per_host'] = max(1, math.ceil(settings['limit_per_host'] / workers))
+        share['rate'] = settings['rate'] / workers
+        if settings.get('end_rate') is not None:
+            share['end_rate'] = settings['end_rate'] / workers
+        share['save_histogram'] = None
+        share['verbose'] = False
+        shares.append(share)
+    return shares
+
+
+def run_worker(address, authkey: bytes):
+    """Worker process: authenticate, receive settings, run quietly, report back"""
+    # Forked workers inherit the parent's random state; arrivals must not be synchronized
+    random.seed()
+    conn = JsonConnection(socket.create_connection(address))
+    challenge = conn.recv()
+    nonce = secrets.token_hex(16)
+    conn.send({'type': 'hello', 'host': socket.gethostname(), 'pid': os.getpid(),
+               'digest': sign(authkey, challenge['nonce']), 'nonce': nonce})
+    message = conn.recv()
+    if message.get('type') != 'config' or not hmac.compare_digest(str(message.get('digest')), sign(authkey, nonce)):
+        conn.close()
+        raise PermissionError("the coordinator did not prove it knows SIMULATE_AUTHKEY")
+    simulator = PaymentSimulator(**message['settings'])
+    simulator.on_interval = lambda snapshot: conn.send({
+        'type': 'interval',
+        'snapshot': snapshot.to_dict(),
+        'total_success': simulator.total_success,
+        'total_failed': simulator.total_failed,
+    })
+
+    started = time.time()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        asyncio.run(simulator.run_simulation())
+    conn.send({'type': 'done', 'stats': simulator.export_stats(time.time() - started)})
+    conn.close()
+
+
+def join_coordinator(address_text: str, authkey: Optional[str] = AUTHKEY):
+    """Remote worker entry point (simulate.py --join HOST:PORT)"""
+    if not authkey:
+        raise ValueError("set SIMULATE_AUTHKEY to the coordinator's key to join it")
+    address = parse_address(address_text)
+    print(f"{Fore.BLUE}Joining coordinator at {address[0]}:{address[1]}...{Style.RESET_ALL}", file=sys.stderr)
+    run_worker(address, authkey.encode())
+    print(f"{Fore.GREEN}✓ Worker finished{Style.RESET_ALL}", file=sys.stderr)
+
+
+class Coordinator:
+    """Starts the workers, aggregates their statistics and prints the summaries"""
+
+    def __init__(self, settings: Dict, local_workers: int, remote_workers: int = 0,
+                 listen: str = None, authkey: Optional[str] = AUTHKEY):
+        self.interval = settings.get('interval') or 10.0
+        # Workers report on the coordinator's interval, even if it was disabled locally
+        self.settings = {**settings, 'interval': self.interval}
+        self.local_workers = local_workers
+        self.remote_workers = remote_workers
+        self.listen = listen
+        host = parse_address(listen)[0] if listen else '127.0.0.1'
+        if not authkey:
+            if not is_loopback(host):
+                raise ValueError(f"refusing to listen on {host} without SIMULATE_AUTHKEY: "
+                                 "set it to a secret shared with the remote workers")
+            authkey = secrets.token_hex(16)  # only local processes need it
+        self.authkey = authkey.encode()
+
+    def _accept(self, listener: socket.socket):
+        """(connection, hello) of the next worker that proves it knows the key (others are dropped)"""
+        while True:
+            sock, peer = listener.accept()
+            conn = JsonConnection(sock)
+            nonce = secrets.token_hex(16)
+            try:
+                # A silent peer must not hold up the other workers
+                sock.settimeout(HANDSHAKE_TIMEOUT)
+                conn.send({'type': 'challenge', 'nonce': nonce})
+                hello = conn.recv()
+                if hmac.compare_digest(str(hello.get('digest')), sign(self.authkey, nonce)):
+                    sock.settimeout(None)
+                    return conn, hello
+            except (OSError, EOFError, ValueError):
+                pass
+            print(f"{Fore.RED}✗ Rejected a connection from {peer[0]}: wrong SIMULATE_AUTHKEY or protocol{Style.RESET_ALL}")
+            conn.close()
+
+    def run(self):
+        total = self.local_workers + self.remote_workers
+        if total < 1:
+            raise ValueError("at least one worker is required")
+        address = parse_address(self.listen) if self.listen else ('127.0.0.1', 0)
+
+        with socket.create_server(address) as listener:
+            host, port = listener.getsockname()[:2]
+            connect_to = ('127.0.0.1' if host in ('0.0.0.0', '') else host, port)
+            processes = [Process(target=run_worker, args=(connect_to, self.authkey), daemon=True)
+                         for _ in range(self.local_workers)]
+            for process in processes:
+                process.start()
+
+            print(f"{Fore.BLUE}{'='*50}{Style.RESET_ALL}")
+            print(f"{Fore.BLUE}🚀 Distributed Payment API Simulation{Style.RESET_ALL}")
+            print(f"{Fore.BLUE}{'='*50}{Style.RESET_ALL}")
+            print(f"API URL:          {self.settings['api_url']}")
+            print(f"Mode:             {Fore.YELLOW}{self.settings['mode']}{Style.RESET_ALL}")
+            print(f"Workers:          {self.local_workers} local, {self.remote_workers} remote")
+            if self.remote_workers:
+                print(f"Listening on:     {host}:{port} (simulate.py --join HOST:{port})")
+            print(f"{Fore.BLUE}{'='*50}{Style.RESET_ALL}\n")
+
+            connections = []
+            nonces = []
+            while len(connections) < total:
+                conn, hello = self._accept(listener)
+                connections.append(conn)
+                nonces.append(str(hello.get('nonce')))
+                print(f"✓ Worker {len(connections)}/{total} joined ({hello['host']}, pid {hello['pid']})")
+
+        # Start everyone together
+        for conn, nonce, share in zip(connections, nonces, split_settings(self.settings, total)):
+            conn.send({'type': 'config', 'settings': share, 'digest': sign(self.authkey, nonce)})
+        started = time.time()
+        print()
+
+        results = self._collect(connections, started)
+        elapsed = time.time() - started
+        for process in processes:
+            process.join(timeout=5)
+
+        aggregate = PaymentSimulator(**{**self.settings, 'verbose': False})
+        for stats in results:
+            aggregate.merge_stats(stats)
+        unhealthy = sum(1 for stats in results if not stats['healthy'])
+        if unhealthy:
+            print(f"{Fore.RED}✗ {unhealthy} worker(s) could not reach the API{Style.RESET_ALL}")
+        aggregate.show_stats(elapsed)
+        if self.settings.get('save_histogram'):
+            aggregate.save_histograms(self.settings['save_histogram'])
+
+    def _collect(self, connections, started: float) -> List[Dict]:
+        """Receive interval snapshots and final statistics until every worker is done"""
+        pending = list(connections)
+        results = []
+        window = LatencyHistogram()
+        totals = {}  # connection index -> (success, failed) so far
+        next_report = started + self.interval
+
+        while pending:
+            for conn in wait(pending, timeout=max(0.0, next_report - time.time())):
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError, ValueError):
+                    pending.remove(conn)
+                    print(f"{Fore.RED}✗ A worker disconnected without reporting{Style.RESET_ALL}")
+                    continue
+                index = connections.index(conn)
+                if message['type'] == 'interval':
+                    window.merge(LatencyHistogram.from_dict(message['snapshot']))
+                    totals[index] = (message['total_success'], message['total_failed'])
+                elif message['type'] == 'done':
+                    stats = message['stats']
+                    totals[index] = (stats['total_success'], stats['total_failed'])
+                    results.append(stats)
+                    pending.remove(conn)
+                    conn.close()
+
+            if time.time() >= next_report:
+                self._print_summary(window, totals, len(pending))
+                window = LatencyHistogram()
+                next_report += self.interval
+        return results
+
+    def _print_summary(self, window: LatencyHistogram, totals: Dict, running: int):
+        success = sum(s for s, _ in totals.values())
+        failed = sum(f for _, f in totals.values())
+        done = success + failed
+        ok = success / done * 100 if done else 0.0
+        p = window.percentiles()
+        print(f"{Fore.BLUE}[{datetime.now():%H:%M:%S}] {running} running | {window.count} req "
+              f"({window.count / self.interval:.1f}/s) | total {done} ({ok:.1f}% ok) | "
+              f"p50 {p[50.0]:.3f}s | p99 {p[99.0]:.3f}s | max {window.max:.3f}s{Style.RESET_ALL}")